@@ -3,6 +3,7 @@ import logging
 import pytesseract
 
 from config import Config
+from ocr_profiles import profile_status
 
 logger = logging.getLogger("be_aware_backend")
 
@@ -16,10 +17,11 @@ class OCRService:
     @staticmethod
     def test_ocr() -> dict:
         """
-        Test OCR/Tesseract installation and get available languages.
+        Test OCR/Tesseract installation and get available languages and profiles.
 
         Returns:
-            Dictionary with success status, available languages, and tesseract path
+            Dictionary with success status, available languages, OCR profiles
+            (with their model directory and installed languages) and tesseract path
         """
         try:
             # Get available languages
@@ -35,7 +37,9 @@ class OCRService:
                 "success": True,
                 "available_languages": langs,
                 "tesseract_path": Config.TESSERACT_CMD,
-                "version": str(version)
+                "version": str(version),
+                "default_profile": Config.OCR_PROFILE,
+                "profiles": profile_status()
             }
 
         except Exception as e:
@@ -44,7 +48,9 @@ class OCRService:
                 "success": False,
                 "error": str(e),
                 "tesseract_path": Config.TESSERACT_CMD,
-                "available_languages": []
+                "available_languages": [],
+                "default_profile": Config.OCR_PROFILE,
+                "profiles": []
             }
 
     @staticmethod
@@ -1,40 +1,72 @@
+import json
+import math
 import time
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any
+import threading
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse
+from pydantic import BaseModel
 
 from config import Config
-from llm import LLMClient
-from TextExtraction import OCRService
-from pdf_analyzer import PDFAnalyzer
-from pdf_generator import PDFGenerator
+from coalescing import SingleFlight, IdempotencyConflictError
+from deadline import Deadline
+from ocr_profiles import PROFILES
+from scheduler import PRIORITY_CLASSES
+from services import Services
+from structured_logging import RequestIdMiddleware, carry, configure_logging, dropped_records
 
 # -------------------------
 # Logging configuration
 # -------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# JSON lines written by a listener thread; see Config.LOG_*
+configure_logging()
 logger = logging.getLogger("be_aware_backend")
 
 # -------------------------
 # Initialize Services
 # -------------------------
-llm_client = LLMClient()
-pdf_analyzer = PDFAnalyzer(llm_client)
-pdf_generator = PDFGenerator()
+# Heavy services (OCR, LLM, PDF generation) are built on first use or by the startup warm-up
+services = Services()
+upload_flights = SingleFlight()
+# flight key -> Deadline of the shared analysis, cancelled when its last waiter disconnects
+flight_deadlines: Dict[str, Deadline] = {}
 
 # -------------------------
 # FastAPI App
 # -------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up services per Config.WARMUP_MODE before/while serving; on shutdown
+    wait (up to Config.GRACEFUL_TIMEOUT) for detached analyses to finish
+    """
+    if Config.WARMUP_MODE == "blocking":
+        await asyncio.get_running_loop().run_in_executor(None, services.warm_up)
+    elif Config.WARMUP_MODE == "background":
+        threading.Thread(target=services.warm_up, name="warm-up", daemon=True).start()
+    yield
+    logger.info("👋 BE AWARE backend shutting down")
+    give_up_at = time.monotonic() + Config.GRACEFUL_TIMEOUT
+    if upload_flights.snapshot()["in_flight"]:
+        logger.info("⏳ Draining %d in-flight analyses", upload_flights.snapshot()["in_flight"])
+    while upload_flights.snapshot()["in_flight"] and time.monotonic() < give_up_at:
+        await asyncio.sleep(0.5)
+    remaining = upload_flights.snapshot()["in_flight"]
+    if remaining:
+        logger.warning("⚠️ Shutting down with %d analyses still running", remaining)
+
+
 app = FastAPI(
     title=Config.APP_TITLE,
     description=Config.APP_DESCRIPTION,
-    version=Config.APP_VERSION
+    version=Config.APP_VERSION,
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -43,7 +75,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestIdMiddleware)
 
 
 # -------------------------
@@ -57,9 +91,14 @@ def root():
         "version": Config.APP_VERSION,
         "endpoints": {
             "health": "/health - Health check",
+            "metrics": "/metrics - Runtime counters (LLM upstream, batching, uploads)",
             "developer": "/developer - Developer dashboard (HTML)",
-            "upload": "/upload (POST) - Upload and analyze PDF",
+            "upload": "/upload (POST) - Upload and analyze PDF or label photo",
+            "upload_images": "/upload/images (POST) - Analyze several label photos of one product",
+            "upload_stream": "/upload/stream (POST) - Upload and analyze PDF, streaming partial results (SSE)",
+            "analyze_text": "/analyze-text (POST) - Analyze page text extracted by the client (no PDF upload)",
             "generate_pdf": "/generate-pdf (POST) - Generate report PDF",
+            "results": "/results - Query stored analyses by allergens and nutrient ranges",
             "supported_languages": "/supported-languages - OCR language info"
         },
         "documentation": "/docs"
@@ -68,16 +107,22 @@ def root():
 
 @app.get("/health")
 def health_check():
-    """Health check endpoint"""
-    ocr_status = OCRService.test_ocr()
+    """Health check endpoint (cheap: never waits for services to be built)"""
+    ocr_status = services.ocr_status()
 
+    llm_client = services.peek("llm_client")
+    configured = llm_client.configured if llm_client else bool(Config.OPENROUTER_API_KEY)
+    circuit_state = llm_client.governor.breaker.state if llm_client else "closed"
     return {
-        "status": "healthy" if llm_client.configured else "degraded",
+        "status": "healthy" if configured and circuit_state == "closed" else "degraded",
         "timestamp": time.time(),
+        "warm": services.warm.is_set(),
         "services": {
             "llm": {
-                "configured": llm_client.configured,
-                "model": Config.LLM_MODEL if llm_client.configured else None
+                "configured": configured,
+                "model": Config.LLM_MODELS[0] if configured else None,
+                "routing": llm_client.routing_stats() if llm_client and configured else None,
+                "circuit": circuit_state
             },
             "ocr": {
                 "available": ocr_status["success"],
@@ -87,15 +132,40 @@ def health_check():
     }
 
 
+@app.get("/metrics")
+def metrics():
+    """Runtime counters for monitoring (LLM upstream, routing, batching, OCR cache, uploads, deadlines, result store, logging)"""
+    llm_client = services.llm_client
+    pdf_analyzer = services.pdf_analyzer
+    batcher = pdf_analyzer._batcher
+    return {
+        "timestamp": time.time(),
+        "llm": {
+            "upstream": llm_client.governor.snapshot(),
+            "routing": llm_client.routing_stats(),
+            "batching": batcher.snapshot() if batcher else None
+        },
+        "scheduler": pdf_analyzer.scheduler.snapshot(),
+        "ocr_cache": pdf_analyzer.ocr_cache.snapshot() if pdf_analyzer.ocr_cache else None,
+        "uploads": upload_flights.snapshot(),
+        "deadlines": pdf_analyzer.deadline_stats.snapshot(),
+        "result_store": services.result_store.snapshot() if services.result_store else None,
+        "logging": {"dropped_records": dropped_records()},
+        "services": services.snapshot()
+    }
+
+
 @app.get("/supported-languages")
 def supported_languages():
-    """Get OCR supported languages"""
-    result = OCRService.test_ocr()
+    """Get OCR supported languages and the installed OCR profiles / models"""
+    result = services.ocr_status(refresh=True)
     return {
         "success": result["success"],
         "tesseract_installed_languages": result.get("available_languages", []),
         "configured_string": Config.OCR_LANGUAGES,
-        "tesseract_path": result.get("tesseract_path")
+        "tesseract_path": result.get("tesseract_path"),
+        "default_profile": result.get("default_profile"),
+        "profiles": result.get("profiles", [])
     }
 
 
@@ -107,8 +177,9 @@ async def developer_dashboard():
     """Interactive developer dashboard to test all services"""
 
     # Test all services
+    llm_client = services.llm_client
     llm_test = llm_client.test_connection()
-    ocr_test = OCRService.test_ocr()
+    ocr_test = services.ocr_status(refresh=True)
 
     # Build status HTML
     def status_badge(success: bool) -> str:
@@ -294,8 +365,8 @@ async def developer_dashboard():
 
                 <div class="info-grid">
                     <div class="info-card">
-                        <strong>Model</strong>
-                        <p>{Config.LLM_MODEL}</p>
+                        <strong>Models (tiers)</strong>
+                        <p>{" → ".join(llm_client.models)}</p>
                     </div>
                     <div class="info-card">
                         <strong>Temperature</strong>
@@ -371,6 +442,9 @@ async def developer_dashboard():
                     <div class="endpoint">
                         <code>GET /health</code> - Health check
                     </div>
+                    <div class="endpoint">
+                        <code>GET /metrics</code> - Runtime counters
+                    </div>
                     <div class="endpoint">
                         <code>GET /developer</code> - This dashboard
                     </div>
@@ -380,6 +454,9 @@ async def developer_dashboard():
                     <div class="endpoint">
                         <code>POST /upload</code> - Upload and analyze PDF
                     </div>
+                    <div class="endpoint">
+                        <code>POST /upload/stream</code> - Upload and analyze PDF (streamed SSE results)
+                    </div>
                     <div class="endpoint">
                         <code>POST /generate-pdf</code> - Generate report PDF
                     </div>
@@ -439,19 +516,18 @@ async def developer_dashboard():
 # -------------------------
 # Main Endpoints
 # -------------------------
-@app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...), language: str = Form("en")):
-    """
-    Upload and analyze a PDF file
+async def _read_upload(file: UploadFile) -> Tuple[str, bytes]:
+    """Validate and read an uploaded PDF or label photo, returning (filename, contents)"""
+    from photo_images import IMAGE_EXTENSIONS, UnsupportedImageError, is_image_filename, probe
 
-    Form fields:
-    - file: PDF file
-    - language: language code (en, fr, de, hu)
-    """
     # Validate file
-    filename = getattr(file, "filename", "uploaded.pdf")
-    if not filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF files are supported.")
+    filename = getattr(file, "filename", None) or "uploaded.pdf"
+    is_image = is_image_filename(filename)
+    if not filename.lower().endswith(".pdf") and not is_image:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Upload a PDF or a photo ({', '.join(sorted(IMAGE_EXTENSIONS))})."
+        )
 
     # Read file
     try:
@@ -467,9 +543,94 @@ async def upload_pdf(file: UploadFile = File(...), language: str = Form("en")):
             detail=f"File too large. Max size is {Config.MAX_UPLOAD_SIZE_BYTES / (1024 * 1024):.1f} MB."
         )
 
-    # Analyze
+    if is_image:
+        try:
+            probe(contents, filename)
+        except UnsupportedImageError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+
+    return filename, contents
+
+
+def _is_image(filename: str) -> bool:
+    from photo_images import is_image_filename
+    return is_image_filename(filename)
+
+
+def _validate_priority(priority: str) -> None:
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid priority. Use one of: {', '.join(PRIORITY_CLASSES)}."
+        )
+
+
+def _resolve_profile(profile: Optional[str]) -> str:
+    profile = profile or Config.OCR_PROFILE
+    if profile not in PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid OCR profile. Use one of: {', '.join(PROFILES)}."
+        )
+    return profile
+
+
+@app.post("/upload")
+async def upload_pdf(request: Request, file: UploadFile = File(...), language: str = Form("en"),
+                     batched: bool = Form(False),
+                     priority: str = Form("interactive"),
+                     strict: bool = Form(False),
+                     profile: Optional[str] = Form(None),
+                     idempotency_key: Optional[str] = Header(None),
+                     x_request_deadline: Optional[float] = Header(None)):
+    """
+    Upload and analyze a PDF file or a label photo
+
+    Form fields:
+    - file: PDF, or a JPEG / PNG / WebP / HEIC photo (OCR'd directly; for
+      several photos of one product use POST /upload/images)
+    - language: language code (en, fr, de, hu)
+    - batched: share one LLM completion with other queued uploads (bulk ingestion)
+    - priority: interactive (default), batch or background; bulk work should not use interactive
+    - strict: OCR every page of scanned PDFs (no page triage), for audits
+    - profile: OCR profile (fast, balanced, accurate); defaults to OCR_PROFILE
+
+    Headers:
+    - Idempotency-Key: optional; a retry with the same key reattaches to the
+      in-progress or finished analysis instead of starting over
+    - X-Request-Deadline: optional time budget in seconds (default
+      REQUEST_DEADLINE_SECONDS, capped at REQUEST_DEADLINE_MAX_SECONDS); when
+      it runs short, OCR stops refining and skips remaining pages, and once
+      exhausted the request fails with 504
+
+    Concurrent uploads of byte-identical PDFs share a single analysis. It is
+    cancelled when every client waiting for it has disconnected.
+    """
+    filename, contents = await _read_upload(file)
+    _validate_priority(priority)
+    profile = _resolve_profile(profile)
+    content_hash = hashlib.sha256(contents).hexdigest()
+
+    if _is_image(filename):
+        def run(deadline: Deadline) -> Dict[str, Any]:
+            return services.pdf_analyzer.analyze_images([contents], filename=filename, language=language,
+                                                        priority=priority, strict=strict, deadline=deadline,
+                                                        profile=profile)
+    else:
+        def run(deadline: Deadline) -> Dict[str, Any]:
+            return services.pdf_analyzer.analyze(contents, filename=filename, language=language,
+                                                 batched=batched, priority=priority, strict=strict,
+                                                 deadline=deadline, profile=profile)
+
+    # Analyze (coalesced on content hash + language + strictness + OCR profile)
     start = time.time()
-    result = pdf_analyzer.analyze(contents, filename=filename, language=language)
+    result, is_owner = await _coalesced_analysis(
+        request, f"{content_hash}:{language}:{int(strict)}:{profile}", idempotency_key, x_request_deadline,
+        run, lambda result: _store_result(result, content_hash, filename, language, profile)
+    )
+    if result is None:
+        # Client went away; 499 only ends up in access logs
+        return JSONResponse(status_code=499, content={"detail": "Client disconnected"})
     duration = round(time.time() - start, 2)
 
     # Response
@@ -480,8 +641,375 @@ async def upload_pdf(file: UploadFile = File(...), language: str = Form("en")):
         "processing_time_seconds": duration,
         "data": result
     }
+    return _analysis_response(result, response_payload, is_owner)
+
+
+@app.post("/upload/images")
+async def upload_images(request: Request, files: List[UploadFile] = File(...), language: str = Form("en"),
+                        priority: str = Form("interactive"),
+                        strict: bool = Form(False),
+                        profile: Optional[str] = Form(None),
+                        filename: Optional[str] = Form(None),
+                        idempotency_key: Optional[str] = Header(None),
+                        x_request_deadline: Optional[float] = Header(None)):
+    """
+    Analyze one product from several label photos (e.g. front, ingredients, nutrition table)
+
+    Form fields:
+    - files: up to IMAGE_MAX_FILES JPEG / PNG / WebP / HEIC photos, in page order
+    - filename: optional name for the product (defaults to the first photo's)
+    - language, priority, strict, profile: as for POST /upload
+
+    Photos are EXIF-rotated and OCR'd directly, without a PDF round trip.
+    Accepts the Idempotency-Key and X-Request-Deadline headers; identical
+    concurrent requests share one analysis.
+    """
+    if not 1 <= len(files) <= Config.IMAGE_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Upload 1 to {Config.IMAGE_MAX_FILES} images.")
+    _validate_priority(priority)
+    profile = _resolve_profile(profile)
+
+    images = []
+    for file in files:
+        name, contents = await _read_upload(file)
+        if not _is_image(name):
+            raise HTTPException(status_code=400, detail=f"{name} is not an image; upload PDFs to /upload.")
+        images.append(contents)
+    total_size = sum(len(image) for image in images)
+    if total_size > Config.MAX_UPLOAD_SIZE_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Images too large. Max total size is {Config.MAX_UPLOAD_SIZE_BYTES / (1024 * 1024):.1f} MB."
+        )
+    filename = filename or files[0].filename
+
+    digest = hashlib.sha256()
+    for image in images:
+        digest.update(hashlib.sha256(image).digest())
+    content_hash = digest.hexdigest()
+
+    def run(deadline: Deadline) -> Dict[str, Any]:
+        return services.pdf_analyzer.analyze_images(images, filename=filename, language=language,
+                                                    priority=priority, strict=strict, deadline=deadline,
+                                                    profile=profile)
+
+    start = time.time()
+    result, is_owner = await _coalesced_analysis(
+        request, f"img:{content_hash}:{language}:{int(strict)}:{profile}", idempotency_key, x_request_deadline,
+        run, lambda result: _store_result(result, content_hash, filename, language, profile)
+    )
+    if result is None:
+        return JSONResponse(status_code=499, content={"detail": "Client disconnected"})
+
+    response_payload = {
+        "success": "error" not in result,
+        "filename": filename,
+        "file_size_bytes": total_size,
+        "image_count": len(images),
+        "processing_time_seconds": round(time.time() - start, 2),
+        "data": result
+    }
+    return _analysis_response(result, response_payload, is_owner)
+
+
+async def _coalesced_analysis(request: Request, flight_key: str, idempotency_key: Optional[str],
+                              x_request_deadline: Optional[float],
+                              run: Callable[[Deadline], Dict[str, Any]],
+                              store: Callable[[Dict[str, Any]], None]) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Join (or start) the shared analysis for ``flight_key`` and wait for it.
+
+    Returns:
+        Tuple of (result, or None if the client disconnected; whether this
+        request started the analysis)
+    """
+    try:
+        future, is_owner = upload_flights.join(flight_key, idempotency_key)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if is_owner:
+        # Detached from this request so a disconnecting owner doesn't strand other waiters
+        deadline = Deadline(x_request_deadline)
+        flight_deadlines[flight_key] = deadline
+        asyncio.get_running_loop().run_in_executor(None, carry(_run_flight), flight_key, lambda: run(deadline), store)
+    return await _wait_for_flight(request, flight_key, future), is_owner
+
+
+def _analysis_response(result: Dict[str, Any], response_payload: Dict[str, Any], is_owner: bool) -> JSONResponse:
+    """200, or 503 / 504 when the LLM was unavailable, the analysis was cancelled or the deadline ran out"""
+    headers = {} if is_owner else {"X-Request-Coalesced": "true"}
+    metadata = result.get("metadata", {})
+    if metadata.get("llm_unavailable"):
+        # Upstream known to be down: tell the client when to come back instead of a 200 with empty data
+        headers["Retry-After"] = str(math.ceil(metadata.get("retry_after_seconds") or 1))
+        return JSONResponse(status_code=503, content=response_payload, headers=headers)
+    if metadata.get("cancelled"):
+        # Joined an analysis just as its last client left: retrying starts a fresh one
+        headers["Retry-After"] = "1"
+        return JSONResponse(status_code=503, content=response_payload, headers=headers)
+    if metadata.get("deadline_exceeded"):
+        return JSONResponse(status_code=504, content=response_payload, headers=headers)
+    return JSONResponse(content=response_payload, headers=headers)
+
+
+async def _wait_for_flight(request: Request, flight_key: str, future) -> Optional[Dict[str, Any]]:
+    """
+    Wait for a shared analysis, watching for the client to disconnect.
+
+    Returns:
+        The result, or None if the client disconnected first. The last
+        waiter to disconnect cancels the analysis; one carrying an
+        Idempotency-Key only if no retry reattached within
+        Config.IDEMPOTENCY_REATTACH_GRACE_SECONDS.
+    """
+    shared = asyncio.shield(asyncio.wrap_future(future))
+    while True:
+        done, _ = await asyncio.wait({shared}, timeout=Config.DISCONNECT_POLL_INTERVAL)
+        if done:
+            return shared.result()
+        if await request.is_disconnected():
+            if upload_flights.leave(flight_key):
+                if upload_flights.keyed(flight_key) and Config.IDEMPOTENCY_REATTACH_GRACE_SECONDS > 0:
+                    asyncio.get_running_loop().call_later(Config.IDEMPOTENCY_REATTACH_GRACE_SECONDS,
+                                                          _cancel_abandoned_flight, flight_key, future)
+                else:
+                    _cancel_abandoned_flight(flight_key, future)
+            return None
+
+
+def _cancel_abandoned_flight(flight_key: str, future) -> None:
+    """Cancel the shared analysis if every client waiting for it is still gone"""
+    if not upload_flights.abandoned(flight_key, future):
+        return
+    deadline = flight_deadlines.get(flight_key)
+    if deadline is not None:
+        deadline.cancel("all clients disconnected")
+
+
+@app.post("/upload/stream")
+async def upload_pdf_stream(file: UploadFile = File(...), language: str = Form("en"),
+                            strict: bool = Form(False),
+                            profile: Optional[str] = Form(None),
+                            x_request_deadline: Optional[float] = Header(None)):
+    """
+    Upload and analyze a PDF file or label photo, streaming results as Server-Sent Events
+
+    Events:
+    - partial: {"section", "key", "value"} as each allergen / nutrition field arrives
+    - reset: {} - drop every partial received so far; the fields are streamed
+      again by a retry, a stronger model or a re-run on more pages
+    - result: the same payload as POST /upload
+
+    Accepts the strict and profile form fields and the X-Request-Deadline
+    header like POST /upload; the analysis is cancelled if the client closes
+    the stream before the result.
+    """
+    filename, contents = await _read_upload(file)
+    profile = _resolve_profile(profile)
+    deadline = Deadline(x_request_deadline)
+    is_image = _is_image(filename)
+    analyze = services.pdf_analyzer.analyze_images if is_image else services.pdf_analyzer.analyze
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_partial(section: Optional[str], key: Optional[str], value: Any) -> None:
+        if section is None:
+            loop.call_soon_threadsafe(events.put_nowait, ("reset", {}))
+            return
+        loop.call_soon_threadsafe(events.put_nowait, ("partial", {
+            "section": section, "key": key, "value": value
+        }))
+
+    def run() -> None:
+        start = time.time()
+        result = analyze([contents] if is_image else contents, filename=filename,
+                         language=language, on_partial=on_partial, strict=strict, deadline=deadline,
+                         profile=profile)
+        loop.call_soon_threadsafe(events.put_nowait, ("result", {
+            "success": "error" not in result,
+            "filename": filename,
+            "file_size_bytes": len(contents),
+            "processing_time_seconds": round(time.time() - start, 2),
+            "data": result
+        }))
+        _store_result(result, hashlib.sha256(contents).hexdigest(), filename, language, profile)
+
+    loop.run_in_executor(None, carry(run))
+
+    async def event_stream():
+        delivered = False
+        try:
+            while True:
+                event, payload = await events.get()
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+                if event == "result":
+                    delivered = True
+                    break
+        finally:
+            if not delivered:
+                deadline.cancel("stream closed by client")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def _run_flight(flight_key: str, run: Callable[[], Dict[str, Any]],
+                store: Callable[[Dict[str, Any]], None]) -> None:
+    """Run one shared analysis, publish it to every coalesced waiter, then store it"""
+    try:
+        result = run()
+    except BaseException as e:
+        upload_flights.fail(flight_key, e)
+        return
+    finally:
+        flight_deadlines.pop(flight_key, None)
+    upload_flights.complete(flight_key, result, retain="error" not in result)
+    store(result)
+
+
+class TextAnalysisRequest(BaseModel):
+    pages: List[str]
+    page_hashes: Optional[List[str]] = None
+    filename: str = "document.pdf"
+    language: str = "en"
+    batched: bool = False
+    priority: str = "interactive"
+
+
+@app.post("/analyze-text")
+async def analyze_text(request: Request, body: TextAnalysisRequest,
+                       idempotency_key: Optional[str] = Header(None),
+                       x_request_deadline: Optional[float] = Header(None)):
+    """
+    Analyze text the client extracted from a digital PDF, without uploading it
+
+    Body (JSON):
+    - pages: text of each page, in order
+    - page_hashes: optional client-side hash per page (e.g. of the page's
+      content), echoed in the result's metadata; the document is always
+      identified by the submitted text
+    - filename, language, batched, priority: as for POST /upload
+
+    Returns the same payload as POST /upload (with text_length instead of
+    file_size_bytes). When the text is not enough to analyze (too short, or
+    no nutrition / allergen / ingredient keywords, i.e. the label is likely
+    an image) it answers 422 with "upload_required": true and a "reason";
+    the client should then POST the PDF to /upload. Accepts the
+    Idempotency-Key and X-Request-Deadline headers; identical concurrent
+    requests share one analysis.
+    """
+    _validate_priority(body.priority)
+    if not 1 <= len(body.pages) <= Config.TEXT_ANALYSIS_MAX_PAGES:
+        raise HTTPException(status_code=400,
+                            detail=f"pages must hold 1 to {Config.TEXT_ANALYSIS_MAX_PAGES} entries.")
+    text_length = sum(len(page) for page in body.pages)
+    if text_length > Config.TEXT_ANALYSIS_MAX_CHARS:
+        raise HTTPException(status_code=413,
+                            detail=f"Text too large. Max {Config.TEXT_ANALYSIS_MAX_CHARS} characters.")
+    if body.page_hashes is not None and len(body.page_hashes) != len(body.pages):
+        raise HTTPException(status_code=400, detail="page_hashes must have one entry per page.")
+
+    reason = services.pdf_analyzer.check_text(body.pages)
+    if reason:
+        return JSONResponse(status_code=422, content={
+            "success": False,
+            "upload_required": True,
+            "reason": reason,
+            "detail": "The extracted text is not enough to analyze this document; upload the PDF to /upload."
+        })
+
+    digest = hashlib.sha256()
+    for part in body.pages:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    document_hash = digest.hexdigest()
+
+    def run(deadline: Deadline) -> Dict[str, Any]:
+        return services.pdf_analyzer.analyze_text(body.pages, filename=body.filename, language=body.language,
+                                                  batched=body.batched, priority=body.priority,
+                                                  deadline=deadline, page_hashes=body.page_hashes)
+
+    start = time.time()
+    result, is_owner = await _coalesced_analysis(
+        request, f"text:{document_hash}:{body.language}", idempotency_key, x_request_deadline,
+        run, lambda result: _store_result(result, document_hash, body.filename, body.language, "client_text")
+    )
+    if result is None:
+        return JSONResponse(status_code=499, content={"detail": "Client disconnected"})
+
+    response_payload = {
+        "success": "error" not in result,
+        "filename": body.filename,
+        "text_length": text_length,
+        "processing_time_seconds": round(time.time() - start, 2),
+        "data": result
+    }
+    return _analysis_response(result, response_payload, is_owner)
+
+
+def _store_result(result: Dict[str, Any], sha256: str, filename: str, language: str, profile: str) -> None:
+    """Keep a successful analysis in the result store; a store failure never fails the upload"""
+    store = services.result_store
+    if store is None or "error" in result:
+        return
+    try:
+        store.add(result, sha256=sha256, language=language, profile=profile or Config.OCR_PROFILE,
+                  filename=filename)
+    except Exception as e:
+        logger.warning("⚠️ Could not store analysis of %s: %s", filename, e)
+
+
+@app.get("/results")
+def query_results(request: Request, contains: str = "", free_of: str = "",
+                  limit: int = Config.RESULT_QUERY_DEFAULT_LIMIT, cursor: Optional[int] = None):
+    """
+    Query stored analyses, newest first
+
+    Query parameters:
+    - contains: comma-separated allergens every result must contain (e.g. mustard,celery)
+    - free_of: comma-separated allergens no result may contain (e.g. milk)
+    - min_<nutrient> / max_<nutrient>: numeric range per nutrient (energy in
+      kcal, fat / carbohydrate / sugar / protein / sodium in grams), e.g. max_sugar=5
+    - limit: page size (max RESULT_QUERY_MAX_LIMIT)
+    - cursor: next_cursor of the previous page
+    """
+    store = services.result_store
+    if store is None:
+        raise HTTPException(status_code=404, detail="The result store is disabled (RESULT_STORE_ENABLED=false).")
+    if not 1 <= limit <= Config.RESULT_QUERY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {Config.RESULT_QUERY_MAX_LIMIT}.")
+
+    ranges: Dict[str, Any] = {}
+    for name, value in request.query_params.items():
+        if not name.startswith(("min_", "max_")):
+            continue
+        bound, nutrient = name.split("_", 1)
+        try:
+            amount = float(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{name} must be a number.")
+        low, high = ranges.get(nutrient, (None, None))
+        ranges[nutrient] = (amount, high) if bound == "min" else (low, amount)
+
+    try:
+        return store.query(
+            contains=[a.strip() for a in contains.split(",") if a.strip()],
+            free_of=[a.strip() for a in free_of.split(",") if a.strip()],
+            ranges=ranges, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-    return JSONResponse(content=response_payload)
+@app.get("/results/{result_id}")
+def get_result(result_id: int):
+    """One stored analysis, including the full result data"""
+    store = services.result_store
+    result = store.get(result_id) if store else None
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found.")
+    return result
 
 
 @app.post("/generate-pdf")
@@ -492,7 +1020,7 @@ async def generate_pdf(payload: Dict[str, Any]):
     Body: JSON with allergens, nutritional_values, and language
     """
     try:
-        pdf_bytes = pdf_generator.generate(payload)
+        pdf_bytes = services.pdf_generator.generate(payload)
 
         headers = {
             "Content-Disposition": 'attachment; filename="be_aware_report.pdf"'
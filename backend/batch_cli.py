@@ -0,0 +1,227 @@
+# batch_cli.py - Offline bulk analysis of archived PDFs (no HTTP), resumable JSONL output
+"""
+Analyze a directory tree or manifest of PDFs with a pool of worker processes.
+
+Usage (from backend/):
+    python batch_cli.py INPUT -o results.jsonl [--workers N] [--llm-concurrency N]
+        [--language en] [--strict] [--profile fast] [--deadline 600] [--retry-errors] [--store]
+
+INPUT is a directory (searched recursively for *.pdf) or a manifest file
+listing one PDF path per line (relative paths are resolved against the
+manifest's directory). Every worker process runs its own PDFAnalyzer, so
+OCR uses one core per worker; LLM extractions across all workers are
+capped at --llm-concurrency.
+
+One JSON record per file is appended to the output as soon as the file is
+done, and the output doubles as the checkpoint: re-running the same command
+skips every file that already has a successful record (and, with
+--retry-errors, retries the failed ones). When a path appears more than
+once, its last record wins. With --store, successful results are also
+added to the result store (RESULT_STORE_PATH) that /results queries.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, List, Set
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+_analyzer = None
+_llm_slots = None
+
+
+def find_pdfs(source: str) -> List[str]:
+    """PDF paths under a directory, or listed in a manifest file, in a stable order"""
+    if os.path.isdir(source):
+        found = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            found.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf"))
+        return found
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as fh:
+        paths = [line.strip() for line in fh if line.strip() and not line.startswith("#")]
+    return [path if os.path.isabs(path) else os.path.join(base, path) for path in paths]
+
+
+def load_checkpoint(output: str, retry_errors: bool) -> Set[str]:
+    """Paths already recorded in ``output`` (successful ones only with ``retry_errors``)"""
+    done: Set[str] = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "rb+") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a killed run
+            if record.get("status") == "ok" or not retry_errors:
+                done.add(record["path"])
+        fh.seek(0, os.SEEK_END)
+        if fh.tell():
+            fh.seek(-1, os.SEEK_END)
+            if fh.read(1) != b"\n":
+                fh.write(b"\n")  # don't glue the next record onto a partial line
+    return done
+
+
+def _init_worker(llm_slots, log_level: int) -> None:
+    """Build this process's analyzer; LLM extractions share the pool-wide slots"""
+    global _analyzer, _llm_slots
+    logging.basicConfig(level=log_level, format="%(asctime)s - %(levelname)s - %(message)s")
+    from llm import LLMClient
+    from pdf_analyzer import PDFAnalyzer
+
+    _llm_slots = llm_slots
+    _analyzer = PDFAnalyzer(LLMClient())
+    extract = _analyzer.extract_data_from_text
+
+    def extract_with_slot(*args, **kwargs):
+        with _llm_slots:
+            return extract(*args, **kwargs)
+
+    _analyzer.extract_data_from_text = extract_with_slot
+
+
+def _analyze_file(path: str, language: str, strict: bool, profile: str, budget: float) -> Dict[str, Any]:
+    from deadline import Deadline
+    from scheduler import BATCH
+
+    started = time.monotonic()
+    with open(path, "rb") as fh:
+        pdf_bytes = fh.read()
+    result = _analyzer.analyze(pdf_bytes, filename=os.path.basename(path), language=language,
+                               priority=BATCH, strict=strict, profile=profile, deadline=Deadline(budget))
+    return {
+        "path": path,
+        "sha256": hashlib.sha256(pdf_bytes).hexdigest(),
+        "status": "error" if "error" in result else "ok",
+        "seconds": round(time.monotonic() - started, 2),
+        "result": result,
+    }
+
+
+class Progress:
+    """Throughput and ETA for the files processed in this run"""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def record(self, ok: bool) -> None:
+        self.done += 1
+        self.failed += 0 if ok else 1
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        left = self.total - self.done
+        eta = f"{left / rate / 60:.1f} min" if rate else "?"
+        return (f"{self.done}/{self.total} done ({self.failed} failed, {self.skipped} skipped), "
+                f"{rate * 60:.1f} files/min, ETA {eta}")
+
+    def maybe_report(self, every: float = 10.0) -> None:
+        now = time.monotonic()
+        if now - self._last_report >= every:
+            self._last_report = now
+            print(f"⏱️ {self.line()}", file=sys.stderr)
+
+
+def run(paths: Iterable[str], output: str, workers: int, llm_concurrency: int, language: str,
+        strict: bool, profile: str, budget: float, progress: Progress, store=None) -> None:
+    context = multiprocessing.get_context("spawn")  # fresh interpreters: no inherited threads or locks
+    llm_slots = context.BoundedSemaphore(llm_concurrency)
+    pending = iter(paths)
+
+    with open(output, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker,
+            initargs=(llm_slots, logging.WARNING)) as pool:
+        running = {}
+
+        def submit_next() -> bool:
+            path = next(pending, None)
+            if path is None:
+                return False
+            running[pool.submit(_analyze_file, path, language, strict, profile, budget)] = path
+            return True
+
+        # Keep a small backlog per worker instead of queueing the whole archive
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+
+        while running:
+            finished, _ = wait(running, timeout=10, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = running.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {"path": path, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if store is not None and record["status"] == "ok":
+                    store.add(record["result"], sha256=record["sha256"], language=language,
+                              profile=profile or Config.OCR_PROFILE, filename=path)
+                progress.record(record["status"] == "ok")
+                submit_next()
+            progress.maybe_report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Directory of PDFs or manifest file (one path per line)")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output, also used to resume")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--llm-concurrency", type=int, default=Config.LLM_CONCURRENCY_INITIAL,
+                        help="Max LLM extractions in flight across all workers")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--strict", action="store_true", help="OCR every page (no triage)")
+    parser.add_argument("--profile", default=None, help="OCR profile (default OCR_PROFILE)")
+    parser.add_argument("--deadline", type=float, default=Config.REQUEST_DEADLINE_MAX_SECONDS,
+                        help="Time budget per file in seconds")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run files whose record is an error")
+    parser.add_argument("--store", action="store_true", help="Also add successful results to the result store")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.profile and args.profile not in Config.OCR_PROFILES:
+        parser.error(f"unknown profile {args.profile!r} (use one of: {', '.join(Config.OCR_PROFILES)})")
+
+    paths = find_pdfs(args.input)
+    done = load_checkpoint(args.output, args.retry_errors)
+    todo = [path for path in paths if path not in done]
+    progress = Progress(len(todo), len(paths) - len(todo))
+    print(f"📦 {len(paths)} PDFs, {progress.skipped} already done, {len(todo)} to process "
+          f"with {args.workers} worker(s)", file=sys.stderr)
+
+    store = None
+    if args.store:
+        from result_store import ResultStore
+        store = ResultStore()
+
+    try:
+        run(todo, args.output, args.workers, args.llm_concurrency, args.language, args.strict,
+            args.profile, args.deadline, progress, store)
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrupted - re-run the same command to resume", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        print(f"✅ {progress.line()} in {(time.monotonic() - progress.started) / 60:.1f} min", file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# bench_import_time.py - Import-time budget check for the API module
+"""
+Measure what importing the FastAPI app costs and fail when it exceeds a budget.
+
+Usage (from backend/):
+    python benchmarks/bench_import_time.py [--module app] [--budget-ms 600] [--top 15] [--json out.json]
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter
+and reports the total import time, the cost per top-level package (self
+time of all its submodules) and which of the heavy OCR/LLM/PDF dependencies
+were imported. Heavy dependencies are meant to load on first use (see
+services.py), so the check fails when any of them is imported eagerly or
+the total exceeds ``--budget-ms``. Run it a few times; the first run after
+a fresh install also pays for writing bytecode caches.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported by the app module itself
+HEAVY_PACKAGES = ["openai", "PyPDF2", "pytesseract", "pdf2image", "reportlab", "numpy", "PIL"]
+
+
+def measure(module: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, "WARMUP_MODE": "off"}
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    per_package = defaultdict(float)
+    total_us = 0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        top = name.split(".")[0]
+        imported.add(top)
+        per_package[top] += int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "packages_ms": {name: round(us / 1000, 1)
+                        for name, us in sorted(per_package.items(), key=lambda item: -item[1])},
+        "heavy_imported": [name for name in HEAVY_PACKAGES if name in imported],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="Module to import")
+    parser.add_argument("--budget-ms", type=float, default=600, help="Fail above this total import time")
+    parser.add_argument("--top", type=int, default=15, help="Packages to list")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = measure(args.module)
+    print(f"import {report['module']}: {report['total_ms']} ms (budget {args.budget_ms:g} ms)")
+    print(f"{'package':<24} {'ms':>8}")
+    for name, ms in list(report["packages_ms"].items())[:args.top]:
+        print(f"{name:<24} {ms:>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+    failed = False
+    if report["heavy_imported"]:
+        print(f"\n❌ Heavy dependencies imported eagerly: {', '.join(report['heavy_imported'])}")
+        failed = True
+    if report["total_ms"] > args.budget_ms:
+        print(f"\n❌ Import time {report['total_ms']} ms exceeds the {args.budget_ms:g} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\n✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,652 @@
+# bench_load.py - Open-loop load test of the API with an SLO report and baseline comparison
+"""
+Drive /upload and /generate-pdf with a mix of digital, scanned and
+multi-page PDFs at fixed arrival rates, and report per rate the throughput,
+p50 / p95 / p99 latency, error rate and peak RSS of the server.
+
+Usage (from backend/):
+    python benchmarks/bench_load.py [--rates 0.5,1,2] [--duration 60]
+        [--mix digital=4,scanned=3,multipage=1,generate=2]
+        [--save-baseline load_baseline.json | --baseline load_baseline.json]
+
+Arrivals are open-loop (Poisson at each ``--rates`` value, requests per
+second): a slow server does not slow the client down, and latency is
+measured from when a request was due, not when a free client thread sent
+it, so queueing shows up in the percentiles.
+
+By default every rate gets a fresh server started with serve.py's
+production settings (``--workers`` gunicorn workers) where the LLM and
+Tesseract are replaced by local stand-ins:
+
+  LLM   the OpenAI client answers canned JSON after a log-normal delay
+        (``--llm-median`` / ``--llm-sigma`` seconds); routing, hedging,
+        streaming and the circuit breaker run as in production
+  OCR   each page is decoded as in production, then a log-normal delay
+        (``--ocr-median`` / ``--ocr-sigma``) is spent in a child process
+        burning CPU like Tesseract (``--ocr-mode cpu``) or sleeping
+        (``--ocr-mode sleep``); multi-page triage skips each page with
+        probability ``--triage-skip``
+
+The OCR page cache is off and every upload is a distinct file, so no
+request is answered from a cache or shares another's analysis. With
+``--url`` an already running server is tested instead (real LLM and OCR;
+pass ``--server-pid`` to sample its RSS).
+
+A rate meets the SLO when its p99 is at most ``--slo-p99`` seconds and its
+error rate at most ``--slo-error-rate``. ``--save-baseline`` stores the
+results; ``--baseline`` compares against stored results and exits with
+status 1 when a rate regressed by more than ``--tolerance``.
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from PIL import Image, ImageDraw  # noqa: E402
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+KINDS = ("digital", "scanned", "multipage", "generate")
+
+# Stand-in settings travel to the server workers through the environment
+STANDIN_ENV = {
+    "llm_median": "LOADTEST_LLM_MEDIAN",
+    "llm_sigma": "LOADTEST_LLM_SIGMA",
+    "ocr_median": "LOADTEST_OCR_MEDIAN",
+    "ocr_sigma": "LOADTEST_OCR_SIGMA",
+    "ocr_mode": "LOADTEST_OCR_MODE",
+    "triage_skip": "LOADTEST_TRIAGE_SKIP",
+}
+
+_LLM_RESPONSE = json.dumps({
+    "allergens": {"gluten": True, "egg": False, "crustaceans": False, "fish": False, "peanut": False,
+                  "soy": True, "milk": True, "tree_nuts": True, "celery": False, "mustard": False},
+    "nutritional_values": {"energy": "1580 kJ / 375 kcal", "fat": "9.5 g", "carbohydrate": "61 g",
+                           "sugar": "21 g", "protein": "9.8 g", "sodium": "0.35 g (as salt)"},
+    "metadata": {"language_detected": "en", "confidence": "high"},
+})
+
+_LABEL_LINES = [
+    "Crunchy Muesli",
+    "Ingredients: oat flakes (gluten), sugar, hazelnuts, skimmed milk powder, soy lecithin, salt.",
+    "May contain traces of peanuts. Store in a cool, dry place.",
+    "Nutrition information          per 100 g      per serving (30 g)",
+    "Energy                         1580 kJ / 375 kcal   474 kJ / 113 kcal",
+    "Fat                            9.5 g          2.9 g",
+    "Carbohydrate                   61 g           18 g",
+    "of which sugars                21 g           6.3 g",
+    "Protein                        9.8 g          2.9 g",
+    "Salt                           0.35 g         0.11 g",
+]
+
+_BURN = "import sys, time\nend = time.process_time() + float(sys.argv[1])\nwhile time.process_time() < end:\n    pass\n"
+
+
+# ---------------------------------------------------------------------------
+# Stand-in server
+# ---------------------------------------------------------------------------
+
+class _LognormalDelay:
+    def __init__(self, median: float, sigma: float, rng: random.Random):
+        self.median = median
+        self.sigma = sigma
+        self.rng = rng
+
+    def sample(self) -> float:
+        return self.median * math.exp(self.rng.gauss(0, self.sigma)) if self.median > 0 else 0.0
+
+
+class _StandInStream:
+    """Streamed completion: the canned JSON in chunks spread over the delay"""
+
+    def __init__(self, delay: float, chunks: int = 8):
+        self.delay = delay
+        self.chunks = chunks
+        self.response = SimpleNamespace(close=lambda: None)
+
+    def __iter__(self):
+        size = math.ceil(len(_LLM_RESPONSE) / self.chunks)
+        time.sleep(self.delay / 2)  # time to first token
+        for start in range(0, len(_LLM_RESPONSE), size):
+            time.sleep(self.delay / 2 / self.chunks)
+            delta = SimpleNamespace(content=_LLM_RESPONSE[start:start + size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class StandInOpenAI:
+    """Just enough of the OpenAI client for LLMClient: completions answer canned JSON after a delay"""
+
+    def __init__(self, delay: _LognormalDelay):
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.models = SimpleNamespace(list=lambda: [])
+
+    def with_options(self, **kwargs):
+        return self
+
+    def _create(self, stream: bool = False, **kwargs):
+        delay = self.delay.sample()
+        if stream:
+            return _StandInStream(delay)
+        time.sleep(delay)
+        message = SimpleNamespace(content=_LLM_RESPONSE)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _spend(seconds: float, mode: str) -> None:
+    """Spend ``seconds`` the way Tesseract would: CPU in a child process, or just waiting"""
+    if seconds <= 0:
+        return
+    if mode == "cpu":
+        subprocess.run([sys.executable, "-c", _BURN, f"{seconds:.3f}"], check=True)
+    else:
+        time.sleep(seconds)
+
+
+def install_standins() -> None:
+    """Replace the LLM upstream, Tesseract OCR and page triage in this process (a server worker)"""
+    import llm
+    import pdf_analyzer
+    from config import Config
+    from page_triage import RELEVANT, IRRELEVANT
+
+    env = {name: os.environ[var] for name, var in STANDIN_ENV.items() if var in os.environ}
+    rng = random.Random(os.getpid())
+    llm_delay = _LognormalDelay(float(env.get("llm_median", 3.0)), float(env.get("llm_sigma", 0.5)), rng)
+    ocr_delay = _LognormalDelay(float(env.get("ocr_median", 1.5)), float(env.get("ocr_sigma", 0.35)), rng)
+    ocr_mode = env.get("ocr_mode", "cpu")
+    triage_skip = float(env.get("triage_skip", 0.5))
+
+    Config.OPENROUTER_API_KEY = Config.OPENROUTER_API_KEY or "stand-in"
+    llm.OpenAI = lambda **kwargs: StandInOpenAI(llm_delay)
+
+    def ocr_page(source, dpi):
+        started = time.perf_counter()
+        image, dpi = source.render(dpi)
+        render_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        _spend(ocr_delay.sample(), ocr_mode)
+        timings = {"render": round(render_ms, 1), "tesseract": round((time.perf_counter() - started) * 1000, 1)}
+        return "\n".join(_LABEL_LINES), {"page": source.page_number, "dpi": dpi, "size": image.size,
+                                         "escalation": None, "timings": timings}
+
+    def triage_page(source):
+        started = time.perf_counter()
+        _spend(ocr_delay.sample() / 10, ocr_mode)
+        page_class = IRRELEVANT if rng.random() < triage_skip else RELEVANT
+        return {"class": page_class, "reason": "stand-in", "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    pdf_analyzer.ocr_page = ocr_page
+    pdf_analyzer.triage_page = triage_page
+
+
+def standin_app():
+    """ASGI app of one server worker, with the stand-ins installed before any service is built"""
+    install_standins()
+    from app import app
+    return app
+
+
+def serve_standins(port: int, workers: int) -> None:
+    """Entry point of the server subprocess"""
+    import serve
+    serve.run(f"127.0.0.1:{port}", workers, load=standin_app)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StandInServer:
+    """A serve.py server with stand-ins in a subprocess, fresh per load level"""
+
+    def __init__(self, args, log_path: str, store_dir: str):
+        self.args = args
+        self.log_path = log_path
+        self.store_dir = store_dir
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+
+    def __enter__(self):
+        env = dict(os.environ)
+        env.update({var: str(getattr(self.args, name)) for name, var in STANDIN_ENV.items()})
+        env.update({
+            "OCR_CACHE_ENABLED": "false",
+            "RESULT_STORE_PATH": os.path.join(self.store_dir, f"results-{self.port}.db"),
+            "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+            "WORKER_MAX_REQUESTS": env.get("WORKER_MAX_REQUESTS", "0"),
+        })
+        self.log = open(self.log_path, "ab")
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve-standins", str(self.port),
+             "--workers", str(self.args.workers)],
+            cwd=BACKEND_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + self.args.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"stand-in server exited with {self.process.returncode}, see {self.log_path}")
+            if _ready(self.url, self.args.workers):
+                return self
+            time.sleep(0.25)
+        self.__exit__()
+        raise RuntimeError(f"stand-in server not ready after {self.args.startup_timeout}s, see {self.log_path}")
+
+    def __exit__(self, *exc):
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+
+def _ready(url: str, workers: int) -> bool:
+    """True once /health answers with warm services (probed a few times to reach several workers)"""
+    for _ in range(workers):
+        try:
+            status, body, _ = _request(url, "GET", "/health", None, {}, timeout=2)
+        except OSError:
+            return False
+        if status != 200 or not json.loads(body).get("warm", True):
+            return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Workload
+# ---------------------------------------------------------------------------
+
+def digital_pdf(serial: str) -> bytes:
+    """One-page label with a text layer (nutrition table read from its layout)"""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(f"Load test label {serial}")
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(60, 800, f"Crunchy Muesli - lot {serial}")
+    for i, line in enumerate(_LABEL_LINES[1:3]):
+        pdf.drawString(60, 780 - 15 * i, line)
+    y = 720
+    for label, per_100, serving in [("Nutrition information", "per 100 g", "per serving"),
+                                    ("Energy", "1580 kJ / 375 kcal", "474 kJ / 113 kcal"), ("Fat", "9.5 g", "2.9 g"),
+                                    ("Carbohydrate", "61 g", "18 g"), ("of which sugars", "21 g", "6.3 g"),
+                                    ("Protein", "9.8 g", "2.9 g"), ("Salt", "0.35 g", "0.11 g")]:
+        pdf.drawString(60, y, label)
+        pdf.drawString(220, y, per_100)
+        pdf.drawString(340, y, serving)
+        y -= 14
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _scan(serial: str, page: int, label: bool) -> Image.Image:
+    """A 150 DPI grayscale A4 page scan, with a little noise so every JPEG differs"""
+    image = Image.new("L", (1240, 1754), 250)
+    draw = ImageDraw.Draw(image)
+    lines = _LABEL_LINES if label else ["Our story", "Grown and packed with care since 1952."] * 5
+    draw.text((90, 90), f"Lot {serial} - page {page}", fill=20)
+    for i, line in enumerate(lines):
+        draw.text((90, 140 + 28 * i), line, fill=20)
+    rng = random.Random(f"{serial}-{page}")
+    for _ in range(400):
+        x, y = rng.randrange(1240), rng.randrange(1754)
+        draw.point((x, y), fill=rng.randrange(120, 220))
+    return image
+
+
+def scanned_pdf(serial: str, pages: int = 1) -> bytes:
+    """Image-only PDF (one embedded JPEG per page); the label is on the last page"""
+    images = [_scan(serial, page + 1, label=page == pages - 1) for page in range(pages)]
+    buffer = io.BytesIO()
+    images[0].save(buffer, "PDF", resolution=150.0, save_all=True, append_images=images[1:],
+                   title=f"Load test scan {serial}")
+    return buffer.getvalue()
+
+
+def generate_payload(serial: str) -> dict:
+    response = json.loads(_LLM_RESPONSE)
+    return {"allergens": response["allergens"], "nutritional_values": response["nutritional_values"],
+            "language": random.Random(serial).choice(["en", "de", "fr", "hu"])}
+
+
+def _multipart(fields: dict, filename: str, content: bytes) -> tuple:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f"Content-Type: application/pdf\r\n\r\n".encode() + content + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def build_request(kind: str, serial: str, multipage_pages: int) -> dict:
+    """Method, path, body and headers of one request of ``kind``; every upload is a distinct file"""
+    if kind == "generate":
+        return {"kind": kind, "path": "/generate-pdf", "body": json.dumps(generate_payload(serial)).encode(),
+                "headers": {"Content-Type": "application/json"}}
+    if kind == "digital":
+        content = digital_pdf(serial)
+    elif kind == "scanned":
+        content = scanned_pdf(serial)
+    else:
+        content = scanned_pdf(serial, multipage_pages)
+    body, content_type = _multipart({"language": "en"}, f"{kind}-{serial}.pdf", content)
+    return {"kind": kind, "path": "/upload", "body": body, "headers": {"Content-Type": content_type}}
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for item in spec.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"unknown request kind {kind!r} (choose from {', '.join(KINDS)})")
+        mix[kind] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return mix
+
+
+def schedule(rate: float, duration: float, mix: dict, rng: random.Random) -> list:
+    """(offset seconds, kind) of every arrival of a Poisson process at ``rate`` over ``duration``"""
+    kinds, weights = zip(*mix.items())
+    arrivals, offset = [], 0.0
+    while True:
+        offset += rng.expovariate(rate)
+        if offset >= duration:
+            return arrivals
+        arrivals.append((offset, rng.choices(kinds, weights)[0]))
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+def _request(url: str, method: str, path: str, body, headers: dict, timeout: float) -> tuple:
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read(), response.getheader("X-Request-ID")
+    finally:
+        connection.close()
+
+
+def _send(url: str, request: dict, due: float, timeout: float, request_id: str) -> dict:
+    sent = time.perf_counter()
+    headers = {**request["headers"], "X-Request-ID": request_id}
+    try:
+        status, _, _ = _request(url, "POST", request["path"], request["body"], headers, timeout)
+        outcome = str(status)
+    except socket.timeout:
+        status, outcome = None, "timeout"
+    except OSError as e:
+        status, outcome = None, type(e).__name__
+    done = time.perf_counter()
+    return {"kind": request["kind"], "ok": status is not None and 200 <= status < 300, "outcome": outcome,
+            "latency": done - due, "wait": sent - due, "done": done}
+
+
+def _process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of ``pid`` and all its descendants, in MB"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fh:
+                ppid = int(fh.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/statm") as fh:
+                total += int(fh.read().split()[1])
+        except (OSError, ValueError):
+            continue
+    return total * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class RssSampler(threading.Thread):
+    """Peak resident memory of a process tree, sampled in the background"""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            self.peak_mb = max(self.peak_mb, _process_tree_rss_mb(self.pid))
+            self._halt.wait(self.interval)
+
+    def stop(self) -> float:
+        self._halt.set()
+        self.join()
+        return round(self.peak_mb, 1)
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0..100); 0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def summarize(results: list, window: float) -> dict:
+    latencies = [r["latency"] for r in results if r["ok"]]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["outcome"]] = errors.get(r["outcome"], 0) + 1
+    return {
+        "requests": len(results),
+        "throughput": round(len(latencies) / window, 3) if window > 0 else 0.0,
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "max": round(max(latencies, default=0.0), 3),
+        "error_rate": round(sum(errors.values()) / len(results), 4) if results else 0.0,
+        "errors": errors,
+    }
+
+
+def run_level(url: str, rate: float, args, rng: random.Random, server_pid: int = None) -> dict:
+    """Offer ``rate`` requests per second for ``args.duration`` seconds and summarize the responses"""
+    arrivals = schedule(rate, args.duration, args.mix, rng)
+    run_id = uuid.uuid4().hex[:6]
+    requests = [build_request(kind, f"{run_id}-{i:05d}", args.multipage_pages) for i, (_, kind) in enumerate(arrivals)]
+
+    sampler = RssSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.max_inflight, thread_name_prefix="load") as pool:
+        started = time.perf_counter()
+        for i, ((offset, _), request) in enumerate(zip(arrivals, requests)):
+            due = started + offset
+            pause = due - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+            futures.append(pool.submit(_send, url, request, due, args.timeout, f"load-{run_id}-{i:05d}"))
+        results = [future.result() for future in futures]
+    peak_rss = sampler.stop() if sampler else None
+
+    window = max((r["done"] for r in results), default=started) - started
+    level = {"name": f"rate={rate:g}", "rate": rate, "duration": args.duration, **summarize(results, window),
+             "offered": round(len(arrivals) / args.duration, 3), "peak_rss_mb": peak_rss,
+             "client_wait_p99": round(percentile([r["wait"] for r in results], 99), 3), "by_kind": {}}
+    for kind in args.mix:
+        of_kind = [r for r in results if r["kind"] == kind]
+        if of_kind:
+            summary = summarize(of_kind, window)
+            level["by_kind"][kind] = {key: summary[key] for key in ("requests", "p50", "p95", "p99", "error_rate")}
+    level["slo_ok"] = level["requests"] > 0 and level["p99"] <= args.slo_p99 and level["error_rate"] <= args.slo_error_rate
+    return level
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def print_level(level: dict) -> None:
+    rss = f"{level['peak_rss_mb']:.0f}" if level["peak_rss_mb"] is not None else "-"
+    print(f"{level['name']:<10} {level['offered']:>7.2f} {level['throughput']:>7.2f} {level['p50']:>7.2f} "
+          f"{level['p95']:>7.2f} {level['p99']:>7.2f} {level['error_rate'] * 100:>6.1f}% {rss:>8} "
+          f"{'ok' if level['slo_ok'] else 'MISS':>5}")
+    for kind, stats in level["by_kind"].items():
+        print(f"  {kind:<10} {stats['requests']:>5} req  p50 {stats['p50']:.2f}s  p95 {stats['p95']:.2f}s  "
+              f"p99 {stats['p99']:.2f}s  errors {stats['error_rate'] * 100:.1f}%")
+    if level["errors"]:
+        print(f"  errors: {', '.join(f'{outcome} x{count}' for outcome, count in sorted(level['errors'].items()))}")
+    if level["client_wait_p99"] > 0.5:
+        print(f"  ⚠️ the client itself fell behind (p99 send delay {level['client_wait_p99']:.2f}s): "
+              f"raise --max-inflight")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of ``report`` against ``baseline``, as printable lines"""
+    regressions = []
+    if report["settings"] != baseline.get("settings"):
+        print("⚠️ baseline was recorded with different settings; the comparison is only indicative")
+    previous = {level["name"]: level for level in baseline.get("levels", [])}
+    print(f"\n{'level':<10} {'metric':<12} {'baseline':>10} {'now':>10} {'change':>8}")
+    for level in report["levels"]:
+        before = previous.get(level["name"])
+        if before is None:
+            continue
+        checks = [(metric, True) for metric in ("p50", "p95", "p99", "peak_rss_mb")] + [("throughput", False)]
+        for metric, lower_is_better in checks:
+            old, new = before.get(metric), level.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            print(f"{level['name']:<10} {metric:<12} {old:>10.2f} {new:>10.2f} {change * 100:>+7.1f}%"
+                  f"{'  ← regression' if worse else ''}")
+            if worse:
+                regressions.append(f"{level['name']} {metric}: {old:.2f} → {new:.2f}")
+        if level["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{level['name']} error rate: {before['error_rate']:.1%} → {level['error_rate']:.1%}")
+        if before["slo_ok"] and not level["slo_ok"]:
+            regressions.append(f"{level['name']} no longer meets the SLO")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", default="0.5,1,2", help="Arrival rates to test, requests per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--mix", type=parse_mix, default="digital=4,scanned=3,multipage=1,generate=2",
+                        help="Request kinds and weights: " + ", ".join(KINDS))
+    parser.add_argument("--multipage-pages", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=180.0, help="Client timeout per request")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Client threads (concurrent requests)")
+    parser.add_argument("--url", help="Test this running server instead of starting a stand-in server")
+    parser.add_argument("--server-pid", type=int, help="With --url: process whose tree's RSS to sample")
+    parser.add_argument("--workers", type=int, default=1, help="Stand-in server: gunicorn workers")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--server-log", help="Stand-in server output (default: a temporary file)")
+    parser.add_argument("--llm-median", type=float, default=3.0, help="Stand-in LLM latency median, seconds")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="Stand-in LLM latency log-normal sigma")
+    parser.add_argument("--ocr-median", type=float, default=1.5, help="Stand-in OCR time per page median, seconds")
+    parser.add_argument("--ocr-sigma", type=float, default=0.35, help="Stand-in OCR time log-normal sigma")
+    parser.add_argument("--ocr-mode", choices=["cpu", "sleep"], default="cpu")
+    parser.add_argument("--triage-skip", type=float, default=0.5, help="Stand-in triage: share of pages skipped")
+    parser.add_argument("--slo-p99", type=float, default=20.0, help="SLO: p99 latency, seconds")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01, help="SLO: share of failed requests")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Compare against this report; exit 1 on regression")
+    parser.add_argument("--save-baseline", help="Store the report as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative change before a regression")
+    parser.add_argument("--serve-standins", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_standins:
+        serve_standins(args.serve_standins, args.workers)
+        return 0
+
+    rates = [float(rate) for rate in args.rates.split(",")]
+    rng = random.Random(args.seed)
+    settings = {key: getattr(args, key) for key in ("duration", "mix", "multipage_pages", "seed", "workers",
+                                                    "slo_p99", "slo_error_rate")}
+    if args.url:
+        settings["url"] = args.url
+    else:
+        settings.update({name: getattr(args, name) for name in STANDIN_ENV})
+
+    target = args.url or f"stand-in server ({args.workers} worker(s), {args.ocr_mode} OCR)"
+    print(f"Load test against {target}: {args.duration:g}s per rate, mix "
+          f"{', '.join(f'{kind}={weight:g}' for kind, weight in args.mix.items())}\n")
+    print(f"{'level':<10} {'offered':>7} {'tput':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'errors':>7} "
+          f"{'RSS MB':>8} {'SLO':>5}")
+
+    levels = []
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = args.server_log or os.path.join(tmp, "server.log")
+        for rate in rates:
+            if args.url:
+                level = run_level(args.url, rate, args, rng, args.server_pid)
+            else:
+                with StandInServer(args, log_path, tmp) as server:
+                    level = run_level(server.url, rate, args, rng, server.process.pid)
+            print_level(level)
+            levels.append(level)
+
+    passing = [level["rate"] for level in levels if level["slo_ok"]]
+    report = {"settings": settings, "levels": levels, "max_rate_within_slo": max(passing, default=None)}
+    print(f"\nHighest rate within the SLO (p99 ≤ {args.slo_p99:g}s, errors ≤ {args.slo_error_rate:.1%}): "
+          f"{report['max_rate_within_slo'] if passing else 'none'}")
+
+    for path in filter(None, [args.json, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"📝 Report written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\n✅ No regression against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
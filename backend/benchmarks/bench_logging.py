@@ -0,0 +1,163 @@
+# bench_logging.py - Per-request cost of logging on the analysis path
+"""
+Measure what logging costs one analysis request, before and after the
+move to queued, lazily formatted JSON logging.
+
+Usage (from backend/):
+    python benchmarks/bench_logging.py [--pdf label.pdf] [--requests 2000]
+
+First one real analysis runs (``--pdf``, or a generated 3-page digital
+label; the LLM is a stub answering instantly) with every event of the
+"be_aware_backend" logger captured. That request's events are then
+replayed ``--requests`` times per setup, each replay bound to its own
+request ID and followed by ``--gap-ms`` of idle time (the request waiting
+on OCR or the LLM, when the listener thread catches up), writing to a
+temporary file:
+
+  before        every event at INFO, message formatted by the caller
+                (f-string) and written on the request thread - how the
+                "🔍 DEBUG" lines used to be logged
+  sync-info     INFO events only, lazy formatting, written on the request thread
+  queue-info    INFO events only, JSON via the log queue (the default)
+  queue-debug   every event, JSON via the log queue
+  queue-sample  every event, JSON via the log queue, DEBUG kept for 10% of requests
+
+The report shows, per request, the time spent in logging calls on the
+request thread, the process CPU time logging used (including the
+listener thread), and the lines / bytes written.
+"""
+import io
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from config import Config  # noqa: E402
+from structured_logging import app_logger, bind, configure_logging, flush_logging  # noqa: E402
+
+SETUPS = [
+    ("before", dict(level="INFO", fmt="text", use_queue=False)),
+    ("sync-info", dict(level="INFO", fmt="text", use_queue=False)),
+    ("queue-info", dict(level="INFO", fmt="json", use_queue=True)),
+    ("queue-debug", dict(level="DEBUG", fmt="json", use_queue=True, sample_rate=1.0)),
+    ("queue-sample", dict(level="DEBUG", fmt="json", use_queue=True, sample_rate=0.1)),
+]
+
+_RESPONSE = json.dumps({
+    "allergens": {"gluten": True, "milk": True, "soy": False},
+    "nutritional_values": {"energy": "1580 kJ / 375 kcal", "fat": "9.5 g", "carbohydrate": "61 g",
+                           "sugar": "21 g", "protein": "9.8 g", "sodium": "0.35 g (as salt)"},
+    "metadata": {"language_detected": "en", "confidence": "high"},
+})
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.events = []
+
+    def emit(self, record):
+        self.events.append((record.levelno, record.msg, record.args))
+
+
+def label_pdf(pages: int = 3) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(pages):
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(60, 780, f"Crunchy Muesli - page {page + 1}")
+        pdf.drawString(60, 760, "Ingredients: oat flakes (gluten), sugar, hazelnuts, skimmed milk powder, salt.")
+        pdf.drawString(60, 745, "May contain traces of peanuts and soy. Store in a cool, dry place.")
+        y = 700
+        for label, per_100, serving in [("Energy", "1580 kJ / 375 kcal", "474 kJ / 113 kcal"), ("Fat", "9.5 g", "2.9 g"),
+                                        ("Carbohydrate", "61 g", "18 g"), ("of which sugars", "21 g", "6.3 g"),
+                                        ("Protein", "9.8 g", "2.9 g"), ("Salt", "0.35 g", "0.11 g")]:
+            pdf.drawString(60, y, label)
+            pdf.drawString(220, y, per_100)
+            pdf.drawString(340, y, serving)
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def capture_request(pdf_bytes: bytes) -> list:
+    """Every be_aware_backend log event of one analysis, as (level, msg, args)"""
+    Config.RESULT_STORE_ENABLED = False
+    from services import Services
+    analyzer = Services().pdf_analyzer
+    analyzer.llm_client.configured = True
+    analyzer.llm_client.call_hedged = lambda prompt, **kwargs: (_RESPONSE, kwargs["model"])
+    analyzer.analyze(pdf_bytes, filename="label.pdf")  # warm caches / lazy imports
+
+    capture = _Capture()
+    app_logger.addHandler(capture)
+    app_logger.setLevel(logging.DEBUG)
+    try:
+        analyzer.analyze(pdf_bytes, filename="label.pdf")
+    finally:
+        app_logger.removeHandler(capture)
+    return capture.events
+
+
+def replay(name: str, setup: dict, events: list, requests: int, gap: float, log_path: str) -> dict:
+    eager = name == "before"
+    in_calls = 0.0
+    with open(log_path, "w", encoding="utf-8") as log_file:
+        configure_logging(stream=log_file, **setup)
+        cpu_started = time.process_time()
+        for i in range(requests):
+            started = time.perf_counter()
+            with bind(f"req-{i:06d}"):
+                for level, msg, args in events:
+                    if eager:
+                        app_logger.info(msg % args if args else msg)
+                    else:
+                        app_logger.log(level, msg, *args)
+            in_calls += time.perf_counter() - started
+            time.sleep(gap)  # the request waiting on OCR / the LLM
+        flush_logging()
+        log_file.flush()
+        cpu = time.process_time() - cpu_started
+    configure_logging(use_queue=False, stream=io.StringIO())  # release the file
+    with open(log_path, encoding="utf-8") as log_file:
+        lines = log_file.read().splitlines()
+    return {"request_us": in_calls / requests * 1e6, "cpu_us": cpu / requests * 1e6,
+            "lines": len(lines) / requests, "bytes": sum(len(line.encode()) + 1 for line in lines) / requests}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="Label PDF to capture the events of (default: generated digital PDF)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--gap-ms", type=float, default=1.0, help="Idle time between requests")
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as fh:
+            pdf_bytes = fh.read()
+    else:
+        pdf_bytes = label_pdf()
+    configure_logging(use_queue=False, stream=io.StringIO())
+    events = capture_request(pdf_bytes)
+    debug_events = sum(1 for level, _, _ in events if level < logging.INFO)
+    print(f"One request logs {len(events)} events ({debug_events} DEBUG); {args.requests} replays per setup\n")
+
+    print(f"{'setup':<14} {'request µs':>11} {'CPU µs':>8} {'lines/req':>10} {'bytes/req':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, setup in SETUPS:
+            row = replay(name, setup, events, args.requests, args.gap_ms / 1000, os.path.join(tmp, f"{name}.log"))
+            print(f"{name:<14} {row['request_us']:>11.1f} {row['cpu_us']:>8.1f} "
+                  f"{row['lines']:>10.1f} {row['bytes']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
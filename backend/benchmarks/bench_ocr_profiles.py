@@ -0,0 +1,140 @@
+# bench_ocr_profiles.py - Speed/accuracy of the OCR profiles on a PDF corpus
+"""
+Benchmark the OCR profiles in Config.OCR_PROFILES on a corpus of label PDFs.
+
+Usage (from backend/):
+    python benchmarks/bench_ocr_profiles.py [path/to/corpus] [--profiles fast,accurate]
+        [--max-pages 3] [--json out.json]
+
+Every page is OCR'd through the production pipeline (ocr_pipeline.ocr_page:
+first pass, ROI / DPI escalation, preprocessing) once per profile, with the
+page cache bypassed. For each profile the report shows the model set and
+whether it is installed, the mean time per page, the mean final DPI, how
+often pages escalated, mean word confidence and, when a ground-truth
+``<name>.txt`` sits next to ``<name>.pdf``, character accuracy (difflib
+ratio against the ground truth). The corpus defaults to
+``benchmarks/samples``, four scanned labels with ground truth written by
+make_label_samples.py.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import difflib
+from statistics import mean
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract  # noqa: E402
+from PyPDF2 import PdfReader  # noqa: E402
+
+from config import Config  # noqa: E402
+from ocr_pipeline import first_pass_dpi, ocr_page, page_sources  # noqa: E402
+from ocr_profiles import PROFILES, bind  # noqa: E402
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def run(corpus: str, profiles: list, max_pages: int) -> dict:
+    pdfs = sorted(f for f in os.listdir(corpus) if f.lower().endswith(".pdf"))
+    if not pdfs:
+        raise SystemExit(f"No PDFs found in {corpus}")
+
+    rows = {name: {"ms": [], "dpi": [], "escalated": [], "confidence": [], "accuracy": []}
+            for name in profiles}
+
+    for pdf in pdfs:
+        path = os.path.join(corpus, pdf)
+        with open(path, "rb") as fh:
+            pdf_bytes = fh.read()
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding="utf-8") as fh:
+                truth = _normalize(fh.read())
+        try:
+            reader = PdfReader(path)
+        except Exception:
+            reader = None
+
+        for name in profiles:
+            with bind(PROFILES[name]):
+                dpi = first_pass_dpi()
+                started = time.perf_counter()
+                sources = page_sources(pdf_bytes, reader, dpi)[:max_pages]
+                render_ms = (time.perf_counter() - started) * 1000 / max(1, len(sources))
+                texts = []
+                for source in sources:
+                    started = time.perf_counter()
+                    text, info = ocr_page(source, dpi)
+                    row = rows[name]
+                    row["ms"].append(render_ms + (time.perf_counter() - started) * 1000)
+                    row["dpi"].append(info["dpi"])
+                    row["escalated"].append(1 if info["escalation"] else 0)
+                    if info["confidence"] is not None:
+                        row["confidence"].append(info["confidence"])
+                    texts.append(text)
+            print(f"📄 {pdf} [{name}]: {len(sources)} page(s)", file=sys.stderr)
+            if truth:
+                ocr_text = _normalize(" ".join(texts))
+                rows[name]["accuracy"].append(difflib.SequenceMatcher(None, truth, ocr_text).ratio())
+
+    report = {}
+    for name, row in rows.items():
+        profile = PROFILES[name]
+        report[name] = {
+            "models": profile.models,
+            "installed": profile.installed,
+            "page_ms": round(mean(row["ms"]), 1) if row["ms"] else None,
+            "mean_dpi": round(mean(row["dpi"])) if row["dpi"] else None,
+            "escalated_share": round(mean(row["escalated"]), 2) if row["escalated"] else None,
+            "mean_confidence": round(mean(row["confidence"]), 1) if row["confidence"] else None,
+            "accuracy": round(mean(row["accuracy"]), 3) if row["accuracy"] else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", default=SAMPLES,
+                        help="Directory of PDFs (optional <name>.txt ground truth); defaults to the samples")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profiles to compare")
+    parser.add_argument("--max-pages", type=int, default=3, help="Pages per PDF to benchmark")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    unknown = [name for name in profiles if name not in PROFILES]
+    if unknown:
+        raise SystemExit(f"Unknown profile(s): {', '.join(unknown)}. Configured: {', '.join(PROFILES)}")
+
+    pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_CMD
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        raise SystemExit(f"Tesseract not found ({Config.TESSERACT_CMD}): the profiles cannot be measured")
+    report = run(args.corpus, profiles, args.max_pages)
+
+    print(f"{'profile':<10} {'models':<8} {'inst':>5} {'page ms':>8} {'DPI':>5} {'esc':>5} {'conf':>6} {'acc':>6}")
+    for name, r in report.items():
+        acc = f"{r['accuracy']:.3f}" if r["accuracy"] is not None else "-"
+        cells = [str(r[key] if r[key] is not None else "-")
+                 for key in ("page_ms", "mean_dpi", "escalated_share", "mean_confidence")]
+        print(f"{name:<10} {r['models']:<8} {'yes' if r['installed'] else 'no':>5} {cells[0]:>8} "
+              f"{cells[1]:>5} {cells[2]:>5} {cells[3]:>6} {acc:>6}")
+    missing = [name for name, r in report.items() if not r["installed"]]
+    if missing:
+        print(f"\n⚠️ Model directory missing for {', '.join(missing)}: measured with the system models")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# bench_preprocessing.py - OCR preprocessing speed/accuracy tradeoff on a PDF corpus
+"""
+Benchmark the OCR image preprocessing steps on a corpus of label PDFs.
+
+Usage (from backend/):
+    python benchmarks/bench_preprocessing.py path/to/corpus [--max-pages 3] [--json out.json]
+        [--skip-ocr]
+
+Every page is rasterized once at Config.PDF_DPI (image-only pages are
+decoded directly, as in production) and OCR'd with each preprocessing
+variant (none, grayscale, +binarize, +deskew, +crop). For each variant
+the report shows the mean per-step preprocessing time, Tesseract time,
+pixels handed to Tesseract, mean word confidence and, when a ground-truth
+``<name>.txt`` sits next to ``<name>.pdf``, character accuracy (difflib
+ratio against the ground truth). ``--skip-ocr`` only measures the
+preprocessing side. ``benchmarks/samples`` (see make_label_samples.py)
+is a small corpus with ground truth.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import difflib
+from statistics import mean
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract  # noqa: E402
+from PyPDF2 import PdfReader  # noqa: E402
+
+from config import Config  # noqa: E402
+from image_preprocessing import preprocess  # noqa: E402
+from ocr_pipeline import page_sources  # noqa: E402
+
+VARIANTS = {
+    "none": [],
+    "grayscale": ["grayscale"],
+    "binarize": ["grayscale", "binarize"],
+    "deskew": ["grayscale", "binarize", "deskew"],
+    "full": ["grayscale", "binarize", "deskew", "crop"],
+}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def _ocr(image):
+    tess_config = f"--psm {Config.TESSERACT_PSM} --oem {Config.TESSERACT_OEM}"
+    started = time.perf_counter()
+    data = pytesseract.image_to_data(image, lang=Config.OCR_LANGUAGES, config=tess_config,
+                                     output_type=pytesseract.Output.DICT)
+    elapsed = (time.perf_counter() - started) * 1000
+    confs = [float(c) for c in data["conf"] if float(c) >= 0]
+    text = " ".join(w for w in data["text"] if w.strip())
+    return text, elapsed, (mean(confs) if confs else 0.0)
+
+
+def run(corpus: str, max_pages: int, skip_ocr: bool = False) -> dict:
+    pdfs = sorted(f for f in os.listdir(corpus) if f.lower().endswith(".pdf"))
+    if not pdfs:
+        raise SystemExit(f"No PDFs found in {corpus}")
+
+    rows = {name: {"steps": {}, "tesseract_ms": [], "pixels": [], "confidence": [], "accuracy": []}
+            for name in VARIANTS}
+
+    for pdf in pdfs:
+        path = os.path.join(corpus, pdf)
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding="utf-8") as fh:
+                truth = _normalize(fh.read())
+
+        with open(path, "rb") as fh:
+            pdf_bytes = fh.read()
+        try:
+            reader = PdfReader(path)
+        except Exception:
+            reader = None
+        pages = [source.render(Config.PDF_DPI)[0]
+                 for source in page_sources(pdf_bytes, reader, Config.PDF_DPI)[:max_pages]]
+        print(f"📄 {pdf}: {len(pages)} page(s)", file=sys.stderr)
+        document_text = {name: [] for name in VARIANTS}
+
+        for page in pages:
+            for name, steps in VARIANTS.items():
+                image, timings = preprocess(page, steps)
+                row = rows[name]
+                for step, ms in timings.items():
+                    if step != "deskew_angle":
+                        row["steps"].setdefault(step, []).append(ms)
+                row["pixels"].append(image.size[0] * image.size[1])
+                if skip_ocr:
+                    continue
+                text, tess_ms, conf = _ocr(image)
+                row["tesseract_ms"].append(tess_ms)
+                row["confidence"].append(conf)
+                document_text[name].append(text)
+
+        if truth and not skip_ocr:
+            for name in VARIANTS:
+                ocr_text = _normalize(" ".join(document_text[name]))
+                rows[name]["accuracy"].append(difflib.SequenceMatcher(None, truth, ocr_text).ratio())
+
+    report = {}
+    for name, row in rows.items():
+        preprocess_ms = sum(mean(v) for v in row["steps"].values()) if row["steps"] else 0.0
+        tesseract_ms = mean(row["tesseract_ms"]) if row["tesseract_ms"] else None
+        report[name] = {
+            "steps_ms": {step: round(mean(v), 1) for step, v in row["steps"].items()},
+            "preprocess_ms": round(preprocess_ms, 1),
+            "tesseract_ms": round(tesseract_ms, 1) if tesseract_ms is not None else None,
+            "total_ms": round(preprocess_ms + (tesseract_ms or 0.0), 1),
+            "megapixels": round(mean(row["pixels"]) / 1e6, 2),
+            "mean_confidence": round(mean(row["confidence"]), 1) if row["confidence"] else None,
+            "accuracy": round(mean(row["accuracy"]), 3) if row["accuracy"] else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory of PDFs (optional <name>.txt ground truth)")
+    parser.add_argument("--max-pages", type=int, default=3, help="Pages per PDF to benchmark")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    parser.add_argument("--skip-ocr", action="store_true", help="Only time preprocessing (no Tesseract needed)")
+    args = parser.parse_args()
+
+    pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_CMD
+    report = run(args.corpus, args.max_pages, args.skip_ocr)
+
+    print(f"{'variant':<10} {'prep ms':>8} {'tess ms':>8} {'total ms':>9} {'MPx':>6} {'conf':>6} {'acc':>6}")
+    for name, r in report.items():
+        acc = f"{r['accuracy']:.3f}" if r["accuracy"] is not None else "-"
+        tess = r["tesseract_ms"] if r["tesseract_ms"] is not None else "-"
+        conf = r["mean_confidence"] if r["mean_confidence"] is not None else "-"
+        print(f"{name:<10} {r['preprocess_ms']:>8} {tess:>8} {r['total_ms']:>9} "
+              f"{r['megapixels']:>6} {conf:>6} {acc:>6}")
+    print("\nPer-step preprocessing (ms):", json.dumps(report["full"]["steps_ms"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
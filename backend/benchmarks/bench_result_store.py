@@ -0,0 +1,106 @@
+# bench_result_store.py - Query latency of the result store at catalogue scale
+"""
+Fill a throwaway result store with synthetic products and time typical queries.
+
+Usage (from backend/):
+    python benchmarks/bench_result_store.py [--rows 300000] [--repeat 20] [--db /tmp/bench_results.db]
+
+Rows get random allergen sets (each allergen present in ~20% of products)
+and random nutrient amounts, written in bulk straight into the store's
+schema. Each query (first page, limit 50) runs ``--repeat`` times; the
+report shows median and p95 latency and the query plan SQLite chose.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_store import ALLERGEN_KEYS, NUTRIENT_COLUMNS, ResultStore  # noqa: E402
+
+QUERIES = [
+    ("contains mustard, free of milk", {"contains": ["mustard"], "free_of": ["milk"]}),
+    ("free of the ten allergens", {"free_of": list(ALLERGEN_KEYS)}),
+    ("contains peanut + soy + celery", {"contains": ["peanut", "soy", "celery"]}),
+    ("sugar <= 5 g", {"ranges": {"sugar": (None, 5)}}),
+    ("protein >= 20 g, free of gluten", {"free_of": ["gluten"], "ranges": {"protein": (20, None)}}),
+    ("energy 100-200 kcal, contains fish", {"contains": ["fish"], "ranges": {"energy": (100, 200)}}),
+    ("contains five allergens (rare)", {"contains": ["gluten", "egg", "fish", "milk", "celery"]}),
+    ("sugar < 0.05 g (rare)", {"ranges": {"sugar": (None, 0.05)}}),
+    ("no filter", {}),
+]
+
+
+def fill(store: ResultStore, rows: int) -> None:
+    conn = store._conn()
+    existing = store.count()
+    if existing >= rows:
+        return
+    rng = random.Random(42)
+    columns = ["sha256", "language", "profile", "filename", "analyzed_at", "allergens",
+               *NUTRIENT_COLUMNS.values()]
+    sql = f"INSERT INTO results ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    batch = []
+    for i in range(existing, rows):
+        mask = sum(1 << bit for bit in range(len(ALLERGEN_KEYS)) if rng.random() < 0.2)
+        nutrients = [round(rng.uniform(0, 900), 1)] + [round(rng.uniform(0, 60), 2)
+                                                        for _ in range(len(NUTRIENT_COLUMNS) - 1)]
+        batch.append((f"{i:064x}", "en", "balanced", f"product_{i}.pdf", time.time(), mask,
+                      *nutrients))
+        if len(batch) == 10000:
+            conn.executemany(sql, batch)
+            batch.clear()
+    conn.executemany(sql, batch)
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", default="/tmp/bench_results.db")
+    args = parser.parse_args()
+
+    store = ResultStore(args.db)
+    started = time.perf_counter()
+    fill(store, args.rows)
+    print(f"{store.count()} rows in {args.db} (filled in {time.perf_counter() - started:.1f}s)\n")
+
+    print(f"{'query':<38} {'rows':>5} {'median ms':>10} {'p95 ms':>8}  plan")
+    for name, filters in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            page = store.query(limit=50, **filters)
+            timings.append(page["query_ms"])
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        plan = _plan(store, filters)
+        print(f"{name:<38} {len(page['items']):>5} {median(timings):>10.2f} {p95:>8.2f}  {plan}")
+
+
+def _plan(store: ResultStore, filters: dict) -> str:
+    """SQLite's plan for the final statement ResultStore.query runs"""
+    captured = {}
+    conn = store._conn()
+    original = store._conn
+
+    class Recorder:
+        def execute(self, sql, params=()):
+            captured["sql"], captured["params"] = sql, params
+            return conn.execute(sql, params)
+
+    store._conn = lambda: Recorder()
+    try:
+        store.query(limit=50, **filters)
+    finally:
+        store._conn = original
+    rows = conn.execute("EXPLAIN QUERY PLAN " + captured["sql"], captured["params"]).fetchall()
+    return "; ".join(row["detail"] for row in rows)
+
+
+if __name__ == "__main__":
+    main()
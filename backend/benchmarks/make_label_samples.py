@@ -0,0 +1,125 @@
+# make_label_samples.py - Small synthetic scanned-label corpus for the OCR benchmarks
+"""
+Write a handful of scanned-label PDFs with ground-truth text.
+
+Usage (from backend/):
+    python benchmarks/make_label_samples.py [benchmarks/samples]
+
+Each ``<name>.pdf`` is a single image-only page (a JPEG at 300 DPI, so the
+pipeline decodes it directly, without poppler) next to ``<name>.txt`` with
+the exact label text. The variants cover the conditions preprocessing is
+meant for: a clean scan, a skewed one, uneven lighting and a noisy,
+low-contrast phone shot. Output is deterministic, so the committed samples
+can be regenerated with the same Pillow/reportlab versions.
+"""
+import io
+import os
+import sys
+
+import numpy as np
+import reportlab
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+DPI = 300
+FONT = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+FONT_BOLD = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "VeraBd.ttf")
+
+LABELS = {
+    "biscuits": [
+        "Butter Biscuits",
+        "Ingredients: wheat flour (gluten), butter (milk), sugar,",
+        "hazelnuts 5%, egg, skimmed milk powder, salt.",
+        "May contain traces of peanuts and soy.",
+        "Nutrition per 100 g: Energy 1980 kJ / 473 kcal",
+        "Fat 22 g, of which saturates 13 g",
+        "Carbohydrate 61 g, of which sugars 24 g",
+        "Protein 6.5 g, Salt 0.6 g",
+    ],
+    "muesli": [
+        "Crunchy Muesli",
+        "Ingredients: oat flakes 55%, barley flakes, raisins 10%,",
+        "sunflower oil, honey, almonds 4%, sesame seeds.",
+        "Contains cereals containing gluten, nuts and sesame.",
+        "Nutrition per 100 g: Energy 1720 kJ / 410 kcal",
+        "Fat 14 g, of which saturates 1.8 g",
+        "Carbohydrate 58 g, of which sugars 19 g",
+        "Fibre 7.9 g, Protein 10 g, Salt 0.05 g",
+    ],
+    "schokolade": [
+        "Vollmilch Schokolade",
+        "Zutaten: Zucker, Kakaobutter, Vollmilchpulver 20%,",
+        "Kakaomasse, Haselnüsse, Emulgator Sojalecithine.",
+        "Kann Spuren von Erdnüssen und Gluten enthalten.",
+        "Nährwerte je 100 g: Energie 2280 kJ / 546 kcal",
+        "Fett 32 g, davon gesättigte Fettsäuren 19 g",
+        "Kohlenhydrate 56 g, davon Zucker 54 g",
+        "Eiweiß 6.9 g, Salz 0.24 g",
+    ],
+    "crackers": [
+        "Sea Salt Crackers",
+        "Ingredients: wheat flour, palm oil, rye flour 8%,",
+        "sea salt 2%, yeast, barley malt extract.",
+        "Made in a factory that also handles milk and mustard.",
+        "Nutrition per 100 g: Energy 1890 kJ / 450 kcal",
+        "Fat 17 g, of which saturates 7.5 g",
+        "Carbohydrate 63 g, of which sugars 2.1 g",
+        "Protein 9.8 g, Salt 2.0 g",
+    ],
+}
+
+# name -> (skew degrees, lighting gradient, noise sigma, ink level)
+CONDITIONS = {
+    "biscuits": (0.0, 0.0, 0.0, 20),
+    "muesli": (2.5, 0.0, 4.0, 30),
+    "schokolade": (0.0, 0.55, 6.0, 40),
+    "crackers": (-1.5, 0.35, 14.0, 95),
+}
+
+
+def render_label(lines, skew: float, gradient: float, noise: float, ink: int, seed: int) -> Image.Image:
+    title_font = ImageFont.truetype(FONT_BOLD, 46)
+    font = ImageFont.truetype(FONT, 34)
+    width, height = 1500, 110 + 52 * len(lines)
+    image = Image.new("L", (width, height), 245)
+    draw = ImageDraw.Draw(image)
+    draw.text((60, 40), lines[0], fill=ink, font=title_font)
+    for i, line in enumerate(lines[1:]):
+        draw.text((60, 120 + 52 * i), line, fill=ink, font=font)
+    if skew:
+        image = image.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=245)
+
+    arr = np.asarray(image).astype(np.float32)
+    if gradient:
+        # Light falling off towards the right edge, as under a desk lamp
+        arr *= np.linspace(1.0, 1.0 - gradient, arr.shape[1], dtype=np.float32)[None, :]
+    if noise:
+        arr += np.random.default_rng(seed).normal(0, noise, arr.shape).astype(np.float32)
+    return Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+
+
+def write_sample(directory: str, name: str, lines, seed: int) -> None:
+    image = render_label(lines, *CONDITIONS[name], seed=seed)
+    size = (image.size[0] * 72 / DPI, image.size[1] * 72 / DPI)
+    path = os.path.join(directory, f"{name}.pdf")
+    pdf = canvas.Canvas(path, pagesize=size, invariant=1)
+    jpeg = io.BytesIO()
+    image.save(jpeg, "JPEG", quality=80, dpi=(DPI, DPI))
+    jpeg.seek(0)
+    pdf.drawImage(ImageReader(jpeg), 0, 0, width=size[0], height=size[1])
+    pdf.save()
+    with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8") as fh:
+        fh.write("\n".join(lines) + "\n")
+    print(f"📄 {path}: {image.size[0]}x{image.size[1]} px", file=sys.stderr)
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "samples")
+    os.makedirs(directory, exist_ok=True)
+    for seed, (name, lines) in enumerate(LABELS.items()):
+        write_sample(directory, name, lines, seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# coalescing.py - Single-flight coalescing and idempotency keys for uploads
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+
+class IdempotencyConflictError(ValueError):
+    """Raised when an Idempotency-Key is reused with a different payload"""
+
+
+class SingleFlight:
+    """
+    Share one computation between concurrent identical requests.
+
+    Work is keyed by a caller-supplied key (e.g. the PDF content hash). The
+    first caller for a key becomes the owner and must call ``complete`` or
+    ``fail``; every other caller gets the same Future. Idempotency keys are
+    remembered for ``result_ttl`` seconds after completion so that a client
+    retry reattaches to the in-progress or finished result.
+
+    Callers waiting on in-flight work are counted; ``leave`` tells the owner
+    when the last of them has gone so that it can cancel the work, and
+    ``abandoned`` whether that is still the case later on (work carrying an
+    idempotency key may get its retry first).
+    """
+
+    def __init__(self, result_ttl: float = None, max_keys: int = None):
+        self.result_ttl = result_ttl if result_ttl is not None else Config.IDEMPOTENCY_TTL_SECONDS
+        self.max_keys = max_keys or Config.IDEMPOTENCY_MAX_KEYS
+
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._waiters: Dict[str, int] = {}
+        # idempotency key -> (work key, future, expires_at); expires_at is None while running
+        self._idempotency: "OrderedDict[str, Tuple[str, Future, Optional[float]]]" = OrderedDict()
+        self._pending_idempotency: Dict[str, List[str]] = {}
+        self.stats = {"started": 0, "coalesced": 0, "reattached": 0}
+
+    def join(self, key: str, idempotency_key: str = None) -> Tuple[Future, bool]:
+        """
+        Join (or start) the computation for ``key``.
+
+        Args:
+            key: Work key, identical for byte-identical requests
+            idempotency_key: Optional client-supplied Idempotency-Key
+
+        Returns:
+            Tuple of (future, is_owner). The owner must run the work.
+
+        Raises:
+            IdempotencyConflictError: If the idempotency key belongs to other work
+        """
+        with self._lock:
+            self._evict_expired(time.monotonic())
+
+            if idempotency_key:
+                entry = self._idempotency.get(idempotency_key)
+                if entry is not None:
+                    known_key, future, _ = entry
+                    if known_key != key:
+                        raise IdempotencyConflictError(
+                            "Idempotency-Key was already used for a different request payload."
+                        )
+                    self.stats["reattached"] += 1
+                    if self._in_flight.get(key) is future:
+                        self._waiters[key] += 1
+                    logger.info("🔁 Reattached idempotent request to existing result")
+                    return future, False
+
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[key] = future
+                self.stats["started"] += 1
+            else:
+                self.stats["coalesced"] += 1
+                logger.info("🔁 Coalesced duplicate request onto in-flight analysis")
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+
+            if idempotency_key:
+                self._idempotency[idempotency_key] = (key, future, None)
+                self._pending_idempotency.setdefault(key, []).append(idempotency_key)
+                self._trim()
+
+            return future, is_owner
+
+    def leave(self, key: str) -> bool:
+        """
+        Stop waiting for ``key`` (the caller disconnected).
+
+        Returns:
+            True when this was the last waiter and the work is still running,
+            i.e. nobody needs the result any more
+        """
+        with self._lock:
+            if key not in self._waiters:
+                return False
+            self._waiters[key] -= 1
+            return self._waiters[key] <= 0 and key in self._in_flight
+
+    def keyed(self, key: str) -> bool:
+        """True when in-flight work for ``key`` carries an idempotency key a retry could reattach with"""
+        with self._lock:
+            return bool(self._pending_idempotency.get(key))
+
+    def abandoned(self, key: str, future: Future) -> bool:
+        """True when ``future`` is still the running work for ``key`` and nobody waits for it"""
+        with self._lock:
+            return self._in_flight.get(key) is future and self._waiters.get(key, 0) <= 0
+
+    def complete(self, key: str, result, retain: bool = True) -> None:
+        """
+        Publish the result for ``key`` to every waiter.
+
+        Args:
+            key: Work key passed to ``join``
+            result: Shared result
+            retain: Keep the result for idempotent retries (False for error results)
+        """
+        future = self._finish(key, retain)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def fail(self, key: str, error: BaseException) -> None:
+        """Propagate an exception to every waiter; failures are never retained"""
+        future = self._finish(key, retain=False)
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+    def snapshot(self) -> dict:
+        """Return counters and current sizes for monitoring"""
+        with self._lock:
+            return {
+                **self.stats,
+                "in_flight": len(self._in_flight),
+                "waiters": sum(self._waiters.values()),
+                "idempotency_keys": len(self._idempotency),
+            }
+
+    def _finish(self, key: str, retain: bool) -> Optional[Future]:
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+            self._waiters.pop(key, None)
+            expires_at = time.monotonic() + self.result_ttl
+            for idempotency_key in self._pending_idempotency.pop(key, []):
+                if idempotency_key not in self._idempotency:
+                    continue
+                if retain:
+                    self._idempotency[idempotency_key] = (key, future, expires_at)
+                else:
+                    del self._idempotency[idempotency_key]
+            return future
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [k for k, (_, _, expires_at) in self._idempotency.items()
+                   if expires_at is not None and expires_at <= now]
+        for idempotency_key in expired:
+            del self._idempotency[idempotency_key]
+
+    def _trim(self) -> None:
+        # Drop the oldest finished entries first; running work is never evicted
+        while len(self._idempotency) > self.max_keys:
+            for idempotency_key, (_, _, expires_at) in self._idempotency.items():
+                if expires_at is not None:
+                    del self._idempotency[idempotency_key]
+                    break
+            else:
+                break
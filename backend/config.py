@@ -18,6 +18,26 @@ else:
     DEFAULT_TESSERACT_PATH = "tesseract"
 
 
+def _sched_weights(spec: str) -> dict:
+    """
+    "interactive=10" -> all three class weights, the unset ones at their
+    defaults. Raises ValueError at startup for unknown classes or bad weights.
+    """
+    weights = {"interactive": 8.0, "batch": 2.0, "background": 1.0}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, weight = (part.strip() for part in item.partition("="))
+        if not sep or name not in weights:
+            raise ValueError(f"SCHED_WEIGHTS: expected <class>=<weight> with class one of "
+                             f"{', '.join(weights)}, got {item!r}")
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"SCHED_WEIGHTS: weight of {name} is not a number: {weight!r}") from None
+        if weights[name] <= 0:
+            raise ValueError(f"SCHED_WEIGHTS: weight of {name} must be positive, got {weight}")
+    return weights
+
+
 class Config:
     """Application configuration"""
 
@@ -26,12 +46,33 @@ class Config:
     APP_DESCRIPTION = "Extract allergens and nutrition from food product PDFs (multi-language, OCR + LLM)"
     APP_VERSION = "2.0.0"
 
+    # Startup: services are built lazily; warm-up builds them when the app starts.
+    # background = serve immediately and warm up in a thread, blocking = warm up
+    # before accepting traffic, off = build on first use
+    WARMUP_MODE = os.getenv("WARMUP_MODE", "background")
+
+    # Prefork serving (serve.py): gunicorn with uvicorn workers
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 0))  # 0 = one worker per CPU of the container's quota
+    WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", 500))  # recycle a worker after this many (0 = never)
+    WORKER_MAX_REQUESTS_JITTER = 50
+    WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", 1500))  # recycle a worker above this RSS (0 = never)
+    WORKER_RSS_CHECK_INTERVAL = 10  # seconds
+    WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", 120))  # seconds without a heartbeat before a worker is killed
+    GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 150))  # seconds to drain in-flight analyses on shutdown
+    LLM_WARMUP_TIMEOUT = 5.0
+
     # CORS
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 
     # Upload limits
     MAX_UPLOAD_SIZE_BYTES = int(os.getenv("MAX_UPLOAD_SIZE_BYTES", 15 * 1024 * 1024))
 
+    # Duplicate upload coalescing / Idempotency-Key retention
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 600))
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 1000))
+    # An analysis with an Idempotency-Key keeps running this long after its last client left, for the retry
+    IDEMPOTENCY_REATTACH_GRACE_SECONDS = float(os.getenv("IDEMPOTENCY_REATTACH_GRACE_SECONDS", 30))
+
     # OCR Configuration
     TESSERACT_CMD = os.getenv("TESSERACT_CMD", DEFAULT_TESSERACT_PATH)
     OCR_LANGUAGES = os.getenv(
@@ -47,14 +88,190 @@ class Config:
     LLM_TIMEOUT = 30
     LLM_MAX_RETRIES = 3
 
+    # Tiered model routing: cheapest/fastest first, escalate on parse failure or low confidence
+    LLM_MODELS = [m.strip() for m in os.getenv("LLM_MODELS", LLM_MODEL).split(",") if m.strip()]
+    LLM_ESCALATE_CONFIDENCE = [c.strip() for c in os.getenv("LLM_ESCALATE_CONFIDENCE", "low").split(",")]
+
+    # Hedged requests and latency-driven timeouts
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", 8.0))  # until p95 is known
+    LLM_HEDGE_MIN_SAMPLES = 20
+    LLM_HEDGE_MAX_WORKERS = 8
+    LLM_LATENCY_WINDOW = 200
+    LLM_MIN_TIMEOUT = 5
+    LLM_TIMEOUT_P99_FACTOR = 2.0
+
+    # Streamed extraction: stop as soon as the JSON object closes
+    LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+    LLM_EXTRACTION_MAX_TOKENS = int(os.getenv("LLM_EXTRACTION_MAX_TOKENS", 600))
+    LLM_STREAM_MAX_PREAMBLE = 200  # chars of prose/code fence tolerated before '{'
+
+    # Multi-document batching for bulk ingestion
+    LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "true").lower() == "true"
+    LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", 4))
+    LLM_BATCH_MAX_WAIT = float(os.getenv("LLM_BATCH_MAX_WAIT", 2.0))  # seconds
+    LLM_BATCH_WORKERS = 2
+
+    # Upstream governor: adaptive (AIMD) concurrency, Retry-After handling, circuit breaker
+    LLM_CONCURRENCY_INITIAL = int(os.getenv("LLM_CONCURRENCY_INITIAL", 8))
+    LLM_CONCURRENCY_MIN = 1
+    LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", 32))
+    LLM_CONCURRENCY_BACKOFF = 0.5  # multiplicative decrease on overload
+    LLM_CONCURRENCY_DECREASE_COOLDOWN = 2.0  # seconds between decreases
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 30))  # max wait for a concurrency slot
+    LLM_MAX_RETRY_AFTER = float(os.getenv("LLM_MAX_RETRY_AFTER", 10))  # longer Retry-After fails fast
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+    LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+    LLM_BREAKER_HALF_OPEN_PROBES = 1
+
+    # Priority scheduling of the OCR and LLM stages (interactive / batch / background)
+    OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", 0))  # 0 = one slot per CPU
+    LLM_STAGE_CONCURRENCY = int(os.getenv("LLM_STAGE_CONCURRENCY", 16))
+    SCHED_WEIGHTS = _sched_weights(os.getenv("SCHED_WEIGHTS", ""))  # e.g. "interactive=10,batch=3"
+    SCHED_OCR_RESERVED_INTERACTIVE = int(os.getenv("SCHED_OCR_RESERVED_INTERACTIVE", 1))
+    SCHED_LLM_RESERVED_INTERACTIVE = int(os.getenv("SCHED_LLM_RESERVED_INTERACTIVE", 2))
+    SCHED_WAIT_WINDOW = 500  # wait-time samples kept per class
+
+    # Request deadlines: every analysis gets a time budget (clients may send a
+    # smaller one in X-Request-Deadline); stages skip or degrade work that won't fit
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", 120))
+    REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", 600))
+    DEADLINE_LLM_RESERVE = float(os.getenv("DEADLINE_LLM_RESERVE", 15))  # seconds OCR leaves for the LLM
+    DEADLINE_OCR_ESCALATION_MIN = 10.0  # spare seconds (beyond the reserve) needed to re-read at higher DPI
+    DEADLINE_MIN_LLM_SECONDS = 3.0  # don't start an LLM attempt with less budget than this
+    DISCONNECT_POLL_INTERVAL = 0.5  # seconds between client-disconnect checks while waiting
+
     # Text extraction
     MAX_TEXT_CHARS = 6000  # For LLM prompt truncation
     MIN_TEXT_LENGTH = 100  # Minimum text before triggering OCR
 
+    # Layout-aware nutrition tables: rebuild the table of digital PDFs from
+    # text-layer positions. A complete table fills nutritional_values directly
+    # (the LLM only reads allergens); otherwise the LLM gets it as compact rows.
+    LAYOUT_TABLES_ENABLED = os.getenv("LAYOUT_TABLES_ENABLED", "true").lower() == "true"
+    LAYOUT_TABLE_MIN_ROWS = 3  # nutrient rows needed to call a block of lines a table
+
     # PDF to Image conversion
     PDF_DPI = 300
     PDF_FORMAT = "png"
 
     # Tesseract OCR config
     TESSERACT_PSM = 3  # Page segmentation mode
-    TESSERACT_OEM = 3  # OCR Engine mode
\ No newline at end of file
+    TESSERACT_OEM = 3  # OCR Engine mode
+
+    # OCR image preprocessing (comma-separated, in order; empty disables)
+    OCR_PREPROCESS_STEPS = [
+        step.strip() for step in os.getenv("OCR_PREPROCESS_STEPS", "grayscale,binarize,deskew,crop").split(",")
+        if step.strip()
+    ]
+    OCR_BINARIZE_WINDOW = int(os.getenv("OCR_BINARIZE_WINDOW", 41))  # pixels at PDF_DPI
+    OCR_BINARIZE_K = float(os.getenv("OCR_BINARIZE_K", 0.2))
+    OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 5.0))  # degrees
+    OCR_DESKEW_STEP = 0.25
+    OCR_CROP_PADDING = 20  # pixels kept around the inked area
+
+    # Adaptive-resolution OCR: render at the first DPI of the ladder and only
+    # re-render pages (or low-confidence regions) at the next DPI when
+    # Tesseract's word confidences say so. "off" renders every page at PDF_DPI.
+    OCR_DPI_LADDER = [int(dpi) for dpi in os.getenv("OCR_DPI_LADDER", "150,300").split(",") if dpi.strip()]
+    OCR_ESCALATION = os.getenv("OCR_ESCALATION", "auto")  # auto | page | region | off
+    OCR_MIN_PAGE_CONFIDENCE = float(os.getenv("OCR_MIN_PAGE_CONFIDENCE", 75))  # mean word confidence, 0-100
+    OCR_MIN_LINE_CONFIDENCE = float(os.getenv("OCR_MIN_LINE_CONFIDENCE", 60))
+    OCR_REGION_MAX_FRACTION = 0.4  # auto: more low-confidence lines than this re-renders the whole page
+    OCR_MAX_REGIONS = 8  # auto: more regions than this re-renders the whole page
+    OCR_REGION_PADDING = 8  # pixels (at the first-pass DPI) around a re-read region
+    OCR_REGION_PSM = 6  # regions are uniform text blocks
+
+    # Region-of-interest OCR: when the first pass finds nutrition tables or
+    # allergen/ingredient statements, only those regions are re-read at
+    # OCR_ROI_DPI; the rest of the page keeps its first-pass text
+    OCR_ROI_ENABLED = os.getenv("OCR_ROI_ENABLED", "true").lower() == "true"
+    OCR_ROI_DPI = int(os.getenv("OCR_ROI_DPI", 300))
+    OCR_ROI_PSM = int(os.getenv("OCR_ROI_PSM", 6))
+    OCR_ROI_KEYWORDS = [
+        keyword.strip().lower() for keyword in os.getenv(
+            "OCR_ROI_KEYWORDS",
+            "nutrition,nährwert,naehrwert,valeurs nutritionnelles,valori nutrizionali,información nutricional,"
+            "informação nutricional,wartość odżywcza,tápérték,výživové,energy,energie,energia,kcal,kj,"
+            "allergen,allergene,allergènes,ingredients,zutaten,ingrédients,ingredienti,ingredientes,"
+            "składniki,összetevők,složení,contains,enthält,contient,may contain,kann spuren"
+        ).split(",") if keyword.strip()
+    ]
+    OCR_ROI_RULE_MIN_LENGTH = 1.0  # inches; shorter dark runs are not table rules
+    OCR_ROI_MAX_RULE_GAP = 0.6  # inches between stacked rules of one table
+    OCR_ROI_MIN_RULES = 3
+    OCR_ROI_PADDING = 0.08  # inches around each region
+    OCR_ROI_MAX_AREA = 0.6  # regions covering more of the page than this: read the whole page instead
+
+    # Page-level OCR cache (content hash of each page + OCR settings)
+    OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+    OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", 2000))
+    OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "")  # empty = memory only
+
+    # Page triage: a thumbnail + single-language keyword probe skips full OCR on
+    # blank, picture-only and boilerplate pages. Requests can opt out (strict=true).
+    OCR_TRIAGE_ENABLED = os.getenv("OCR_TRIAGE_ENABLED", "true").lower() == "true"
+    OCR_TRIAGE_DPI = 100
+    OCR_TRIAGE_LANGUAGE = os.getenv("OCR_TRIAGE_LANGUAGE", "eng")
+    OCR_TRIAGE_MIN_WORDS = 40  # this many confident words and no keyword: boilerplate
+    OCR_TRIAGE_BLANK_INK = 0.003  # share of dark pixels below which a page is blank
+    OCR_TRIAGE_MIN_TEXT_ROWS = 0.05
+    OCR_TRIAGE_PICTURE_MIDTONES = 0.35
+
+    # OCR profiles: named speed/accuracy presets choosing the Tesseract model set
+    # (tessdata_fast, the system default, tessdata_best), OEM/PSM, DPI ladder and
+    # languages. OCR_PROFILE is the deployment default; uploads may pick another.
+    OCR_PROFILE = os.getenv("OCR_PROFILE", "balanced")
+    TESSDATA_DIRS = {
+        "default": os.getenv("TESSDATA_DEFAULT_DIR", ""),  # empty: Tesseract's own tessdata
+        "fast": os.getenv("TESSDATA_FAST_DIR", "/usr/share/tessdata_fast"),
+        "best": os.getenv("TESSDATA_BEST_DIR", "/usr/share/tessdata_best"),
+    }
+    OCR_PROFILES = {
+        "fast": {"models": "fast", "oem": 1, "psm": 3, "dpi_ladder": [150], "roi": False,
+                 "languages": os.getenv("OCR_FAST_LANGUAGES", "eng+deu+fra+hun")},
+        "balanced": {"models": "default", "oem": TESSERACT_OEM, "psm": TESSERACT_PSM,
+                     "dpi_ladder": OCR_DPI_LADDER, "roi": True, "languages": OCR_LANGUAGES},
+        "accurate": {"models": "best", "oem": 1, "psm": 3, "dpi_ladder": [300], "roi": True,
+                     "languages": OCR_LANGUAGES},
+    }
+
+    # Pipelined OCR -> LLM: start a speculative extraction as soon as a page with
+    # ingredients/allergens is read, and re-issue it only if later pages add relevant text
+    OCR_LLM_PIPELINE_ENABLED = os.getenv("OCR_LLM_PIPELINE_ENABLED", "true").lower() == "true"
+    OCR_LLM_PIPELINE_TRIGGER_KEYWORDS = [
+        keyword.strip().lower() for keyword in os.getenv(
+            "OCR_LLM_PIPELINE_TRIGGER_KEYWORDS",
+            "allergen,allergene,allergènes,ingredients,zutaten,ingrédients,ingredienti,ingredientes,"
+            "składniki,összetevők,složení,contains,enthält,contient,may contain,kann spuren"
+        ).split(",") if keyword.strip()
+    ]
+    OCR_LLM_PIPELINE_MAX_SPECULATIONS = 2  # restarts while OCR is still running; later changes re-issue at the end
+
+    # Direct photo uploads (JPEG / PNG / WebP; HEIC when pillow-heif is installed).
+    # Photos carry no DPI: the label's long edge is assumed to be this many inches.
+    IMAGE_MAX_FILES = int(os.getenv("IMAGE_MAX_FILES", 10))
+    IMAGE_MAX_LONG_EDGE = int(os.getenv("IMAGE_MAX_LONG_EDGE", 4000))  # pixels kept after decoding
+    IMAGE_LABEL_LONG_EDGE_INCHES = float(os.getenv("IMAGE_LABEL_LONG_EDGE_INCHES", 8.0))
+
+    # Text-only analysis (/analyze-text): clients send text they extracted from a
+    # digital PDF and upload the PDF only when the server reports it insufficient
+    TEXT_ANALYSIS_REQUIRE_KEYWORDS = os.getenv("TEXT_ANALYSIS_REQUIRE_KEYWORDS", "true").lower() == "true"
+    TEXT_ANALYSIS_MAX_PAGES = 200
+    TEXT_ANALYSIS_MAX_CHARS = 1_000_000
+
+    # Analysis result store: successful analyses are kept in SQLite (allergen
+    # bitmask + numeric nutrient columns, indexed) and can be queried at /results
+    RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "true").lower() == "true"
+    RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "results.db")
+    RESULT_QUERY_DEFAULT_LIMIT = 50
+    RESULT_QUERY_MAX_LIMIT = 500
+
+    # Logging: JSON lines ("text" for the classic format) written by a listener
+    # thread, so requests only enqueue records. Per-page and per-call details are
+    # DEBUG; with LOG_LEVEL=DEBUG they are kept for LOG_DEBUG_SAMPLE_RATE of requests.
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # records; further ones are dropped and counted
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1.0))
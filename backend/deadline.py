@@ -0,0 +1,260 @@
+# deadline.py - Per-request time budget and cancellation threaded through OCR and LLM work
+import time
+import types
+import threading
+import subprocess
+import logging
+from contextlib import contextmanager
+from typing import Optional
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+
+class DeadlineExceededError(RuntimeError):
+    """The request ran out of its time budget"""
+
+
+class RequestCancelledError(RuntimeError):
+    """Nobody is waiting for the result any more (client disconnected)"""
+
+
+class Deadline:
+    """
+    Time budget and cancellation token for one request.
+
+    Behaves like a ``threading.Event`` that is set once the request is
+    cancelled or its budget runs out, so it can be passed straight to
+    ``LLMClient.call(cancel_event=...)``. Tesseract processes started by a
+    thread while the deadline is bound to it (see ``bind``) are killed on
+    cancellation, and every stage records the time it spent so that work
+    thrown away is counted as wasted.
+    """
+
+    def __init__(self, budget: float = None):
+        self.budget = min(budget or Config.REQUEST_DEADLINE_SECONDS, Config.REQUEST_DEADLINE_MAX_SECONDS)
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + self.budget
+        self.reason: Optional[str] = None
+        self.work = {"ocr": 0.0, "llm": 0.0}
+        self.degraded = False
+        self._cancelled = threading.Event()
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def is_set(self) -> bool:
+        return self.cancelled or self.expired
+
+    def wait(self, timeout: float = None) -> bool:
+        limit = self.remaining() if timeout is None else min(timeout, self.remaining())
+        self._cancelled.wait(limit)
+        return self.is_set()
+
+    def cancel(self, reason: str = "client disconnected") -> None:
+        """Stop the request: later checks raise and running Tesseract processes are killed"""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            processes = [proc for proc in self._processes if proc.poll() is None]
+        for proc in processes:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+        logger.info("🛑 Request cancelled (%s); killed %d tesseract process(es)", reason, len(processes))
+
+    def check(self, stage: str) -> None:
+        """
+        Raises:
+            RequestCancelledError: If the request was cancelled
+            DeadlineExceededError: If the budget is used up
+        """
+        if self.cancelled:
+            raise RequestCancelledError(f"Request cancelled during {stage}: {self.reason}")
+        if self.expired:
+            raise DeadlineExceededError(f"Request deadline of {self.budget:.0f}s exceeded during {stage}")
+
+    def cap(self, seconds: float) -> float:
+        """``seconds`` limited to the remaining budget"""
+        return min(seconds, self.remaining())
+
+    @contextmanager
+    def spend(self, stage: str):
+        """Record the wall time of a block of work against ``stage``"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.work[stage] = self.work.get(stage, 0.0) + time.monotonic() - started
+
+    def track(self, proc) -> None:
+        with self._lock:
+            self._processes = {p for p in self._processes if p.poll() is None}
+            self._processes.add(proc)
+        if self.cancelled:
+            proc.kill()
+
+
+class ClosingEvent(threading.Event):
+    """
+    ``threading.Event`` that also closes registered resources when set.
+
+    Checking an event between chunks cannot stop a request that is waiting
+    on a stalled upstream; closing its response from the setting thread can.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._closers = []
+        self._closers_lock = threading.Lock()
+
+    def on_set(self, closer) -> None:
+        """Call ``closer()`` when the event is set (right away if it already is)"""
+        with self._closers_lock:
+            if not self.is_set():
+                self._closers.append(closer)
+                return
+        _close(closer)
+
+    def set(self) -> None:
+        with self._closers_lock:
+            super().set()
+            closers, self._closers = self._closers, []
+        for closer in closers:
+            _close(closer)
+
+
+def _close(closer) -> None:
+    try:
+        closer()
+    except Exception as e:
+        logger.debug("⚠️ Closing a cancelled resource failed: %s", e)
+
+
+class AnyEvent:
+    """Event-like view that is set when any of the wrapped events is set"""
+
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+
+    def on_set(self, closer) -> None:
+        """Register ``closer`` with every wrapped event that can close resources"""
+        for event in self.events:
+            if hasattr(event, "on_set"):
+                event.on_set(closer)
+
+    def is_set(self) -> bool:
+        return any(event.is_set() for event in self.events)
+
+    def wait(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.is_set():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self.events[0].wait(0.1 if remaining is None else min(0.1, remaining))
+        return self.is_set()
+
+
+class AllEvent(AnyEvent):
+    """Event-like view that is set once every wrapped event is set (never, when there are none)"""
+
+    def is_set(self) -> bool:
+        return bool(self.events) and all(event.is_set() for event in self.events)
+
+    def on_set(self, closer) -> None:
+        # Closing on the first event would cut off the others' work
+        pass
+
+
+_local = threading.local()
+
+
+def current() -> Optional[Deadline]:
+    """Deadline bound to the calling thread, if any"""
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def bind(deadline: Optional[Deadline]):
+    """Make ``deadline`` the calling thread's deadline for the duration of the block"""
+    previous = current()
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+
+def tesseract_timeout() -> float:
+    """Timeout for one pytesseract call: the remaining budget (0 = no limit)"""
+    deadline = current()
+    if deadline is None:
+        return 0
+    deadline.check("ocr")
+    return max(0.1, deadline.remaining())
+
+
+class _TrackedPopen(subprocess.Popen):
+    """Popen that registers itself with the calling thread's deadline"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        deadline = current()
+        if deadline is not None:
+            deadline.track(self)
+
+
+def track_tesseract_processes(pytesseract_module) -> None:
+    """Route pytesseract's subprocesses through _TrackedPopen so cancellation can kill them"""
+    backend = pytesseract_module.pytesseract
+    if getattr(backend.subprocess, "Popen", None) is _TrackedPopen:
+        return
+    proxy = types.ModuleType("subprocess")
+    proxy.__dict__.update(vars(subprocess))
+    proxy.Popen = _TrackedPopen
+    backend.subprocess = proxy
+
+
+class DeadlineStats:
+    """Outcome counters and wasted compute (work done for requests nobody got an answer from)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "completed": 0, "degraded": 0, "expired": 0, "cancelled": 0}
+        self.wasted_seconds = {"ocr": 0.0, "llm": 0.0}
+
+    def finish(self, deadline: Deadline, outcome: str) -> None:
+        """
+        Args:
+            outcome: "completed", "expired" or "cancelled"; the work of expired
+                and cancelled requests counts as wasted
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats[outcome] += 1
+            if deadline.degraded:
+                self.stats["degraded"] += 1
+            if outcome != "completed":
+                for stage, seconds in deadline.work.items():
+                    self.wasted_seconds[stage] = self.wasted_seconds.get(stage, 0.0) + seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats,
+                    "wasted_seconds": {stage: round(s, 2) for stage, s in self.wasted_seconds.items()}}
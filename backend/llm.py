@@ -1,14 +1,23 @@
 # llm.py - LLM Client for OpenRouter/DeepSeek
 import time
 import logging
-import os
+import threading
+from typing import Any, Callable, Tuple
 from openai import OpenAI
 
 from config import Config
+from deadline import AnyEvent
+from llm_routing import ModelLatencyStats, HedgedCaller
+from llm_stream import RESET, IncrementalJSONParser, MalformedStreamError, PartialGate
+from upstream_governor import UpstreamGovernor, UpstreamUnavailableError
 
 logger = logging.getLogger("be_aware_backend")
 
 
+class LLMCancelledError(RuntimeError):
+    """Raised when an LLM call is abandoned via its cancel event"""
+
+
 class LLMClient:
     """Client for calling OpenRouter/DeepSeek LLM"""
 
@@ -16,23 +25,14 @@ class LLMClient:
         """Initialize LLM client with OpenRouter API"""
         self.client = None
         self.configured = False
+        self.models = list(Config.LLM_MODELS)
+        self.latency = ModelLatencyStats()
+        self.hedger = HedgedCaller(self.latency)
+        self.governor = UpstreamGovernor()
 
-        # Debug: Check if API key exists
         api_key = Config.OPENROUTER_API_KEY
-        logger.info(f"🔍 DEBUG: API key exists: {bool(api_key)}")
-        if api_key:
-            logger.info(f"🔍 DEBUG: API key length: {len(api_key)}")
-            logger.info(f"🔍 DEBUG: API key starts with: {api_key[:10]}...")
-
-        # Also check environment directly
-        env_key = os.getenv("OPENROUTER_API_KEY")
-        logger.info(f"🔍 DEBUG: ENV key exists: {bool(env_key)}")
-
         if api_key:
             try:
-                logger.info("🔍 DEBUG: Creating OpenAI client...")
-                logger.info(f"🔍 DEBUG: Base URL: https://openrouter.ai/api/v1")
-
                 self.client = OpenAI(
                     api_key=api_key,
                     base_url="https://openrouter.ai/api/v1"
@@ -41,8 +41,6 @@ class LLMClient:
                 logger.info("✅ OpenRouter (DeepSeek) client configured")
             except Exception as e:
                 logger.exception("⚠️ Failed to configure OpenRouter client: %s", e)
-                logger.error(f"🔍 DEBUG: Exception type: {type(e).__name__}")
-                logger.error(f"🔍 DEBUG: Exception args: {e.args}")
         else:
             logger.warning("⚠️ OPENROUTER_API_KEY not set. LLM calls will fail until configured.")
 
@@ -51,65 +49,222 @@ class LLMClient:
              temperature: float = None,
              max_tokens: int = None,
              max_retries: int = None,
-             timeout: int = None) -> str:
+             timeout: int = None,
+             cancel_event: threading.Event = None,
+             stream_json: bool = False,
+             on_partial: Callable[[tuple, Any], None] = None) -> str:
         """
         Call the LLM with retry logic.
 
+        With ``stream_json`` the completion is streamed through an incremental
+        JSON parser: the stream is closed as soon as the top-level object
+        closes, and output that can no longer be valid JSON is retried
+        immediately instead of after the full generation.
+
         Args:
             prompt: The prompt to send to the LLM
-            model: Model to use (defaults to Config.LLM_MODEL)
+            model: Model to use (defaults to the first entry of Config.LLM_MODELS)
             temperature: Temperature setting (defaults to Config.LLM_TEMPERATURE)
             max_tokens: Max tokens to generate (defaults to Config.LLM_MAX_TOKENS)
             max_retries: Number of retries (defaults to Config.LLM_MAX_RETRIES)
-            timeout: Request timeout in seconds (defaults to Config.LLM_TIMEOUT)
+            timeout: Request timeout in seconds (defaults to the model's observed
+                p99 latency, capped by Config.LLM_TIMEOUT)
+            cancel_event: When set, no further attempts are made and an
+                in-progress stream is closed
+            stream_json: Stream the completion and return only the JSON object
+                (ignored when Config.LLM_STREAMING is off, except for hedge
+                racers, which always stream so the loser can be closed)
+            on_partial: Called with (path, value) for every completed JSON
+                scalar while streaming, e.g. (("allergens", "milk"), True).
+                Before a retry replays fields it is called with (RESET, None).
 
         Returns:
-            LLM response text
+            LLM response text (the JSON object text when streaming)
 
         Raises:
             RuntimeError: If client not configured or all retries fail
+            UpstreamUnavailableError: If the circuit breaker is open or the
+                upstream is saturated (raised immediately, without retries)
         """
         if not self.configured or not self.client:
             raise RuntimeError("LLM client not configured. Set OPENROUTER_API_KEY in environment.")
 
         # Use defaults from config if not specified
-        model = model or Config.LLM_MODEL
+        model = model or self.models[0]
         temperature = temperature if temperature is not None else Config.LLM_TEMPERATURE
         max_tokens = max_tokens or Config.LLM_MAX_TOKENS
         max_retries = max_retries or Config.LLM_MAX_RETRIES
-        timeout = timeout or Config.LLM_TIMEOUT
+        timeout = timeout or self.latency.attempt_timeout(model)
 
-        logger.info(f"🔍 DEBUG: Using model: {model}")
-        logger.info(f"🔍 DEBUG: Temperature: {temperature}, Max tokens: {max_tokens}")
+        logger.debug("🤖 LLM call model=%s temperature=%s max_tokens=%s", model, temperature, max_tokens)
+        partials = PartialGate(on_partial, RESET, None) if on_partial is not None else None
 
         for attempt in range(1, max_retries + 1):
-            try:
-                logger.info("🤖 LLM request (attempt %s/%s) model=%s", attempt, max_retries, model)
-
-                resp = self.client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    timeout=timeout
-                )
+            if cancel_event is not None and cancel_event.is_set():
+                raise LLMCancelledError("LLM call cancelled")
+            if partials is not None:
+                # The failed attempt's fields may be wrong or will be streamed again
+                partials.reset()
+            started = time.monotonic()
+            # Breaker open / saturated upstream raises here, failing fast without retries
+            with self.governor.slot() as outcome:
+                try:
+                    logger.debug("🤖 LLM request (attempt %s/%s) model=%s", attempt, max_retries, model)
 
-                result = resp.choices[0].message.content.strip()
-                logger.info("✅ LLM returned result (length=%d)", len(result))
-                return result
+                    if stream_json and (Config.LLM_STREAMING or hasattr(cancel_event, "on_set")):
+                        result = self._stream_json(prompt, model, temperature, max_tokens,
+                                                   timeout, cancel_event, partials)
+                    else:
+                        resp = self.client.chat.completions.create(
+                            model=model,
+                            messages=[{"role": "user", "content": prompt}],
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            timeout=timeout
+                        )
+                        result = resp.choices[0].message.content.strip()
 
-            except Exception as e:
-                logger.warning("⚠️ LLM attempt %s failed: %s", attempt, e)
-                logger.error(f"🔍 DEBUG: Exception type: {type(e).__name__}")
-                logger.error(f"🔍 DEBUG: Full exception: {repr(e)}")
-                if attempt < max_retries:
-                    wait = 2 ** (attempt - 1)
-                    logger.info("⏳ waiting %s seconds before retry", wait)
-                    time.sleep(wait)
-                else:
-                    logger.exception("❌ LLM retries exhausted")
+                    self.governor.record_success(outcome)
+                    self.latency.record(model, time.monotonic() - started)
+                    logger.debug("✅ LLM returned result (length=%d)", len(result))
+                    return result
+
+                except LLMCancelledError:
                     raise
 
+                except MalformedStreamError as e:
+                    # The upstream is fine, the model produced bad output; retry right away
+                    self.governor.record_success(outcome)
+                    self.latency.record(model, time.monotonic() - started, ok=False)
+                    logger.warning("⚠️ LLM attempt %s produced malformed JSON: %s", attempt, e)
+                    if attempt >= max_retries:
+                        raise
+                    continue
+
+                except Exception as e:
+                    retryable, retry_after = self.governor.record_failure(outcome, e)
+                    self.latency.record(model, time.monotonic() - started, ok=False)
+                    logger.warning("⚠️ LLM attempt %s failed (%s): %s",
+                                   attempt, "retryable" if retryable else "fatal", e)
+                    if not retryable:
+                        raise
+                    if attempt >= max_retries:
+                        logger.exception("❌ LLM retries exhausted")
+                        raise
+                    if retry_after is not None and retry_after > Config.LLM_MAX_RETRY_AFTER:
+                        raise UpstreamUnavailableError(
+                            f"LLM upstream asked to retry after {retry_after:.0f}s", retry_after=retry_after
+                        ) from e
+
+            # Back off outside the concurrency slot
+            wait = max(2 ** (attempt - 1), retry_after or 0)
+            logger.info("⏳ waiting %s seconds before retry", wait)
+            if cancel_event is not None:
+                cancel_event.wait(wait)
+            else:
+                time.sleep(wait)
+
+    def _stream_json(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                     timeout: int, cancel_event: threading.Event,
+                     on_partial: Callable[[tuple, Any], None]) -> str:
+        """Stream one completion into the incremental parser and return the JSON object text"""
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            stream=True
+        )
+        parser = IncrementalJSONParser()
+        if hasattr(cancel_event, "on_set"):
+            # A lost hedge is closed from the winner's thread, even while waiting for a chunk
+            cancel_event.on_set(stream.response.close)
+        try:
+            for chunk in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise LLMCancelledError("LLM call cancelled")
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                for path, value in parser.feed(delta):
+                    if on_partial is not None:
+                        on_partial(path, value)
+                if parser.complete:
+                    logger.debug("✂️ JSON object complete - closing LLM stream early")
+                    break
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                # The read failed because the response was closed under us
+                raise LLMCancelledError("LLM call cancelled") from e
+            raise
+        finally:
+            stream.response.close()
+
+        if not parser.complete:
+            raise MalformedStreamError("LLM stream ended before the JSON object was complete")
+        return parser.text
+
+    def call_hedged(self, prompt: str, model: str, alternate: str = None, **kwargs) -> Tuple[str, str]:
+        """
+        Call ``model`` and, when hedging is enabled, race ``alternate`` if the
+        primary hasn't answered by its p95 latency.
+
+        Args:
+            prompt: The prompt to send to the LLM
+            model: Primary model
+            alternate: Model to hedge with (hedging is skipped if None)
+            **kwargs: Passed through to ``call``; a ``cancel_event`` stops both racers
+
+        Returns:
+            Tuple of (response text, model that answered)
+
+        Partial results (``on_partial``) are only forwarded from the primary;
+        when the alternate wins, they are retracted with (RESET, None). With
+        ``stream_json`` the losing racer's stream is closed as soon as the
+        race is decided; a non-streaming loser runs to completion.
+        """
+        if not Config.LLM_HEDGE_ENABLED or not alternate or alternate == model:
+            return self.call(prompt, model=model, **kwargs), model
+
+        on_partial = kwargs.pop("on_partial", None)
+        request_cancel = kwargs.pop("cancel_event", None)
+        partials = PartialGate(on_partial, RESET, None) if on_partial is not None else None
+
+        def attempt(candidate: str, cancel_event: threading.Event) -> str:
+            # Stop when the race is decided or the caller gives up, whichever comes first
+            return self.call(prompt, model=candidate, cancel_event=AnyEvent(cancel_event, request_cancel),
+                             on_partial=partials if candidate == model else None, **kwargs)
+
+        result, answered_by = self.hedger.run(attempt, model, alternate)
+        if answered_by != model and partials is not None:
+            partials.reset(close=True)
+        return result, answered_by
+
+    def routing_stats(self) -> dict:
+        """Model tiers, hedging counters and per-model latency for monitoring"""
+        return {
+            "models": self.models,
+            "hedging_enabled": Config.LLM_HEDGE_ENABLED,
+            "hedges_fired": self.hedger.hedges_fired,
+            "hedges_won": self.hedger.hedges_won,
+            "latency": self.latency.snapshot(),
+        }
+
+    def warm_up(self) -> bool:
+        """
+        Open a pooled HTTPS connection to the upstream (a free model listing,
+        no tokens spent) so the first extraction skips the TLS handshake.
+        """
+        if not self.configured:
+            return False
+        try:
+            self.client.with_options(timeout=Config.LLM_WARMUP_TIMEOUT, max_retries=0).models.list()
+            return True
+        except Exception as e:
+            logger.warning("⚠️ LLM connection warm-up failed: %s", e)
+            return False
+
     def test_connection(self) -> dict:
         """
         Test the LLM connection.
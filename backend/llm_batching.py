@@ -0,0 +1,180 @@
+# llm_batching.py - Pack several documents into one LLM extraction call
+import json
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+from deadline import AllEvent, Deadline
+from scheduler import BATCH
+
+logger = logging.getLogger("be_aware_backend")
+
+
+class LLMBatcher:
+    """
+    Queue extraction requests and answer several of them with one completion.
+
+    Requests wait at most ``max_wait`` seconds for up to ``batch_size`` peers.
+    The batch shares one instruction/schema preamble and the model returns
+    ``{"results": [{"id": ..., ...}, ...]}``; each entry is validated and
+    fanned back out to its waiting caller. Entries that are missing, fail
+    validation or report an escalation-level confidence fall back to a
+    regular single-document extraction.
+
+    Each request may carry its ``Deadline``: a request whose caller gave up
+    before its batch started is dropped from it, the batch call is capped
+    by the latest member deadline and stops once every member gave up, and
+    a single-document fallback runs against its own request's deadline.
+    """
+
+    def __init__(self, analyzer, batch_size: int = None, max_wait: float = None, workers: int = None):
+        """
+        Args:
+            analyzer: PDFAnalyzer providing prompts, normalization and the LLM client
+            batch_size: Max documents per completion (defaults to Config.LLM_BATCH_SIZE)
+            max_wait: Max seconds a request waits for a batch to fill (defaults to Config.LLM_BATCH_MAX_WAIT)
+            workers: Batches processed concurrently (defaults to Config.LLM_BATCH_WORKERS)
+        """
+        self.analyzer = analyzer
+        self.batch_size = batch_size or Config.LLM_BATCH_SIZE
+        self.max_wait = max_wait if max_wait is not None else Config.LLM_BATCH_MAX_WAIT
+        self._queue: "queue.Queue[Tuple[str, Future, Optional[Deadline]]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers or Config.LLM_BATCH_WORKERS,
+                                            thread_name_prefix="llm-batch")
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.stats = {"batches": 0, "documents": 0, "fallbacks": 0}
+
+        self._collector = threading.Thread(target=self._collect, name="llm-batch-collector", daemon=True)
+        self._collector.start()
+
+    def submit(self, text: str, deadline: Deadline = None) -> Future:
+        """
+        Queue one document's text; the Future resolves to its extraction result.
+        Cancelling the Future before its batch starts drops the document.
+        """
+        future = Future()
+        self._queue.put((text, future, deadline))
+        return future
+
+    def extract(self, text: str, deadline: Deadline = None) -> Dict[str, Any]:
+        """
+        Blocking wrapper around ``submit`` that gives up when ``deadline`` runs
+        out or is cancelled.
+
+        Raises:
+            DeadlineExceededError, RequestCancelledError: From ``deadline``
+        """
+        future = self.submit(text, deadline)
+        if deadline is None:
+            return future.result()
+        while True:
+            try:
+                # Short waits so a cancelled request is noticed promptly
+                return future.result(timeout=max(0.01, min(0.1, deadline.remaining())))
+            except FutureTimeoutError:
+                if deadline.is_set():
+                    future.cancel()
+                    deadline.check("llm batch")
+
+    def snapshot(self) -> dict:
+        """Counters and settings for monitoring"""
+        return {**self.stats, "queued": self._queue.qsize(),
+                "batch_size": self.batch_size, "max_wait": self.max_wait}
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[Tuple[str, Future, Optional[Deadline]]]) -> None:
+        # Documents whose caller already gave up are left out
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        if len(batch) == 1:
+            self._resolve_single(*batch[0])
+            return
+
+        with self._lock:
+            base = self._next_id
+            self._next_id += len(batch)
+            self.stats["batches"] += 1
+            self.stats["documents"] += len(batch)
+        items = {f"doc-{base + i}": item for i, item in enumerate(batch)}
+        logger.info("📦 LLM batch of %d documents", len(batch))
+
+        prompt = self.analyzer._build_batch_prompt(
+            [(doc_id, self.analyzer._reduce_text(text)) for doc_id, (text, _, _) in items.items()]
+        )
+        llm = self.analyzer.llm_client
+        deadlines = [deadline for _, _, deadline in batch]
+        timeout = cancel = None
+        if all(deadline is not None for deadline in deadlines):
+            # Worth running while any member still waits, not past the last one's deadline
+            timeout = min(llm.latency.attempt_timeout(llm.models[0]), max(d.remaining() for d in deadlines))
+            cancel = AllEvent(*deadlines)
+        try:
+            # One upstream call holds one slot; its fair-share cost is one turn per document
+            with self.analyzer.scheduler.llm.slot(BATCH, cost=len(batch)):
+                raw = llm.call(
+                    prompt,
+                    max_tokens=Config.LLM_EXTRACTION_MAX_TOKENS * len(batch),
+                    timeout=timeout,
+                    cancel_event=cancel,
+                    stream_json=True
+                )
+            entries = self._decode_results(raw)
+        except Exception as e:
+            logger.warning("⚠️ LLM batch failed, falling back to single calls: %s", e)
+            entries = {}
+
+        for doc_id, (text, future, deadline) in items.items():
+            data = self._validate(entries.get(doc_id))
+            if data is None:
+                with self._lock:
+                    self.stats["fallbacks"] += 1
+                self._executor.submit(self._resolve_single, text, future, deadline)
+            else:
+                future.set_result(data)
+
+    def _decode_results(self, raw: str) -> Dict[str, Any]:
+        results = json.loads(raw[raw.find("{"):raw.rfind("}") + 1]).get("results")
+        if not isinstance(results, list):
+            raise ValueError("Batch response has no results array")
+        return {str(entry.get("id")): entry for entry in results if isinstance(entry, dict)}
+
+    def _validate(self, entry: Any):
+        """Normalized result for one batch entry, or None if it must be re-extracted alone"""
+        if not isinstance(entry, dict) or not isinstance(entry.get("allergens"), dict):
+            return None
+        entry = dict(entry)
+        entry.pop("id", None)
+        try:
+            data = self.analyzer._normalize_extraction(entry)
+        except Exception:
+            return None
+        if data["metadata"].get("confidence") in Config.LLM_ESCALATE_CONFIDENCE:
+            return None
+        data["metadata"]["llm_model"] = self.analyzer.llm_client.models[0]
+        data["metadata"]["llm_batched"] = True
+        return data
+
+    def _resolve_single(self, text: str, future: Future, deadline: Deadline = None) -> None:
+        try:
+            future.set_result(self.analyzer.extract_data_from_text(text, priority=BATCH, deadline=deadline))
+        except Exception as e:
+            future.set_exception(e)
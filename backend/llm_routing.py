@@ -0,0 +1,136 @@
+# llm_routing.py - Per-model latency tracking and hedged LLM requests
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional, Tuple
+
+from config import Config
+from deadline import ClosingEvent
+from structured_logging import carry
+
+logger = logging.getLogger("be_aware_backend")
+
+
+class ModelLatencyStats:
+    """Rolling window of successful call latencies per model"""
+
+    def __init__(self, window: int = None):
+        self.window = window or Config.LLM_LATENCY_WINDOW
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, seconds: float, ok: bool = True) -> None:
+        """Record one call; only successful calls contribute latency samples"""
+        with self._lock:
+            counts = self._counts.setdefault(model, {"ok": 0, "failed": 0})
+            counts["ok" if ok else "failed"] += 1
+            if ok:
+                self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model: str, q: float) -> Optional[float]:
+        """
+        Latency percentile for a model.
+
+        Returns:
+            Seconds, or None until LLM_HEDGE_MIN_SAMPLES samples are collected
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < Config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+        return samples[index]
+
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait for ``model`` before firing a hedge request (its p95)"""
+        p95 = self.percentile(model, 0.95)
+        return p95 if p95 is not None else Config.LLM_HEDGE_DEFAULT_DELAY
+
+    def attempt_timeout(self, model: str) -> float:
+        """Per-attempt timeout derived from p99, capped by Config.LLM_TIMEOUT"""
+        p99 = self.percentile(model, 0.99)
+        if p99 is None:
+            return Config.LLM_TIMEOUT
+        return min(Config.LLM_TIMEOUT, max(Config.LLM_MIN_TIMEOUT, p99 * Config.LLM_TIMEOUT_P99_FACTOR))
+
+    def snapshot(self) -> dict:
+        """Per-model counts and latency percentiles for monitoring"""
+        with self._lock:
+            models = list(self._counts)
+        return {
+            model: {
+                **self._counts[model],
+                "p50": self.percentile(model, 0.50),
+                "p95": self.percentile(model, 0.95),
+                "p99": self.percentile(model, 0.99),
+            }
+            for model in models
+        }
+
+
+class HedgedCaller:
+    """
+    Run a call against a primary model and, if it hasn't answered by the
+    primary's p95 latency, race a second request to an alternate model.
+    """
+
+    def __init__(self, stats: ModelLatencyStats, max_workers: int = None):
+        self.stats = stats
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.LLM_HEDGE_MAX_WORKERS,
+            thread_name_prefix="llm-hedge"
+        )
+        self._lock = threading.Lock()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def run(self, call: Callable[[str, threading.Event], str],
+            model: str, alternate: str) -> Tuple[str, str]:
+        """
+        Race ``call(model, cancel_event)`` against ``call(alternate, cancel_event)``.
+
+        Args:
+            call: Function performing one LLM call for a model; must honour the cancel
+                event, and can register closers with its ``on_set`` to stop an
+                in-flight request when it loses
+            model: Primary model
+            alternate: Model to hedge with
+
+        Returns:
+            Tuple of (response text, model that answered)
+
+        Raises:
+            Exception: The primary's error if both requests fail
+        """
+        cancels = {model: ClosingEvent(), alternate: ClosingEvent()}
+        call = carry(call)
+        primary = self._executor.submit(call, model, cancels[model])
+        futures = {primary: model}
+
+        done, _ = wait([primary], timeout=self.stats.hedge_delay(model))
+        if not done or primary.exception() is not None:
+            with self._lock:
+                self.hedges_fired += 1
+            logger.info("⏱️ Hedging LLM request: %s -> %s", model, alternate)
+            futures[self._executor.submit(call, alternate, cancels[alternate])] = alternate
+
+        pending = set(futures)
+        errors = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                answered_by = futures[future]
+                if future.exception() is not None:
+                    errors[answered_by] = future.exception()
+                    continue
+                for other in pending:
+                    cancels[futures[other]].set()
+                    other.cancel()
+                if answered_by != model:
+                    with self._lock:
+                        self.hedges_won += 1
+                return future.result(), answered_by
+
+        raise errors.get(model) or next(iter(errors.values()))
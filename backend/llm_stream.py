@@ -0,0 +1,243 @@
+# llm_stream.py - Incremental JSON parsing for streamed LLM completions
+import json
+import threading
+from typing import Any, Callable, List, Tuple
+
+from config import Config
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_CHARS = set("0123456789+-.eEtrufalsn")
+
+
+# Path of the (path, value) partial telling the consumer to drop the partials received so far
+RESET = ()
+
+
+class MalformedStreamError(ValueError):
+    """Raised as soon as a streamed completion can no longer be valid JSON"""
+
+
+class PartialGate:
+    """
+    Forward one attempt's streamed partials, and retract them when the attempt is superseded.
+
+    ``reset()`` forwards the ``reset`` arguments if anything was forwarded
+    since the last reset, e.g. before a retry replays the fields. With
+    ``close=True`` later partials are dropped too, for an attempt that
+    lost a race but is still streaming.
+    """
+
+    def __init__(self, forward: Callable[..., None], *reset):
+        self._forward = forward
+        self._reset = reset
+        self._sent = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __call__(self, *args) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._sent = args != self._reset
+            self._forward(*args)
+
+    def reset(self, close: bool = False) -> None:
+        with self._lock:
+            self._closed = self._closed or close
+            if self._sent:
+                self._sent = False
+                self._forward(*self._reset)
+
+
+class IncrementalJSONParser:
+    """
+    Validate a streamed JSON object chunk by chunk.
+
+    Leading prose or a code fence before the first ``{`` is tolerated up to
+    Config.LLM_STREAM_MAX_PREAMBLE characters. Every completed scalar is
+    reported as ``(path, value)`` where ``path`` is a tuple of object keys
+    and array indices, e.g. ``(("allergens", "milk"), True)``. ``complete``
+    turns True as soon as the top-level object closes, so the caller can
+    stop the stream without waiting for trailing tokens.
+    """
+
+    def __init__(self, max_preamble: int = None):
+        self.max_preamble = max_preamble if max_preamble is not None else Config.LLM_STREAM_MAX_PREAMBLE
+        self.complete = False
+        self._preamble = 0
+        self._started = False
+        self._buffer: List[str] = []
+        # Each frame: [kind ("obj"/"arr"), state, current key or index]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._escape = False
+        self._string: List[str] = []
+        self._scalar: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """JSON text consumed so far, starting at the opening brace"""
+        return "".join(self._buffer)
+
+    def value(self) -> Any:
+        """Decoded top-level object (only valid once ``complete`` is True)"""
+        if not self.complete:
+            raise MalformedStreamError("JSON object is not complete")
+        return json.loads(self.text)
+
+    def feed(self, chunk: str) -> List[Tuple[tuple, Any]]:
+        """
+        Consume the next chunk of model output.
+
+        Args:
+            chunk: Text delta from the stream
+
+        Returns:
+            List of (path, value) for scalars completed by this chunk
+
+        Raises:
+            MalformedStreamError: If the output can no longer be valid JSON
+        """
+        events = []
+        for ch in chunk:
+            if self.complete:
+                break
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                else:
+                    self._preamble += 1
+                    if self._preamble > self.max_preamble:
+                        raise MalformedStreamError("No JSON object found in LLM output")
+                    continue
+            self._buffer.append(ch)
+            self._consume(ch, events)
+        return events
+
+    # ------------------------------------------------------------------
+    # State machine
+    # ------------------------------------------------------------------
+    def _consume(self, ch: str, events: list) -> None:
+        if self._in_string:
+            self._consume_string(ch, events)
+            return
+
+        if self._scalar:
+            if ch in _SCALAR_CHARS:
+                self._scalar.append(ch)
+                return
+            self._finish_scalar(events)
+
+        if ch in _WHITESPACE:
+            return
+
+        if not self._stack:
+            if ch != "{":
+                raise MalformedStreamError(f"Unexpected {ch!r} at top level")
+            self._stack.append(["obj", "key_or_end", None])
+            return
+
+        frame = self._stack[-1]
+        kind, state = frame[0], frame[1]
+
+        if kind == "obj":
+            if state in ("key_or_end", "key"):
+                if ch == '"':
+                    self._in_string = True
+                    self._string = []
+                elif ch == "}" and state == "key_or_end":
+                    self._close(events)
+                else:
+                    raise MalformedStreamError(f"Expected object key, got {ch!r}")
+            elif state == "colon":
+                if ch != ":":
+                    raise MalformedStreamError(f"Expected ':', got {ch!r}")
+                frame[1] = "value"
+            elif state == "value":
+                self._start_value(ch)
+            elif state == "comma_or_end":
+                if ch == ",":
+                    frame[1] = "key"
+                elif ch == "}":
+                    self._close(events)
+                else:
+                    raise MalformedStreamError(f"Expected ',' or '}}', got {ch!r}")
+        else:
+            if state in ("value_or_end", "value"):
+                if ch == "]" and state == "value_or_end":
+                    self._close(events)
+                else:
+                    self._start_value(ch)
+            elif state == "comma_or_end":
+                if ch == ",":
+                    frame[1] = "value"
+                    frame[2] += 1
+                elif ch == "]":
+                    self._close(events)
+                else:
+                    raise MalformedStreamError(f"Expected ',' or ']', got {ch!r}")
+
+    def _start_value(self, ch: str) -> None:
+        if ch == "{":
+            self._stack.append(["obj", "key_or_end", None])
+        elif ch == "[":
+            self._stack.append(["arr", "value_or_end", 0])
+        elif ch == '"':
+            self._in_string = True
+            self._string = []
+        elif ch in _SCALAR_CHARS:
+            self._scalar = [ch]
+        else:
+            raise MalformedStreamError(f"Unexpected {ch!r} where a value was expected")
+
+    def _consume_string(self, ch: str, events: list) -> None:
+        self._string.append(ch)
+        if self._escape:
+            self._escape = False
+            return
+        if ch == "\\":
+            self._escape = True
+            return
+        if ch != '"':
+            return
+
+        self._in_string = False
+        raw = '"' + "".join(self._string)
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            raise MalformedStreamError("Invalid string literal in LLM output")
+
+        frame = self._stack[-1]
+        if frame[0] == "obj" and frame[1] in ("key_or_end", "key"):
+            frame[2] = value
+            frame[1] = "colon"
+        else:
+            self._emit(value, events)
+
+    def _finish_scalar(self, events: list) -> None:
+        token = "".join(self._scalar)
+        self._scalar = []
+        try:
+            value = json.loads(token)
+        except ValueError:
+            raise MalformedStreamError(f"Invalid literal {token!r} in LLM output")
+        self._emit(value, events)
+
+    def _emit(self, value: Any, events: list) -> None:
+        events.append((self._path(), value))
+        self._value_done()
+
+    def _close(self, events: list) -> None:
+        self._stack.pop()
+        if not self._stack:
+            self.complete = True
+            return
+        self._value_done()
+
+    def _value_done(self) -> None:
+        frame = self._stack[-1]
+        frame[1] = "comma_or_end"
+
+    def _path(self) -> tuple:
+        return tuple(frame[2] for frame in self._stack)
@@ -0,0 +1,234 @@
+# nutrition.py - Shared nutrition value normalization and numeric parsing
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+NUTRIENT_KEYS = ["energy", "fat", "carbohydrate", "sugar", "protein", "sodium"]
+NOT_AVAILABLE = "Not available"
+
+_SALT_NOTE = re.compile(r"\s*\((as\s+)?salt\)|\((comme\s+)?sel\)|\((als\s+)?Salz\)|\(sóként\)", re.IGNORECASE)
+# Which amount a salt / sodium word labels: "Salt 1.0 g", "salt equivalent 1 g" (word before the
+# number), "1.2 g (as salt)", "0.35 g salt", "0.48 g sodium" (word right after the amount)
+_SALT = r"(?:salt|sel|salz|só\w*)"
+_SODIUM = r"(?:sodium|natrium|nátrium)"
+_LABEL_BEFORE = re.compile(rf"\b({_SALT}|{_SODIUM})\b\W*(?:(?:equivalent|äquivalent|équivalent|egyenérték)\W*)?$",
+                           re.IGNORECASE)
+_LABEL_AFTER = re.compile(rf"\s*(?:\((?:(?:as|als|comme)\s+)?({_SALT}|{_SODIUM})\)|({_SALT}|{_SODIUM})\b)",
+                          re.IGNORECASE)
+
+NOT_AVAILABLE_PHRASES = frozenset({
+    "not specified", "not available", "n/a", "na", "",
+    "non disponible", "non spécifié",
+    "nicht verfügbar", "nicht angegeben",
+    "nem elérhető", "nem megadva",
+    "unknown", "inconnu", "unbekannt", "ismeretlen",
+    "none", "null", "-", "--", "—",
+})
+_NOT_AVAILABLE_PREFIXES = ("not ", "non ", "nem ", "nicht ", "no ", "n/a")
+
+# "per 100 g", "/100ml", "pro 100 g"; "per serving (30 g)", "/portion", "adagonként"
+_PER_100 = re.compile(r"(?:per|pro|par|je|/)\s*100\s*(g|ml)\b", re.IGNORECASE)
+_PER_SERVING = re.compile(r"(?:(?:per|pro|par|je|/)\s*(?:serving|portion|adag)\w*|\badagonként)(?:\s*\([^)]*\))?",
+                          re.IGNORECASE)
+# "1 500" and "1.500" group thousands (a space or dot before exactly three digits); "0,5" is a decimal.
+# Percentages ("12%", "17 %") are shares of a reference intake, not amounts.
+_THOUSANDS = r"[1-9]\d{0,2}(?:[ .]\d{3})+(?:,\d+)?"
+_NUMBER = rf"(?<![\d.,])(?:{_THOUSANDS}|\d+(?:[.,]\d+)?)(?!\d|[.,]\d)"
+_AMOUNT = re.compile(rf"({_NUMBER})\s*(kcal|kj|mg|µg|mcg|g)?(?![a-zß-ÿ])(?!\s*%)", re.IGNORECASE)
+
+_GRAMS_PER_UNIT = {"g": 1.0, "mg": 1e-3, "µg": 1e-6, "mcg": 1e-6}
+_UNIT_NAMES = {"kcal": "kcal", "kj": "kJ", "g": "g", "mg": "mg", "µg": "µg", "mcg": "µg"}
+KJ_PER_KCAL = 4.184
+SALT_PER_SODIUM = 2.5  # EU labels declare salt = sodium x 2.5
+
+
+def _number(text: str) -> float:
+    """Amount text -> float: "1 500" / "1.500" -> 1500.0, "0,5" -> 0.5"""
+    if re.fullmatch(_THOUSANDS, text):
+        text = text.replace(" ", "").replace(".", "")
+    return float(text.replace(",", "."))
+
+
+def is_not_available(value: str) -> bool:
+    lowered = value.strip().lower()
+    return lowered in NOT_AVAILABLE_PHRASES or lowered.startswith(_NOT_AVAILABLE_PREFIXES)
+
+
+def normalize_value(value: str, not_available: str = NOT_AVAILABLE) -> str:
+    """Display form of a nutrition value: salt notes dropped, "not available" phrases unified"""
+    value = _SALT_NOTE.sub("", value.strip()).strip()
+    if is_not_available(value):
+        return not_available
+    return value
+
+
+class NutritionAmount:
+    """
+    One parsed nutrition value: the amount as printed (``value`` + ``unit``),
+    what it refers to (``basis``: "100g", "100ml", "serving" or None) and,
+    for sodium, whether the label declared it as salt.
+    """
+
+    def __init__(self, nutrient: str, value: float, unit: str, basis: Optional[str] = None,
+                 as_salt: bool = False, kcal: float = None, kj: float = None):
+        self.nutrient = nutrient
+        self.value = value
+        self.unit = unit
+        self.basis = basis
+        self.as_salt = as_salt
+        self._kcal = kcal
+        self._kj = kj
+
+    @property
+    def kcal(self) -> Optional[float]:
+        if self._kcal is not None:
+            return self._kcal
+        return round(self._kj / KJ_PER_KCAL, 1) if self._kj is not None else None
+
+    @property
+    def kj(self) -> Optional[float]:
+        if self._kj is not None:
+            return self._kj
+        return round(self._kcal * KJ_PER_KCAL, 1) if self._kcal is not None else None
+
+    @property
+    def grams(self) -> Optional[float]:
+        """Mass in grams (for sodium: sodium, converted from salt if declared as salt)"""
+        if self.unit not in _GRAMS_PER_UNIT:
+            return None
+        grams = self.value * _GRAMS_PER_UNIT[self.unit]
+        if self.as_salt:
+            grams /= SALT_PER_SODIUM
+        return round(grams, 6)
+
+    @property
+    def salt_grams(self) -> Optional[float]:
+        if self.nutrient != "sodium" or self.unit not in _GRAMS_PER_UNIT:
+            return None
+        return round(self.value * _GRAMS_PER_UNIT[self.unit] * (1 if self.as_salt else SALT_PER_SODIUM), 6)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"value": self.value, "unit": self.unit, "basis": self.basis}
+        if self.nutrient == "energy":
+            data.update(kcal=self.kcal, kj=self.kj)
+        else:
+            data["g"] = self.grams
+        if self.nutrient == "sodium":
+            data.update(as_salt=self.as_salt, salt_g=self.salt_grams)
+        return data
+
+
+def parse_value(nutrient: str, value: Any, default_basis: Optional[str] = None) -> Optional[NutritionAmount]:
+    """
+    Parse a raw or normalized nutrition value ("1500 kJ / 359 kcal", "<0,5 g",
+    "1,2 g (as salt)", "4 g per serving (30 g)"). Energy without a unit is
+    taken as kcal, anything else without a unit as grams. None when the value
+    is missing or holds no usable amount.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        unit = "kcal" if nutrient == "energy" else "g"
+        return NutritionAmount(nutrient, float(value), unit, default_basis,
+                               kcal=float(value) if nutrient == "energy" else None)
+    if not isinstance(value, str) or is_not_available(_SALT_NOTE.sub("", value)):
+        return None
+
+    basis = default_basis
+    per_100 = _PER_100.search(value)
+    if per_100:
+        basis = f"100{per_100.group(1).lower()}"
+        value = _PER_100.sub(" ", value)
+    elif _PER_SERVING.search(value):
+        basis = "serving"
+        value = _PER_SERVING.sub(" ", value)
+
+    amounts = [(_number(number), _UNIT_NAMES.get(unit.lower(), "") if unit else "")
+               for number, unit in _AMOUNT.findall(value)]
+    if not amounts:
+        return None
+
+    if nutrient == "energy":
+        kcal = next((number for number, unit in amounts if unit == "kcal"), None)
+        kj = next((number for number, unit in amounts if unit == "kJ"), None)
+        if kcal is None and kj is None:
+            if amounts[0][1]:
+                return None  # a mass is not an energy
+            kcal = amounts[0][0]
+        primary = (kcal, "kcal") if kcal is not None else (kj, "kJ")
+        return NutritionAmount(nutrient, primary[0], primary[1], basis, kcal=kcal, kj=kj)
+
+    if nutrient == "sodium":
+        return _sodium_amount(value, basis)
+    number, unit = next(((n, u) for n, u in amounts if u in _GRAMS_PER_UNIT), amounts[0])
+    if unit in ("kcal", "kJ"):
+        return None
+    return NutritionAmount(nutrient, number, unit or "g", basis)
+
+
+def _sodium_amount(value: str, basis: Optional[str]) -> Optional[NutritionAmount]:
+    """
+    The sodium figure of ``value``: an amount labelled sodium, else an
+    unlabelled one, else an amount labelled salt (converted via ``as_salt``).
+    A salt word only labels the amount right next to it, so "Sodium 0.4 g /
+    Salt 1.0 g" and "0.4 g (salt equivalent 1 g)" are both 0.4 g sodium.
+    """
+    labelled = {"sodium": [], None: [], "salt": []}
+    matches = list(_AMOUNT.finditer(value))
+    for i, match in enumerate(matches):
+        number, unit = match.groups()
+        unit = _UNIT_NAMES.get(unit.lower(), "") if unit else ""
+        if unit in ("kcal", "kJ"):
+            continue
+        before = value[matches[i - 1].end() if i else 0:match.start()]
+        after = _LABEL_AFTER.match(value, match.end())
+        word = _LABEL_BEFORE.search(before)
+        word = (after.group(1) or after.group(2)) if after else word.group(1) if word else None
+        kind = None if word is None else "sodium" if re.fullmatch(_SODIUM, word, re.IGNORECASE) else "salt"
+        labelled[kind].append((_number(number), unit or "g"))
+    for kind in ("sodium", None, "salt"):
+        if labelled[kind]:
+            number, unit = labelled[kind][0]
+            return NutritionAmount("sodium", number, unit, basis, as_salt=kind == "salt")
+    return None
+
+
+def normalize_nutrition(values: Dict[str, Any], per_100g: bool = True,
+                        nutrients: Iterable[str] = NUTRIENT_KEYS) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Normalize ``values`` (nutrient -> raw string) in place for display and
+    return the structured amounts (nutrient -> NutritionAmount.to_dict() or
+    None). Values without an explicit basis get "100g" when ``per_100g``,
+    else "serving".
+    """
+    default_basis = "100g" if per_100g else "serving"
+    amounts = {}
+    for nutrient in nutrients:
+        raw = values.get(nutrient)
+        if raw is None:
+            values[nutrient] = NOT_AVAILABLE
+        elif isinstance(raw, str):
+            values[nutrient] = normalize_value(raw)
+        parsed = parse_value(nutrient, raw, default_basis)
+        amounts[nutrient] = parsed.to_dict() if parsed else None
+    return amounts
+
+
+def normalize_results(results: Iterable[Dict[str, Any]],
+                      nutrients: Iterable[str] = NUTRIENT_KEYS) -> List[Dict[str, Any]]:
+    """
+    Batch form of ``normalize_nutrition`` for many analysis results (e.g. a
+    batch_cli JSONL export or rows from older versions): each result's
+    "nutritional_values" is normalized in place and missing
+    "nutritional_amounts" entries are filled in. Amounts already present are
+    kept, since they were parsed before salt notes were stripped.
+    """
+    nutrients = list(nutrients)
+    normalized = []
+    for result in results:
+        values = result.setdefault("nutritional_values", {})
+        per_100g = (result.get("metadata") or {}).get("per_100g", True)
+        amounts = normalize_nutrition(values, per_100g, nutrients)
+        existing = result.get("nutritional_amounts") or {}
+        result["nutritional_amounts"] = {key: existing.get(key) or amounts[key] for key in nutrients}
+        normalized.append(result)
+    return normalized
@@ -0,0 +1,165 @@
+# ocr_cache.py - Page-level OCR result cache keyed by page content and OCR settings
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from PyPDF2.generic import IndirectObject, StreamObject
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+# Keys that point back up the page tree rather than at page content
+_SKIP_KEYS = {"/Parent", "/P", "/Annots", "/B", "/Thumb", "/StructParents"}
+
+
+def _feed(digest, obj, seen: set) -> None:
+    """Hash a PDF object graph (streams by their raw bytes), following references once"""
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in seen:
+            digest.update(b"R%d" % obj.idnum)
+            return
+        seen.add(ref)
+        obj = obj.get_object()
+    if isinstance(obj, StreamObject):
+        digest.update(b"S")
+        digest.update(obj._data)
+    if isinstance(obj, dict):
+        for key in sorted(obj):
+            if key in _SKIP_KEYS:
+                continue
+            digest.update(key.encode("latin-1", "replace"))
+            _feed(digest, obj[key], seen)
+    elif isinstance(obj, list):
+        digest.update(b"[")
+        for item in obj:
+            _feed(digest, item, seen)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode("utf-8", "replace"))
+
+
+def page_fingerprint(page) -> str:
+    """
+    Hash of everything that determines how a page looks: its content
+    streams, the resources they use (fonts, images, forms), page boxes and
+    rotation. Byte-identical pages in revised PDFs hash the same even when
+    the rest of the file changed.
+    """
+    digest = hashlib.sha256()
+    seen: set = set()
+    for key in ("/Contents", "/Resources", "/MediaBox", "/CropBox", "/Rotate"):
+        digest.update(key.encode())
+        if key in page:
+            _feed(digest, page[key], seen)
+    return digest.hexdigest()
+
+
+def image_fingerprint(image) -> str:
+    """Hash of a rendered page image (for PDFs PyPDF2 could not parse)"""
+    digest = hashlib.sha256(f"{image.mode}{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def settings_fingerprint(settings: Dict[str, Any]) -> str:
+    """Short hash of the OCR settings that affect the output text"""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class PageOCRCache:
+    """
+    LRU cache of per-page OCR results, optionally persisted to disk.
+
+    Entries are keyed by ``<page fingerprint>-<settings fingerprint>``; the
+    in-memory LRU holds Config.OCR_CACHE_MAX_ENTRIES pages and, when
+    Config.OCR_CACHE_DIR is set, every entry is also written there as JSON
+    so that it survives restarts and is shared between worker processes.
+    """
+
+    def __init__(self, max_entries: int = None, directory: str = None):
+        self.max_entries = max_entries or Config.OCR_CACHE_MAX_ENTRIES
+        self.directory = directory if directory is not None else Config.OCR_CACHE_DIR
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return (text, page details) for ``key``, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, entry)
+            return entry
+
+    def has(self, key: str) -> bool:
+        """Whether ``key`` is cached, without touching the LRU order or the hit counters"""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(key))
+
+    def put(self, key: str, text: str, info: Dict[str, Any]) -> None:
+        entry = (text, info)
+        with self._lock:
+            self._remember(key, entry)
+            self.stats["stores"] += 1
+        self._write_disk(key, entry)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "max_entries": self.max_entries,
+                    "directory": self.directory or None}
+
+    def _remember(self, key: str, entry: Tuple[str, Dict[str, Any]]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as fh:
+                data = json.load(fh)
+            return data["text"], data["info"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("⚠️ Ignoring unreadable OCR cache entry %s: %s", key, e)
+            return None
+
+    def _write_disk(self, key: str, entry: Tuple[str, Dict[str, Any]]) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"text": entry[0], "info": entry[1]}, fh)
+            os.replace(tmp, path)  # atomic: concurrent readers never see half a file
+        except OSError as e:
+            logger.warning("⚠️ Could not persist OCR cache entry %s: %s", key, e)
@@ -0,0 +1,480 @@
+# ocr_pipeline.py - Adaptive-resolution Tesseract OCR for rasterized PDF pages
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pytesseract
+from pdf2image import convert_from_bytes
+
+from config import Config
+from deadline import current as current_deadline, tesseract_timeout
+from image_preprocessing import preprocess as preprocess_image
+from ocr_cache import page_fingerprint, image_fingerprint
+from ocr_profiles import current as current_profile
+from pdf_images import find_page_image
+from roi_detection import detect_regions
+
+logger = logging.getLogger("be_aware_backend")
+
+PAGE = "page"
+REGION = "region"
+ROI = "roi"
+
+
+def tesseract_config(psm: int = None) -> str:
+    """Options for the calling thread's OCR profile (see ocr_profiles.bind)"""
+    return current_profile().tesseract_config(psm)
+
+
+def first_pass_dpi() -> int:
+    """DPI the whole document is rasterized at before any escalation"""
+    ladder = current_profile().dpi_ladder
+    if Config.OCR_ESCALATION == "off" or not ladder:
+        return Config.PDF_DPI
+    return ladder[0]
+
+
+def ocr_settings() -> Dict[str, Any]:
+    """Every setting that changes the OCR text of a page (part of the page cache key)"""
+    return {
+        **current_profile().settings(),
+        "dpi": Config.PDF_DPI,
+        "escalation": Config.OCR_ESCALATION,
+        "preprocess": Config.OCR_PREPROCESS_STEPS,
+        "roi_settings": [Config.OCR_ROI_ENABLED, Config.OCR_ROI_DPI, Config.OCR_ROI_PSM],
+    }
+
+
+def warm_up() -> None:
+    """Run Tesseract once on a tiny image so its binary and the profile's models are loaded from disk"""
+    from PIL import Image
+    read_lines(Image.new("L", (64, 32), 255))
+
+
+def render_page(pdf_bytes: bytes, page_number: int, dpi: int):
+    """Rasterize a single (1-based) page"""
+    return convert_from_bytes(pdf_bytes, dpi=dpi, fmt=Config.PDF_FORMAT,
+                              first_page=page_number, last_page=page_number)[0]
+
+
+class PageSource:
+    """
+    Where the pixels of one page come from.
+
+    Image-only pages (typical scans) decode their embedded image directly at
+    up to its native resolution; everything else is rasterized by poppler.
+    """
+
+    def __init__(self, pdf_bytes: bytes, page_number: int, page=None, embedded=None, rendered=None):
+        self.pdf_bytes = pdf_bytes
+        self.page_number = page_number
+        self.page = page  # PyPDF2 page, None if the PDF could not be parsed
+        self.embedded = embedded
+        self._rendered = rendered  # (image, dpi) from a whole-document render
+        self._fingerprint = None
+
+    def fingerprint(self) -> Optional[str]:
+        """Content hash of the page (or of its pre-rendered image), None if unavailable"""
+        if self._fingerprint is None:
+            try:
+                if self.page is not None:
+                    self._fingerprint = page_fingerprint(self.page)
+                elif self._rendered is not None:
+                    self._fingerprint = image_fingerprint(self._rendered[0])
+            except Exception as e:
+                logger.warning("⚠️ Page %d: could not fingerprint page: %s", self.page_number, e)
+        return self._fingerprint
+
+    @property
+    def max_dpi(self) -> float:
+        return self.embedded.native_dpi if self.embedded is not None else float("inf")
+
+    @property
+    def kind(self) -> str:
+        return "embedded" if self.embedded is not None else "rendered"
+
+    def thumbnail(self, dpi: int):
+        """Low-resolution view of the page, downscaled from an existing render when there is one"""
+        if self._rendered is not None and self._rendered[1] > dpi:
+            image, rendered_dpi = self._rendered
+            scale = dpi / rendered_dpi
+            return image.resize((max(1, int(image.size[0] * scale)), max(1, int(image.size[1] * scale)))), dpi
+        return self.render(dpi)
+
+    def render(self, dpi: int):
+        """
+        Returns:
+            Tuple of (image, effective dpi); embedded images are never upscaled
+        """
+        if self.embedded is not None:
+            try:
+                return self.embedded.render(dpi)
+            except Exception as e:
+                logger.warning("⚠️ Page %d: embedded image decode failed (%s), rendering instead",
+                               self.page_number, e)
+                self.embedded = None
+        if self._rendered is not None and self._rendered[1] == dpi:
+            image, self._rendered = self._rendered[0], None
+            return image, dpi
+        return render_page(self.pdf_bytes, self.page_number, dpi), dpi
+
+
+def page_sources(pdf_bytes: bytes, reader, dpi: int,
+                 cached: Callable[[PageSource], bool] = None) -> List[PageSource]:
+    """
+    One PageSource per page.
+
+    When no page carries a directly usable embedded image, the document is
+    rasterized at ``dpi`` in a single poppler run, as before; otherwise only
+    the composite pages are rendered, one by one, when they are OCR'd.
+    Pages for which ``cached(source)`` is true are never rasterized up
+    front: if any are, the remaining pages are rendered one by one too.
+    """
+    pages = list(reader.pages) if reader is not None else []
+    embedded = [find_page_image(page) for page in pages]
+    if not any(embedded):
+        if pages and cached is not None:
+            sources = [PageSource(pdf_bytes, n, page=page) for n, page in enumerate(pages, 1)]
+            hits = sum(1 for source in sources if cached(source))
+            if hits:
+                logger.info("♻️ %d/%d page(s) already in the OCR cache - rendering only the rest",
+                            hits, len(sources))
+                return sources
+        images = convert_from_bytes(pdf_bytes, dpi=dpi, fmt=Config.PDF_FORMAT)
+        return [PageSource(pdf_bytes, n, page=pages[n - 1] if pages else None, rendered=(image, dpi))
+                for n, image in enumerate(images, 1)]
+    logger.info("🖼️ Using embedded page images for %d/%d page(s)",
+                sum(1 for e in embedded if e is not None), len(embedded))
+    return [PageSource(pdf_bytes, n, page=page, embedded=image)
+            for n, (page, image) in enumerate(zip(pages, embedded), 1)]
+
+
+def read_lines(img, psm: int = None) -> List[Dict[str, Any]]:
+    """
+    OCR an image with ``image_to_data`` and group the words into lines.
+
+    Returns:
+        One dict per text line: block, text, words (count), conf (mean word
+        confidence, None when Tesseract gave none) and box (left, top, right, bottom)
+    """
+    data = pytesseract.image_to_data(img, lang=current_profile().languages, config=tesseract_config(psm),
+                                     output_type=pytesseract.Output.DICT, timeout=tesseract_timeout())
+    lines: Dict[tuple, Dict[str, Any]] = {}
+    for i, word in enumerate(data["text"]):
+        if not word or not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        line = lines.get(key)
+        if line is None:
+            line = lines[key] = {"block": key[0], "words": [], "confs": [],
+                                 "box": [left, top, right, bottom]}
+        line["words"].append(word)
+        conf = float(data["conf"][i])
+        if conf >= 0:
+            line["confs"].append(conf)
+        box = line["box"]
+        box[0], box[1] = min(box[0], left), min(box[1], top)
+        box[2], box[3] = max(box[2], right), max(box[3], bottom)
+
+    return [{
+        "block": line["block"],
+        "text": " ".join(line["words"]),
+        "words": len(line["words"]),
+        "conf": sum(line["confs"]) / len(line["confs"]) if line["confs"] else None,
+        "box": tuple(line["box"]),
+    } for line in lines.values()]
+
+
+def lines_to_text(lines: List[Dict[str, Any]]) -> str:
+    """Join OCR lines, with a blank line between Tesseract blocks"""
+    out = []
+    previous_block = None
+    for line in lines:
+        if previous_block is not None and line["block"] != previous_block:
+            out.append("")
+        out.append(line["text"])
+        previous_block = line["block"]
+    return "\n".join(out)
+
+
+def page_confidence(lines: List[Dict[str, Any]]) -> Optional[float]:
+    """Word-weighted mean confidence of a page"""
+    scored = [(line["conf"], line["words"]) for line in lines if line["conf"] is not None]
+    total = sum(words for _, words in scored)
+    if not total:
+        return None
+    return sum(conf * words for conf, words in scored) / total
+
+
+def _low_confidence_runs(lines: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+    """(start, end) index ranges of consecutive low-confidence lines within one block"""
+    runs = []
+    start = None
+    for i, line in enumerate(lines):
+        low = line["conf"] is None or line["conf"] < Config.OCR_MIN_LINE_CONFIDENCE
+        if low and start is not None and line["block"] != lines[start]["block"]:
+            runs.append((start, i))
+            start = i
+        elif low and start is None:
+            start = i
+        elif not low and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(lines)))
+    return runs
+
+
+def escalation_decision(lines: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Decide how to escalate a page after an OCR pass.
+
+    Returns:
+        None (good enough), PAGE (re-read the whole page at the next DPI) or
+        REGION (re-read only the low-confidence line runs)
+    """
+    mode = Config.OCR_ESCALATION
+    if mode == "off":
+        return None
+    confidence = page_confidence(lines)
+    if confidence is None:
+        # Nothing recognised at all: small print is the usual cause
+        return PAGE
+    runs = _low_confidence_runs(lines)
+    if mode == PAGE:
+        return PAGE if confidence < Config.OCR_MIN_PAGE_CONFIDENCE else None
+    if not runs:
+        return None
+    if mode == REGION:
+        return REGION
+
+    low_lines = sum(end - start for start, end in runs)
+    if (low_lines / len(lines) > Config.OCR_REGION_MAX_FRACTION
+            or len(runs) > Config.OCR_MAX_REGIONS
+            or confidence < Config.OCR_MIN_PAGE_CONFIDENCE):
+        return PAGE
+    return REGION
+
+
+def _can_escalate() -> bool:
+    """Whether the request deadline leaves room for a higher-resolution re-read"""
+    deadline = current_deadline()
+    if deadline is None:
+        return True
+    if deadline.remaining() >= Config.DEADLINE_LLM_RESERVE + Config.DEADLINE_OCR_ESCALATION_MIN:
+        return True
+    deadline.degraded = True
+    return False
+
+
+def _crop_scaled(image, box, scale: float):
+    """Crop a first-pass box from a higher-resolution image of the same page"""
+    width, height = image.size
+    return image.crop((max(0, int(box[0] * scale)), max(0, int(box[1] * scale)),
+                       min(width, int(box[2] * scale)), min(height, int(box[3] * scale))))
+
+
+def _read_rois(lines: List[Dict[str, Any]], rois: List[Tuple[str, tuple]], image,
+               scale: float) -> List[Dict[str, Any]]:
+    """
+    Replace the first-pass lines inside each region of interest with a
+    high-resolution read of the region, in the position of its first line.
+    """
+    roi_lines: List[Optional[Dict[str, Any]]] = []
+    for index, (kind, box) in enumerate(rois):
+        reread = read_lines(_crop_scaled(image, box, scale), psm=Config.OCR_ROI_PSM)
+        if not reread:
+            roi_lines.append(None)  # keep the first-pass text of this region
+            continue
+        roi_lines.append({
+            "block": -1 - index,
+            "text": "\n".join(line["text"] for line in reread),
+            "words": sum(line["words"] for line in reread),
+            "conf": page_confidence(reread),
+            "box": box,
+        })
+
+    def roi_of(line) -> Optional[int]:
+        cx = (line["box"][0] + line["box"][2]) / 2
+        cy = (line["box"][1] + line["box"][3]) / 2
+        for index, (_, box) in enumerate(rois):
+            if roi_lines[index] is not None and box[0] <= cx <= box[2] and box[1] <= cy <= box[3]:
+                return index
+        return None
+
+    result: List[Dict[str, Any]] = []
+    emitted = set()
+    for line in lines:
+        index = roi_of(line)
+        if index is None:
+            result.append(line)
+        elif index not in emitted:
+            result.append(roi_lines[index])
+            emitted.add(index)
+    result.extend(roi for index, roi in enumerate(roi_lines) if roi is not None and index not in emitted)
+    return result
+
+
+def _reread_regions(lines: List[Dict[str, Any]], image, scale: float) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    OCR the low-confidence line runs again on a higher-resolution image.
+
+    Line boxes are in first-pass pixels; ``scale`` maps them onto ``image``.
+    A run is replaced by the re-read text only if it scores higher.
+    """
+    pad = Config.OCR_REGION_PADDING
+    result: List[Dict[str, Any]] = []
+    cursor = 0
+    regions = 0
+
+    for start, end in _low_confidence_runs(lines):
+        result.extend(lines[cursor:start])
+        cursor = end
+        run = lines[start:end]
+        box = (min(l["box"][0] for l in run) - pad, min(l["box"][1] for l in run) - pad,
+               max(l["box"][2] for l in run) + pad, max(l["box"][3] for l in run) + pad)
+        crop = _crop_scaled(image, box, scale)
+        regions += 1
+
+        reread = read_lines(crop, psm=Config.OCR_REGION_PSM)
+        new_conf = page_confidence(reread)
+        old_conf = page_confidence(run)
+        if reread and new_conf is not None and (old_conf is None or new_conf > old_conf):
+            result.append({
+                "block": run[0]["block"],
+                "text": "\n".join(line["text"] for line in reread),
+                "words": sum(line["words"] for line in reread),
+                "conf": new_conf,
+                "box": box,
+            })
+        else:
+            result.extend(run)
+
+    result.extend(lines[cursor:])
+    return result, regions
+
+
+def ocr_page(source: PageSource, dpi: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    OCR one page at low resolution, then spend high-resolution OCR only where needed.
+
+    When the first pass finds regions of interest (ruled tables, blocks
+    anchored by a nutrition/allergen/ingredient keyword) those regions alone
+    are re-read at Config.OCR_ROI_DPI with a table-friendly PSM. Otherwise
+    the page escalates up the OCR profile's DPI ladder while confidence is low.
+
+    Args:
+        source: The page to read
+        dpi: First-pass resolution
+
+    Returns:
+        Tuple of (page text, details with the final DPI, escalation and timings)
+    """
+    timings: Dict[str, float] = {}
+
+    def add_timings(step_timings: Dict[str, float]) -> None:
+        for step, ms in step_timings.items():
+            timings[step] = ms if step == "deskew_angle" else round(timings.get(step, 0.0) + ms, 1)
+
+    def timed_read(img, psm: int = None):
+        started = time.perf_counter()
+        try:
+            return read_lines(img, psm)
+        finally:
+            add_timings({"tesseract": (time.perf_counter() - started) * 1000})
+
+    page_number = source.page_number
+    started = time.perf_counter()
+    image, dpi = source.render(dpi)
+    add_timings({"render": (time.perf_counter() - started) * 1000})
+
+    geometry: Dict[str, Any] = {}
+    processed, step_timings = preprocess_image(image, dpi=dpi, geometry=geometry)
+    add_timings(step_timings)
+    lines = timed_read(processed)
+
+    base_dpi = dpi
+    escalation = None
+    regions = 0
+    roi_kinds: List[str] = []
+
+    degraded = not _can_escalate()
+    rois = []
+    profile = current_profile()
+    use_roi = Config.OCR_ROI_ENABLED and profile.roi
+    if not degraded and use_roi and dpi < min(Config.OCR_ROI_DPI, source.max_dpi) and lines:
+        started = time.perf_counter()
+        rois = detect_regions(processed, lines, dpi)
+        add_timings({"roi_detect": (time.perf_counter() - started) * 1000})
+        covered = sum((b[2] - b[0]) * (b[3] - b[1]) for _, b in rois)
+        if covered > Config.OCR_ROI_MAX_AREA * processed.size[0] * processed.size[1]:
+            rois = []
+
+    if rois:
+        # Only the regions that carry the data get high-resolution OCR
+        logger.debug("🎯 Page %d: re-reading %d region(s) at %d DPI", page_number, len(rois), Config.OCR_ROI_DPI)
+        started = time.perf_counter()
+        hi_res, roi_dpi = source.render(Config.OCR_ROI_DPI)
+        add_timings({"render": (time.perf_counter() - started) * 1000})
+        processed, step_timings = preprocess_image(hi_res, dpi=roi_dpi, geometry=geometry)
+        add_timings(step_timings)
+        started = time.perf_counter()
+        lines = _read_rois(lines, rois, processed, roi_dpi / dpi)
+        add_timings({"tesseract": (time.perf_counter() - started) * 1000})
+        dpi = roi_dpi
+        escalation = ROI
+        regions = len(rois)
+        roi_kinds = [kind for kind, _ in rois]
+        ladder = []
+    elif degraded:
+        logger.debug("⏱️ Page %d: not enough time left to re-read at higher DPI", page_number)
+        ladder = []
+    else:
+        ladder = [d for d in profile.dpi_ladder if d > dpi]
+
+    for next_dpi in ladder:
+        decision = escalation_decision(lines)
+        if decision is None:
+            break
+        if not _can_escalate():
+            degraded = True
+            break
+        logger.debug("🔎 Page %d: confidence %.0f at %d DPI, escalating %s to %d DPI",
+                    page_number, page_confidence(lines) or 0, dpi, decision, next_dpi)
+
+        started = time.perf_counter()
+        hi_res, next_dpi = source.render(next_dpi)
+        add_timings({"render": (time.perf_counter() - started) * 1000})
+        if next_dpi <= dpi:
+            break  # embedded image is already at its native resolution
+        processed, step_timings = preprocess_image(hi_res, dpi=next_dpi, geometry=geometry)
+        add_timings(step_timings)
+
+        if decision == PAGE:
+            lines = timed_read(processed)
+            base_dpi = next_dpi
+            escalation = PAGE
+        else:
+            started = time.perf_counter()
+            lines, count = _reread_regions(lines, processed, next_dpi / base_dpi)
+            add_timings({"tesseract": (time.perf_counter() - started) * 1000})
+            regions += count
+            escalation = escalation or REGION
+        dpi = next_dpi
+
+    confidence = page_confidence(lines)
+    return lines_to_text(lines), {
+        "page": page_number,
+        "source": source.kind,
+        "profile": profile.name,
+        "dpi": round(dpi),
+        "escalation": escalation,
+        "regions": regions,
+        "roi_kinds": roi_kinds,
+        "degraded": degraded,
+        "confidence": round(confidence, 1) if confidence is not None else None,
+        "image_size": list(processed.size),
+        "timings_ms": timings,
+    }
@@ -0,0 +1,131 @@
+# ocr_profiles.py - Named Tesseract speed/accuracy profiles (model set, OEM/PSM, DPI, languages)
+import os
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+
+class OCRProfile:
+    """
+    One entry of Config.OCR_PROFILES.
+
+    ``models`` names a Tesseract model set in Config.TESSDATA_DIRS: "fast"
+    (tessdata_fast, integer LSTM models), "best" (tessdata_best, float LSTM
+    models) or "default" (whatever the system tesseract ships). The fast and
+    best sets only contain LSTM models, hence OEM 1.
+    """
+
+    def __init__(self, name: str, models: str, oem: int, psm: int, dpi_ladder: List[int],
+                 languages: str, roi: bool = True):
+        self.name = name
+        self.models = models
+        self.oem = oem
+        self.psm = psm
+        self.dpi_ladder = list(dpi_ladder)
+        self.languages = languages
+        self.roi = roi
+
+    @property
+    def tessdata_dir(self) -> str:
+        """Configured model directory ("" = Tesseract's own tessdata)"""
+        return Config.TESSDATA_DIRS.get(self.models, "")
+
+    @property
+    def installed(self) -> bool:
+        return not self.tessdata_dir or os.path.isdir(self.tessdata_dir)
+
+    def tesseract_config(self, psm: int = None) -> str:
+        """
+        Tesseract command-line options; when the model directory is missing
+        the system models are used so OCR keeps working.
+        """
+        config = f"--psm {psm or self.psm} --oem {self.oem}"
+        if self.tessdata_dir and self.installed:
+            config += f' --tessdata-dir "{self.tessdata_dir}"'
+        return config
+
+    def settings(self) -> Dict[str, Any]:
+        """Everything about the profile that changes OCR output (part of the page cache key)"""
+        return {"profile": self.name, "models": self.models if self.installed else "default",
+                "oem": self.oem, "psm": self.psm, "dpi_ladder": self.dpi_ladder,
+                "languages": self.languages, "roi": self.roi}
+
+    def status(self) -> Dict[str, Any]:
+        """Profile settings plus which of its languages are installed"""
+        wanted = [lang for lang in self.languages.split("+") if lang]
+        available: List[str] = []
+        error = None
+        if self.installed:
+            import pytesseract  # imported here so the API can validate profile names without it
+            try:
+                options = f'--tessdata-dir "{self.tessdata_dir}"' if self.tessdata_dir else ""
+                available = pytesseract.get_languages(config=options)
+            except Exception as e:
+                error = str(e)
+        return {
+            "name": self.name,
+            "default": self.name == Config.OCR_PROFILE,
+            "models": self.models,
+            "tessdata_dir": self.tessdata_dir or None,
+            "installed": self.installed and error is None,
+            "oem": self.oem,
+            "psm": self.psm,
+            "dpi_ladder": self.dpi_ladder,
+            "roi": self.roi,
+            "languages": [lang for lang in wanted if lang in available],
+            "missing_languages": [lang for lang in wanted if lang not in available],
+            **({"error": error} if error else {}),
+        }
+
+
+PROFILES: Dict[str, OCRProfile] = {name: OCRProfile(name, **settings)
+                                   for name, settings in Config.OCR_PROFILES.items()}
+
+if Config.OCR_PROFILE not in PROFILES:
+    raise ValueError(f"OCR_PROFILE must be one of {', '.join(PROFILES)}, got {Config.OCR_PROFILE!r}")
+
+
+def get_profile(name: Optional[str] = None) -> OCRProfile:
+    """
+    Profile called ``name`` (the deployment default when None).
+
+    Raises:
+        ValueError: If no such profile exists
+    """
+    name = name or Config.OCR_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown OCR profile {name!r}. Use one of: {', '.join(PROFILES)}.")
+    profile = PROFILES[name]
+    if not profile.installed:
+        logger.warning("⚠️ OCR profile %s: %s not found, using the system models",
+                       name, profile.tessdata_dir)
+    return profile
+
+
+def profile_status() -> List[Dict[str, Any]]:
+    """Status of every configured profile (for the OCR test and /supported-languages)"""
+    return [profile.status() for profile in PROFILES.values()]
+
+
+_local = threading.local()
+
+
+def current() -> OCRProfile:
+    """Profile bound to the calling thread, else the deployment default"""
+    return getattr(_local, "profile", None) or PROFILES[Config.OCR_PROFILE]
+
+
+@contextmanager
+def bind(profile: Optional[OCRProfile]):
+    """Make ``profile`` the calling thread's OCR profile for the duration of the block"""
+    previous = getattr(_local, "profile", None)
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = previous
@@ -0,0 +1,92 @@
+# page_triage.py - Cheap thumbnail pass deciding which pages deserve full OCR
+import time
+import logging
+import unicodedata
+from typing import Any, Dict, List
+
+import numpy as np
+import pytesseract
+
+from config import Config
+from deadline import tesseract_timeout
+
+logger = logging.getLogger("be_aware_backend")
+
+RELEVANT = "relevant"
+IRRELEVANT = "irrelevant"
+UNKNOWN = "unknown"
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents, so a single-language probe still matches 'nährwert'"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+_KEYWORDS = sorted({_fold(keyword) for keyword in Config.OCR_ROI_KEYWORDS})
+
+
+def keyword_hits(text: str, keywords: List[str] = None) -> List[str]:
+    """Keywords (default Config.OCR_ROI_KEYWORDS) found in ``text``, ignoring case and accents"""
+    folded = _fold(text)
+    candidates = _KEYWORDS if keywords is None else sorted({_fold(keyword) for keyword in keywords})
+    return [keyword for keyword in candidates if keyword in folded]
+
+
+def text_density(gray: np.ndarray) -> Dict[str, float]:
+    """
+    Layout statistics of a grayscale thumbnail.
+
+    Returns:
+        ink: share of dark pixels; midtones: share of grey pixels (photos,
+        gradients); text_rows: share of rows crossing several dark strokes
+    """
+    dark = gray < 128
+    transitions = np.count_nonzero(dark[:, 1:] != dark[:, :-1], axis=1)
+    return {
+        "ink": round(float(dark.mean()), 4),
+        "midtones": round(float(((gray > 64) & (gray < 192)).mean()), 4),
+        "text_rows": round(float((transitions >= 6).mean()), 4),
+    }
+
+
+def triage_page(source) -> Dict[str, Any]:
+    """
+    Classify a page as relevant, irrelevant or unknown for allergen/nutrition OCR.
+
+    A thumbnail at Config.OCR_TRIAGE_DPI gives layout statistics and a fast
+    single-language sparse-text Tesseract probe. Keyword hits make a page
+    relevant. Blank pages, pictures without text, and pages with plenty of
+    confidently read text but no keyword (certificates, legal boilerplate)
+    are irrelevant. Anything else is unknown and gets full OCR.
+    """
+    started = time.perf_counter()
+    thumbnail, _ = source.thumbnail(Config.OCR_TRIAGE_DPI)
+    gray = np.asarray(thumbnail.convert("L"))
+    stats = text_density(gray)
+
+    def decide(page_class: str, reason: str, **extra) -> Dict[str, Any]:
+        return {"class": page_class, "reason": reason, **stats, **extra,
+                "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    if stats["ink"] < Config.OCR_TRIAGE_BLANK_INK:
+        return decide(IRRELEVANT, "blank")
+
+    data = pytesseract.image_to_data(
+        gray, lang=Config.OCR_TRIAGE_LANGUAGE,
+        config=f"--psm 11 --oem {Config.TESSERACT_OEM}",
+        output_type=pytesseract.Output.DICT,
+        timeout=tesseract_timeout()
+    )
+    words = [word for word, conf in zip(data["text"], data["conf"])
+             if word.strip() and float(conf) >= 50]
+    hits = keyword_hits(" ".join(words))
+
+    if hits:
+        return decide(RELEVANT, "keywords", words=len(words), keywords=hits[:5])
+    if len(words) >= Config.OCR_TRIAGE_MIN_WORDS:
+        return decide(IRRELEVANT, "text_without_keywords", words=len(words))
+    if (stats["text_rows"] < Config.OCR_TRIAGE_MIN_TEXT_ROWS
+            and stats["midtones"] > Config.OCR_TRIAGE_PICTURE_MIDTONES):
+        return decide(IRRELEVANT, "picture", words=len(words))
+    return decide(UNKNOWN, "inconclusive", words=len(words))
@@ -2,20 +2,69 @@
 import io
 import json
 import logging
-from typing import Tuple, Dict, Any
+import threading
+from typing import Tuple, Dict, Any, Callable, List, Optional
 
-from pdf2image import convert_from_bytes
 from PyPDF2 import PdfReader
 import pytesseract
 
 from config import Config
+from deadline import (AnyEvent, Deadline, DeadlineStats, DeadlineExceededError, RequestCancelledError,
+                      bind as bind_deadline, track_tesseract_processes)
+from llm import LLMCancelledError
+from llm_stream import RESET, PartialGate
+from ocr_cache import PageOCRCache, settings_fingerprint
+from ocr_profiles import get_profile, bind as bind_profile, current as current_profile
+from ocr_pipeline import PageSource, ocr_page, ocr_settings, page_sources, first_pass_dpi
+from llm_batching import LLMBatcher
+from nutrition import NUTRIENT_KEYS, NOT_AVAILABLE, normalize_nutrition, normalize_value
+from upstream_governor import UpstreamUnavailableError
+from page_triage import triage_page, keyword_hits, IRRELEVANT
+from scheduler import PipelineScheduler, INTERACTIVE
+from speculation import SpeculativeExtraction
+from table_layout import Fragment, NutritionTable, find_nutrition_table, fragment_collector, text_without
 
 logger = logging.getLogger("be_aware_backend")
 
 # Configure pytesseract
 if Config.TESSERACT_CMD:
     pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_CMD
-    logger.info(f"🔍 DEBUG: Tesseract CMD set to: {Config.TESSERACT_CMD}")
+    logger.debug("🔧 Tesseract command: %s", Config.TESSERACT_CMD)
+# Let request cancellation kill running tesseract processes
+track_tesseract_processes(pytesseract)
+
+
+ALLERGEN_KEYS = ["gluten", "egg", "crustaceans", "fish", "peanut", "soy",
+                 "milk", "tree_nuts", "celery", "mustard"]
+
+# Shared instruction/schema preamble for single and batched extraction prompts
+_ALLERGEN_FIELDS = """  "allergens": {
+    "gluten": true/false,
+    "egg": true/false,
+    "crustaceans": true/false,
+    "fish": true/false,
+    "peanut": true/false,
+    "soy": true/false,
+    "milk": true/false,
+    "tree_nuts": true/false,
+    "celery": true/false,
+    "mustard": true/false
+  }"""
+_NUTRITION_FIELDS = """  "nutritional_values": {
+    "energy": "...",
+    "fat": "...",
+    "carbohydrate": "...",
+    "sugar": "...",
+    "protein": "...",
+    "sodium": "..."
+  }"""
+_METADATA_FIELDS = """  "metadata": {
+    "language_detected": "...",
+    "confidence": "high/medium/low"
+  }"""
+EXTRACTION_SCHEMA = "{\n" + ",\n".join([_ALLERGEN_FIELDS, _NUTRITION_FIELDS, _METADATA_FIELDS]) + "\n}"
+# Nutrition already read from a layout table: the LLM only has to find allergens
+ALLERGEN_SCHEMA = "{\n" + ",\n".join([_ALLERGEN_FIELDS, _METADATA_FIELDS]) + "\n}"
 
 
 class PDFAnalyzer:
@@ -29,149 +78,471 @@ class PDFAnalyzer:
             llm_client: Instance of LLMClient for text analysis
         """
         self.llm_client = llm_client
+        self.scheduler = PipelineScheduler()
+        self.ocr_cache = PageOCRCache() if Config.OCR_CACHE_ENABLED else None
+        self.deadline_stats = DeadlineStats()
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
         logger.info("✅ PDFAnalyzer initialized")
 
-    def extract_text_from_pdf(self, pdf_bytes: bytes) -> Tuple[str, bool]:
+    @property
+    def batcher(self) -> LLMBatcher:
+        """Shared multi-document LLM batcher, started on first use"""
+        with self._batcher_lock:
+            if self._batcher is None:
+                self._batcher = LLMBatcher(self)
+            return self._batcher
+
+    def extract_text_from_pdf(self, pdf_bytes: bytes, priority: str = INTERACTIVE) -> Tuple[str, bool]:
         """
         Try direct text extraction via PyPDF2; if insufficient, fallback to OCR.
 
         Args:
             pdf_bytes: PDF file contents as bytes
+            priority: Scheduling class for the OCR stage
 
         Returns:
             Tuple of (extracted_text, ocr_used)
         """
+        text, ocr_used, _ = self.extract_text_with_details(pdf_bytes, priority=priority)
+        return text, ocr_used
+
+    def extract_text_with_details(self, pdf_bytes: bytes, priority: str = INTERACTIVE,
+                                  strict: bool = False,
+                                  deadline: Deadline = None,
+                                  on_page: Callable[[str, str], None] = None) -> Tuple[str, bool, Dict[str, Any]]:
+        """
+        Same as ``extract_text_from_pdf``, plus per-page OCR details.
+
+        Args:
+            strict: OCR every page (no triage), e.g. for audits
+            deadline: Request budget; once less than Config.DEADLINE_LLM_RESERVE
+                is left, remaining pages are skipped (if some text was found)
+            on_page: Optional callback receiving (text so far, page text) after
+                each page OCR produced text for
+
+        Returns:
+            Tuple of (extracted_text, ocr_used, ocr_details) where ocr_details
+            holds one entry per page (final DPI, escalation, confidence, timings,
+            triage decision) and the list of pages triage skipped
+        """
         text = ""
+        raw_text = ""  # as PyPDF2 flattened it, before any nutrition table was rebuilt
         ocr_used = False
+        details: Dict[str, Any] = {"pages": []}
+        reader = None
+        deadline = deadline or Deadline()
 
         try:
-            logger.info("📄 Trying PyPDF2 text extraction")
+            logger.debug("📄 Trying PyPDF2 text extraction")
             reader = PdfReader(io.BytesIO(pdf_bytes))
-            logger.info(f"🔍 DEBUG: PDF has {len(reader.pages)} pages")
+            logger.debug("📄 PDF has %d pages", len(reader.pages))
 
             for i, page in enumerate(reader.pages):
+                fragments: List[Fragment] = []
                 try:
-                    page_text = page.extract_text() or ""
+                    page_text = page.extract_text(
+                        visitor_text=fragment_collector(fragments) if Config.LAYOUT_TABLES_ENABLED else None
+                    ) or ""
                 except Exception as e:
-                    logger.warning(f"⚠️ Page {i + 1} extraction error: {e}")
+                    logger.warning("⚠️ Page %d extraction error: %s", i + 1, e)
                     page_text = ""
                 if page_text.strip():
+                    raw_text += f"\n--- Page {i + 1} ---\n{page_text}"
+                    if fragments and "nutrition_table" not in details:
+                        page_text = self._layout_page_text(page_text, fragments, i + 1, details)
                     text += f"\n--- Page {i + 1} ---\n{page_text}"
-                    logger.info(f"🔍 DEBUG: Page {i + 1} extracted {len(page_text)} chars")
+                    logger.debug("📄 Page %d extracted %d chars", i + 1, len(page_text))
 
             if text.strip():
-                logger.info("✅ PyPDF2 extracted %d characters", len(text))
+                logger.debug("✅ PyPDF2 extracted %d characters", len(text))
             else:
                 logger.info("⚠️ PyPDF2 extracted 0 characters - will use OCR")
         except Exception as e:
             logger.exception("⚠️ PyPDF2 extraction error: %s", e)
 
         # If not enough text, use OCR
-        if not text.strip() or len(text.strip()) < Config.MIN_TEXT_LENGTH:
+        if not raw_text.strip() or len(raw_text.strip()) < Config.MIN_TEXT_LENGTH:
             ocr_used = True
-            logger.info(f"📷 Falling back to OCR (languages={Config.OCR_LANGUAGES})")
-            logger.info(f"🔍 DEBUG: Text length was {len(text.strip())}, minimum required: {Config.MIN_TEXT_LENGTH}")
+            text = raw_text
+            details.pop("nutrition_table", None)
+            profile = current_profile()
+            logger.info("📷 Falling back to OCR (profile=%s, languages=%s, direct text %d < %d chars)",
+                        profile.name, profile.languages, len(raw_text.strip()), Config.MIN_TEXT_LENGTH)
 
             try:
-                logger.info("🔍 DEBUG: Starting PDF to image conversion...")
-                images = convert_from_bytes(
-                    pdf_bytes,
-                    dpi=Config.PDF_DPI,
-                    fmt=Config.PDF_FORMAT
-                )
-                logger.info(f"✅ Converted PDF to {len(images)} images for OCR")
-
-                for idx, img in enumerate(images):
-                    logger.info(f"📸 Processing page {idx + 1}/{len(images)} with OCR...")
-                    logger.info(f"🔍 DEBUG: Image size: {img.size}, mode: {img.mode}")
+                dpi = first_pass_dpi()
+                with self.scheduler.ocr.slot(priority):
+                    sources = page_sources(pdf_bytes, reader, dpi, cached=self._ocr_cached)
+                logger.debug("✅ Prepared %d page images for OCR", len(sources))
 
-                    try:
-                        page_text = pytesseract.image_to_string(
-                            img,
-                            lang=Config.OCR_LANGUAGES,
-                            config=f"--psm {Config.TESSERACT_PSM} --oem {Config.TESSERACT_OEM}"
-                        )
-                        logger.info(f"✅ Page {idx + 1} OCR extracted {len(page_text)} characters")
-
-                        if page_text and page_text.strip():
-                            text += f"\n--- Page {idx + 1} (OCR) ---\n{page_text}"
-                            logger.info(f"🔍 DEBUG: Page {idx + 1} sample text: {page_text[:100]}...")
-                    except Exception as e:
-                        logger.exception(f"❌ OCR failed for page {idx + 1}: {e}")
-                        raise
+                text = self._ocr_text(sources, dpi, priority, strict, details, deadline,
+                                      base_text=text, on_page=on_page)
 
                 logger.info("✅ OCR extraction finished (total chars=%d)", len(text))
+            except (DeadlineExceededError, RequestCancelledError):
+                raise
             except Exception as e:
+                # A killed tesseract process surfaces as a generic error
+                deadline.check("ocr")
                 logger.exception("❌ OCR failed: %s", e)
-                logger.error(f"🔍 DEBUG: Exception type: {type(e).__name__}")
-                logger.error(f"🔍 DEBUG: Exception details: {str(e)}")
                 raise RuntimeError(f"OCR processing failed: {e}")
 
         if not text.strip():
             raise RuntimeError("No text could be extracted from the PDF (PyPDF2 and OCR both failed).")
 
-        return text.strip(), ocr_used
+        return text.strip(), ocr_used, details
+
+    @staticmethod
+    def _layout_page_text(page_text: str, fragments: List[Fragment], page_number: int,
+                          details: Dict[str, Any]) -> str:
+        """
+        Page text with the nutrition table rebuilt from the text layer's
+        positions, when the page has one: the table is stored in
+        ``details["nutrition_table"]`` and its cells leave the flattened text.
+        An incomplete table is appended as compact rows for the LLM; a
+        complete one is left out since its values are used as they are.
+        """
+        try:
+            table = find_nutrition_table(fragments, page_number)
+        except Exception as e:
+            logger.warning("⚠️ Page %d table layout failed: %s", page_number, e)
+            return page_text
+        if table is None:
+            return page_text
+        details["nutrition_table"] = table
+        page_text = text_without(fragments, table.fragment_ids)
+        if not table.complete:
+            page_text += "\n\n" + table.as_text()
+        return page_text
+
+    def _ocr_text(self, sources: List[PageSource], dpi: int, priority: str, strict: bool,
+                  details: Dict[str, Any], deadline: Deadline, base_text: str = "",
+                  on_page: Callable[[str, str], None] = None) -> str:
+        """
+        OCR ``sources`` (recording each page's info in ``details["pages"]``)
+        and return ``base_text`` with the page texts appended. ``on_page``
+        receives (text so far, page text) as each page is read.
+        """
+        page_texts: Dict[int, str] = {}
+
+        def report_progress(idx: int, page_text: str) -> None:
+            page_texts[idx] = page_text
+            on_page(self._join_ocr_pages(base_text, page_texts).strip(), page_text)
+
+        results = self._ocr_pages(sources, dpi, priority, triage=not strict, details=details,
+                                  deadline=deadline, have_text=bool(base_text.strip()),
+                                  on_page=report_progress if on_page is not None else None)
+        for idx, (page_text, page_info) in enumerate(results):
+            details["pages"].append(page_info)
+            if page_text and page_text.strip():
+                page_texts[idx] = page_text
+        return self._join_ocr_pages(base_text, page_texts)
+
+    @staticmethod
+    def _join_ocr_pages(text: str, page_texts: Dict[int, str]) -> str:
+        """Append OCR'd pages (index -> text) to the directly extracted text, in page order"""
+        for idx in sorted(page_texts):
+            if page_texts[idx].strip():
+                text += f"\n--- Page {idx + 1} (OCR) ---\n{page_texts[idx]}"
+        return text
+
+    def _ocr_pages(self, sources: List[PageSource], dpi: int, priority: str, triage: bool,
+                   details: Dict[str, Any], deadline: Deadline,
+                   have_text: bool = False,
+                   on_page: Callable[[int, str], None] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        OCR every page that needs it, in three passes.
+
+        1. Pages already OCR'd with the same settings come from the page cache.
+        2. Unless ``triage`` is off, the remaining pages are triaged on a
+           thumbnail and irrelevant ones are skipped (if triage would skip
+           every page, none are skipped).
+        3. The rest get full adaptive-resolution OCR, until the deadline only
+           leaves the LLM reserve; later pages are then skipped as long as
+           some text was already found.
 
-    def extract_data_from_text(self, text: str) -> Dict[str, Any]:
+        ``on_page(index, text)`` is called as soon as each page's text is known.
+        """
+        results: List[Tuple[str, Dict[str, Any]]] = [None] * len(sources)
+        keys = {}
+        pending = []
+        for idx, source in enumerate(sources):
+            key = self._ocr_cache_key(source)
+            cached = self.ocr_cache.get(key) if key else None
+            if cached is not None:
+                page_text, info = cached
+                logger.debug("♻️ Page %d served from OCR cache", idx + 1)
+                results[idx] = (page_text, {**info, "page": idx + 1, "cached": True})
+                if on_page is not None and page_text.strip():
+                    on_page(idx, page_text)
+            else:
+                keys[idx] = key
+                pending.append(idx)
+
+        decisions: Dict[int, Dict[str, Any]] = {}
+        use_triage = triage and Config.OCR_TRIAGE_ENABLED and len(sources) > 1
+        if use_triage:
+            for idx in pending:
+                deadline.check("ocr triage")
+                with self.scheduler.ocr.slot(priority), deadline.spend("ocr"):
+                    try:
+                        decisions[idx] = triage_page(sources[idx])
+                    except Exception as e:
+                        deadline.check("ocr triage")
+                        logger.warning("⚠️ Triage failed for page %d, keeping it: %s", idx + 1, e)
+            skipped = [idx for idx in pending if decisions.get(idx, {}).get("class") == IRRELEVANT]
+            if len(skipped) == len(pending):
+                logger.info("🗂️ Triage would skip every remaining page - OCR'ing all of them")
+                skipped = []
+        else:
+            skipped = []
+        details["triage"] = {"enabled": use_triage, "skipped_pages": [idx + 1 for idx in skipped]}
+
+        have_text = have_text or any(result and result[0].strip() for result in results)
+        for idx in pending:
+            source = sources[idx]
+            if idx in skipped:
+                logger.debug("⏭️ Skipping page %d/%d: %s", idx + 1, len(sources), decisions[idx]["reason"])
+                results[idx] = ("", {"page": idx + 1, "skipped": True, "triage": decisions[idx]})
+                continue
+
+            deadline.check("ocr")
+            if have_text and deadline.remaining() < Config.DEADLINE_LLM_RESERVE:
+                logger.warning("⏱️ Deadline: skipping page %d/%d to leave time for the LLM", idx + 1, len(sources))
+                deadline.degraded = True
+                details.setdefault("deadline_skipped_pages", []).append(idx + 1)
+                results[idx] = ("", {"page": idx + 1, "skipped": True, "reason": "deadline"})
+                continue
+
+            logger.debug("📸 Processing page %d/%d with OCR (%s)", idx + 1, len(sources), source.kind)
+            try:
+                with self.scheduler.ocr.slot(priority), deadline.spend("ocr"):
+                    page_text, info = ocr_page(source, dpi)
+            except Exception as e:
+                deadline.check("ocr")
+                logger.exception("❌ OCR failed for page %d: %s", idx + 1, e)
+                raise
+            logger.debug("✅ Page %d OCR extracted %d characters", idx + 1, len(page_text))
+            have_text = have_text or bool(page_text.strip())
+            if keys[idx] and not info.get("degraded"):
+                self.ocr_cache.put(keys[idx], page_text, info)
+            if idx in decisions:
+                info = {**info, "triage": decisions[idx]}
+            results[idx] = (page_text, info)
+            if on_page is not None and page_text.strip():
+                on_page(idx, page_text)
+
+        return results
+
+    def _ocr_cache_key(self, source: PageSource) -> Optional[str]:
+        """Page cache key (page content hash + OCR settings), None when caching is off"""
+        if self.ocr_cache is None:
+            return None
+        fingerprint = source.fingerprint()
+        return f"{fingerprint}-{settings_fingerprint(ocr_settings())}" if fingerprint else None
+
+    def _ocr_cached(self, source: PageSource) -> bool:
+        """Whether the page's OCR result is cached, so it needs no pixels"""
+        key = self._ocr_cache_key(source)
+        return key is not None and self.ocr_cache.has(key)
+
+    def extract_data_from_text(self, text: str,
+                               on_partial: Callable[[str, str, Any], None] = None,
+                               priority: str = INTERACTIVE,
+                               deadline: Deadline = None,
+                               cancel_event: threading.Event = None,
+                               nutrition: Dict[str, str] = None) -> Dict[str, Any]:
         """
         Use LLM to extract structured allergen and nutrition data from text.
 
         Args:
             text: Extracted text from PDF
+            on_partial: Optional callback receiving (section, key, value) for each
+                allergen / nutrition field as soon as the streamed response
+                contains it, and (None, None, None) when the fields received so
+                far are withdrawn (a failed, escalated or losing attempt)
+            priority: Scheduling class for the LLM stage
+            deadline: Request budget; LLM timeouts are capped to what is left
+            cancel_event: Optional event abandoning this extraction only (speculative runs)
+            nutrition: Nutrition values already read from a layout table; the
+                LLM is then only asked for allergens and these values are used
 
         Returns:
             Dictionary with allergens, nutritional_values, and metadata
-        """
-        logger.info("🤖 Starting LLM extraction...")
-        logger.info(f"🔍 DEBUG: Input text length: {len(text)} characters")
 
-        # Truncate text if too long
+        Raises:
+            DeadlineExceededError, RequestCancelledError: When the request runs
+                out of time or is cancelled
+            LLMCancelledError: When ``cancel_event`` is set
+        """
+        logger.debug("🤖 Starting LLM extraction (%d characters)", len(text))
+
+        if nutrition is not None and on_partial is not None:
+            table = {key: normalize_value(value) for key, value in nutrition.items()}
+            send = on_partial
+
+            def on_partial(section: str, key: str, value: Any) -> None:
+                send(section, key, value)
+                if section is None:
+                    # A reset withdraws the table's values too; they still stand
+                    for table_key, table_value in table.items():
+                        send("nutritional_values", table_key, table_value)
+
+            for key, value in table.items():
+                send("nutritional_values", key, value)
+        prompt = self._build_prompt(self._reduce_text(text), allergens_only=nutrition is not None)
+
+        with self.scheduler.llm.slot(priority):
+            data = self._extract_with_escalation(prompt, on_partial, deadline or Deadline(), cancel_event)
+        if nutrition is not None:
+            self._apply_nutrition(data, nutrition)
+        return data
+
+    def _reduce_text(self, text: str) -> str:
+        """Truncate text to Config.MAX_TEXT_CHARS, keeping the start and the end"""
         max_chars = Config.MAX_TEXT_CHARS
         if len(text) > max_chars:
             mid = max_chars // 2
             text = text[:mid] + "\n\n[... middle content truncated ...]\n\n" + text[-mid:]
-            logger.info(f"🔍 DEBUG: Text truncated to {len(text)} characters")
+            logger.debug("✂️ Text truncated to %d characters", len(text))
+        return text
+
+    def _build_prompt(self, text: str, allergens_only: bool = False) -> str:
+        """Build the single-document extraction prompt"""
+        if allergens_only:
+            return f"""
+You are a multilingual food label analyzer. Extract allergen data from this text.
+Return JSON like:
+{ALLERGEN_SCHEMA}
 
-        prompt = f"""
+Text:
+{text}"""
+        return f"""
 You are a multilingual food label analyzer. Extract allergen and nutritional data from this text.
 Return JSON like:
-{{
-  "allergens": {{
-    "gluten": true/false,
-    "egg": true/false,
-    "crustaceans": true/false,
-    "fish": true/false,
-    "peanut": true/false,
-    "soy": true/false,
-    "milk": true/false,
-    "tree_nuts": true/false,
-    "celery": true/false,
-    "mustard": true/false
-  }},
-  "nutritional_values": {{
-    "energy": "...",
-    "fat": "...",
-    "carbohydrate": "...",
-    "sugar": "...",
-    "protein": "...",
-    "sodium": "..."
-  }}
-}}
+{EXTRACTION_SCHEMA}
 
 Text:
 {text}"""
 
-        try:
-            logger.info("🔍 DEBUG: Calling LLM...")
-            raw = self.llm_client.call(prompt)
-            logger.info(f"✅ LLM returned response length: {len(raw)}")
-            logger.info(f"🔍 DEBUG: LLM response preview: {raw[:200]}...")
-        except Exception as e:
-            logger.exception("❌ LLM call failed: %s", e)
-            return self._empty_result(error="LLM extraction failed")
+    def _build_batch_prompt(self, documents: List[Tuple[str, str]]) -> str:
+        """
+        Build one extraction prompt covering several documents.
+
+        Args:
+            documents: List of (document_id, reduced_text)
+        """
+        sections = "\n\n".join(
+            f"=== Document {doc_id} ===\n{text}" for doc_id, text in documents
+        )
+        return f"""
+You are a multilingual food label analyzer. Extract allergen and nutritional data from each document below.
+Analyze every document independently. For each one return an object like:
+{EXTRACTION_SCHEMA}
+with an extra "id" field set to the document id.
+
+Return a single JSON object: {{"results": [ ...one object per document... ]}}
+
+{sections}"""
+
+    def _partial_forwarder(self, on_partial: Callable[[str, str, Any], None]):
+        """
+        Adapt (path, value) stream events to (section, key, value) field
+        callbacks; a RESET becomes (None, None, None)
+        """
+        if on_partial is None:
+            return None
+
+        def forward(path: tuple, value: Any) -> None:
+            if path == RESET:
+                on_partial(None, None, None)
+                return
+            if len(path) != 2 or path[0] not in ("allergens", "nutritional_values"):
+                return
+            if path[0] == "nutritional_values" and isinstance(value, str):
+                value = normalize_value(value)
+            on_partial(path[0], path[1], value)
+
+        return forward
+
+    def _extract_with_escalation(self, prompt: str,
+                                 on_partial: Callable[[str, str, Any], None],
+                                 deadline: Deadline,
+                                 cancel_event: threading.Event = None) -> Dict[str, Any]:
+        """
+        Run the prompt through the model tiers in Config.LLM_MODELS.
+
+        Cheaper tiers are tried first; the next tier is only used when the
+        response fails to parse or reports a confidence listed in
+        Config.LLM_ESCALATE_CONFIDENCE. Non-final tiers are not retried, so
+        a failing cheap model escalates instead of backing off. A tier is
+        only started with at least Config.DEADLINE_MIN_LLM_SECONDS left.
+        """
+        models = self.llm_client.models
+        forward = self._partial_forwarder(on_partial)
+        partials = PartialGate(forward, RESET, None) if forward is not None else None
+        data = self._empty_result(error="LLM extraction failed")
+        tier = 0
+
+        while tier < len(models):
+            model = models[tier]
+            alternate = models[tier + 1] if tier + 1 < len(models) else None
+            is_last = alternate is None
+            if partials is not None:
+                # Retract the fields of a tier that failed or escalated
+                partials.reset()
+
+            deadline.check("llm")
+            if cancel_event is not None and cancel_event.is_set():
+                raise LLMCancelledError("LLM extraction abandoned")
+            if deadline.remaining() < Config.DEADLINE_MIN_LLM_SECONDS:
+                raise DeadlineExceededError(
+                    f"Only {deadline.remaining():.1f}s left of the request deadline, not starting the LLM")
+
+            try:
+                logger.debug("🤖 Calling LLM (tier %d/%d, model=%s)", tier + 1, len(models), model)
+                with deadline.spend("llm"):
+                    raw, answered_by = self.llm_client.call_hedged(
+                        prompt, model=model, alternate=alternate,
+                        max_retries=None if is_last else 1,
+                        max_tokens=Config.LLM_EXTRACTION_MAX_TOKENS,
+                        timeout=deadline.cap(self.llm_client.latency.attempt_timeout(model)),
+                        cancel_event=AnyEvent(deadline, cancel_event),
+                        stream_json=True,
+                        on_partial=partials
+                    )
+                logger.debug("✅ LLM returned %d characters", len(raw))
+            except (LLMCancelledError, DeadlineExceededError, RequestCancelledError):
+                # Escalating would not help: the request itself is out of time or gone
+                deadline.check("llm")
+                raise
+            except UpstreamUnavailableError as e:
+                # Every tier shares the same upstream: fail fast instead of escalating
+                logger.error("❌ LLM upstream unavailable: %s", e)
+                data = self._empty_result(error=str(e))
+                data["metadata"]["llm_unavailable"] = True
+                data["metadata"]["retry_after_seconds"] = e.retry_after
+                return data
+            except Exception as e:
+                logger.exception("❌ LLM call failed: %s", e)
+                data = self._empty_result(error="LLM extraction failed")
+                tier += 1
+                continue
 
-        # Parse LLM response
-        return self._parse_llm_response(raw)
+            # Parse LLM response
+            data = self._parse_llm_response(raw)
+            data.setdefault("metadata", {})["llm_model"] = answered_by
+
+            confidence = data["metadata"].get("confidence")
+            if "error" not in data and confidence not in Config.LLM_ESCALATE_CONFIDENCE:
+                return data
+
+            logger.info("⬆️ Escalating LLM extraction (model=%s, confidence=%s, error=%s)",
+                        answered_by, confidence, data.get("error"))
+            tier = max(tier, models.index(answered_by)) + 1
+
+        return data
 
     def _parse_llm_response(self, raw: str) -> Dict[str, Any]:
         """Parse and validate LLM JSON response"""
@@ -190,34 +561,9 @@ Text:
             if start != -1 and end != -1:
                 clean = clean[start:end + 1]
 
-            data = json.loads(clean)
-
-            # Ensure required fields
-            if "allergens" not in data:
-                data["allergens"] = {}
-            if "nutritional_values" not in data:
-                data["nutritional_values"] = {}
-            if "metadata" not in data:
-                data["metadata"] = {"per_100g": True, "language_detected": "unknown", "confidence": "medium"}
-
-            # Normalize allergens
-            for allergen in ["gluten", "egg", "crustaceans", "fish", "peanut", "soy",
-                             "milk", "tree_nuts", "celery", "mustard"]:
-                if allergen not in data["allergens"]:
-                    data["allergens"][allergen] = False
-
-            # Normalize nutrition values
-            for nutrient in ["energy", "fat", "carbohydrate", "sugar", "protein", "sodium"]:
-                if nutrient not in data["nutritional_values"]:
-                    data["nutritional_values"][nutrient] = "Not available"
-                else:
-                    # Clean up nutrition values
-                    val = data["nutritional_values"][nutrient]
-                    if isinstance(val, str):
-                        val = self._normalize_nutrition_value(val)
-                        data["nutritional_values"][nutrient] = val
-
-            logger.info("✅ Parsed LLM JSON successfully")
+            data = self._normalize_extraction(json.loads(clean))
+
+            logger.debug("✅ Parsed LLM JSON successfully")
             return data
 
         except json.JSONDecodeError as e:
@@ -227,46 +573,45 @@ Text:
             logger.exception("❌ Unexpected error parsing LLM output: %s", e)
             return self._empty_result(error="Data extraction error", raw_response=raw[:1000])
 
-    def _normalize_nutrition_value(self, val: str) -> str:
-        """Normalize nutrition value strings"""
-        import re
-
-        val = val.strip()
-
-        # Remove "(as salt)" or similar parenthetical notes
-        val = re.sub(
-            r'\s*\((as\s+)?salt\)|\((comme\s+)?sel\)|\((als\s+)?Salz\)|\(sóként\)',
-            '', val, flags=re.IGNORECASE
-        )
-        val = val.strip()
-
-        # Check for "not available" phrases in multiple languages
-        val_lower = val.lower()
-        not_available_phrases = [
-            "not specified", "not available", "n/a", "na", "",
-            "non disponible", "non spécifié",
-            "nicht verfügbar", "nicht angegeben",
-            "nem elérhető", "nem megadva",
-            "unknown", "inconnu", "unbekannt", "ismeretlen",
-            "none", "null", "-", "--", "—"
-        ]
-
-        if (val_lower in not_available_phrases or
-                val in ["N/A", "NA"] or
-                val_lower.startswith(("not ", "non ", "nem ", "nicht ", "no ", "n/a"))):
-            return "Not available"
-
-        return val
+    def _normalize_extraction(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in missing fields and normalize one decoded extraction object"""
+        if not isinstance(data, dict):
+            raise ValueError("Extraction result is not a JSON object")
+
+        # Ensure required fields
+        if not isinstance(data.get("allergens"), dict):
+            data["allergens"] = {}
+        if not isinstance(data.get("nutritional_values"), dict):
+            data["nutritional_values"] = {}
+        if not isinstance(data.get("metadata"), dict):
+            data["metadata"] = {}
+        for key, default in (("per_100g", True), ("language_detected", "unknown"), ("confidence", "medium")):
+            data["metadata"].setdefault(key, default)
+
+        # Normalize allergens
+        for allergen in ALLERGEN_KEYS:
+            if allergen not in data["allergens"]:
+                data["allergens"][allergen] = False
+
+        # Normalize nutrition values; the numeric amounts are parsed from the raw strings
+        data["nutritional_amounts"] = normalize_nutrition(data["nutritional_values"],
+                                                          per_100g=data["metadata"]["per_100g"] is not False)
+
+        return data
+
+    @staticmethod
+    def _apply_nutrition(data: Dict[str, Any], nutrition: Dict[str, str]) -> None:
+        """Replace the extraction's nutrition with values read from a layout table (per 100 g)"""
+        data["nutritional_values"] = dict(nutrition)
+        data["nutritional_amounts"] = normalize_nutrition(data["nutritional_values"])
+        data.setdefault("metadata", {})["per_100g"] = True
 
     def _empty_result(self, error: str = "", raw_response: str = "") -> Dict[str, Any]:
         """Return empty result structure with error info"""
         result = {
-            "allergens": {k: False for k in ["gluten", "egg", "crustaceans", "fish",
-                                             "peanut", "soy", "milk", "tree_nuts",
-                                             "celery", "mustard"]},
-            "nutritional_values": {k: "Not available" for k in ["energy", "fat",
-                                                                "carbohydrate", "sugar",
-                                                                "protein", "sodium"]},
+            "allergens": {k: False for k in ALLERGEN_KEYS},
+            "nutritional_values": {k: NOT_AVAILABLE for k in NUTRIENT_KEYS},
+            "nutritional_amounts": {k: None for k in NUTRIENT_KEYS},
             "metadata": {"per_100g": True, "language_detected": "unknown", "confidence": "low"}
         }
         if error:
@@ -276,7 +621,13 @@ Text:
         return result
 
     def analyze(self, pdf_bytes: bytes, filename: str = "uploaded.pdf",
-                language: str = "en") -> Dict[str, Any]:
+                language: str = "en",
+                on_partial: Callable[[str, str, Any], None] = None,
+                batched: bool = False,
+                priority: str = INTERACTIVE,
+                strict: bool = False,
+                deadline: Deadline = None,
+                profile: str = None) -> Dict[str, Any]:
         """
         Main analysis method: extract text from PDF and parse with LLM.
 
@@ -284,45 +635,272 @@ Text:
             pdf_bytes: PDF file contents as bytes
             filename: Original filename
             language: User-selected language code
+            on_partial: Optional callback for streamed (section, key, value) fields;
+                fields are sent again if a speculative extraction is re-issued
+            batched: Share an LLM completion with other queued documents (bulk
+                ingestion; adds up to Config.LLM_BATCH_MAX_WAIT latency, no partials)
+            priority: Scheduling class (interactive, batch, background) for OCR and LLM work
+            strict: Disable OCR page triage so that every page is read (audits)
+            deadline: Time budget / cancellation token (default Config.REQUEST_DEADLINE_SECONDS)
+            profile: OCR profile name (fast, balanced, accurate; default Config.OCR_PROFILE)
 
         Returns:
             Dictionary with extracted data and metadata
         """
-        try:
-            if not pdf_bytes:
-                raise ValueError("Empty PDF bytes provided")
+        deadline = deadline or Deadline()
+
+        def run() -> Dict[str, Any]:
+            with bind_profile(get_profile(profile)):
+                return self._analyze(pdf_bytes, filename, language, on_partial, batched,
+                                     priority, strict, deadline)
+
+        return self._run_guarded(run, deadline, language, filename)
+
+    def analyze_images(self, images: List[bytes], filename: str = "photo.jpg",
+                       language: str = "en",
+                       on_partial: Callable[[str, str, Any], None] = None,
+                       priority: str = INTERACTIVE,
+                       strict: bool = False,
+                       deadline: Deadline = None,
+                       profile: str = None) -> Dict[str, Any]:
+        """
+        Analyze photos of a label (one image per page), OCR'ing them directly.
+
+        Each photo is EXIF-rotated on decode and read through the same
+        adaptive OCR stage as scanned PDF pages (page cache, triage,
+        DPI ladder / ROI re-reads, deadline), starting from a downscaled copy
+        instead of a 300 DPI rasterization.
+
+        Args:
+            images: Encoded JPEG / PNG / WebP / HEIC photos, in page order
+            (other arguments as for ``analyze``)
+
+        Returns:
+            Dictionary with extracted data and metadata
+        """
+        deadline = deadline or Deadline()
 
-            logger.info("🔍 Analyze PDF bytes for file=%s language=%s size=%d bytes",
-                        filename, language, len(pdf_bytes))
+        def run() -> Dict[str, Any]:
+            with bind_profile(get_profile(profile)):
+                return self._analyze_images(images, filename, language, on_partial, priority, strict, deadline)
 
-            # Extract text
-            logger.info("🔍 DEBUG: Starting text extraction...")
-            text, ocr_used = self.extract_text_from_pdf(pdf_bytes)
-            logger.info(f"✅ Text extraction complete. OCR used: {ocr_used}, Text length: {len(text)}")
+        return self._run_guarded(run, deadline, language, filename)
 
-            # LLM extraction
-            logger.info("🔍 DEBUG: Starting LLM extraction...")
-            extracted = self.extract_data_from_text(text)
-            logger.info("✅ LLM extraction complete")
+    def _analyze_images(self, images: List[bytes], filename: str, language: str,
+                        on_partial: Callable[[str, str, Any], None],
+                        priority: str, strict: bool, deadline: Deadline) -> Dict[str, Any]:
+        from photo_images import PhotoSource
 
-            # Attach metadata
+        if not images:
+            raise ValueError("No images provided")
+        logger.info("🔍 Analyze %d photo(s) for file=%s language=%s size=%d bytes",
+                    len(images), filename, language, sum(len(image) for image in images))
+
+        with self.scheduler.ocr.slot(priority), deadline.spend("ocr"):
+            sources = [PhotoSource(image, n) for n, image in enumerate(images, 1)]
+
+        def read_text(on_page: Callable[[str, str], None]) -> Tuple[str, bool, Dict[str, Any]]:
+            details: Dict[str, Any] = {"pages": []}
+            text = self._ocr_text(sources, first_pass_dpi(), priority, strict, details, deadline,
+                                  on_page=on_page).strip()
+            if not text:
+                raise RuntimeError("No text could be read from the images.")
+            return text, True, details
+
+        return self._extract(read_text, filename, language, on_partial, False, priority, strict, deadline,
+                             metadata={"text_source": "photo", "page_count": len(images)})
+
+    def check_text(self, pages: List[str]) -> Optional[str]:
+        """
+        Why client-extracted page text is not enough to analyze without the
+        PDF (None when it is): "too_short" under Config.MIN_TEXT_LENGTH, the
+        same threshold that sends uploaded PDFs to OCR, or "no_label_keywords"
+        when no nutrition / allergen / ingredient keyword appears (the label
+        is probably an image) and Config.TEXT_ANALYSIS_REQUIRE_KEYWORDS is set.
+        """
+        text = "".join(pages).strip()
+        if len(text) < Config.MIN_TEXT_LENGTH:
+            return "too_short"
+        if Config.TEXT_ANALYSIS_REQUIRE_KEYWORDS and not keyword_hits(text):
+            return "no_label_keywords"
+        return None
+
+    def analyze_text(self, pages: List[str], filename: str = "document.pdf",
+                     language: str = "en",
+                     on_partial: Callable[[str, str, Any], None] = None,
+                     batched: bool = False,
+                     priority: str = INTERACTIVE,
+                     deadline: Deadline = None,
+                     page_hashes: List[str] = None) -> Dict[str, Any]:
+        """
+        Analyze text the client already extracted from a digital PDF, one
+        string per page, skipping PDF parsing and OCR. Callers should check
+        ``check_text`` first and ask for the PDF when it reports a problem.
+
+        Args:
+            pages: Text of each page, in page order
+            page_hashes: Optional client-side hashes of the pages, echoed in
+                the metadata
+            (other arguments as for ``analyze``)
+
+        Returns:
+            Dictionary with extracted data and metadata
+        """
+        deadline = deadline or Deadline()
+
+        def run() -> Dict[str, Any]:
+            text = "".join(f"\n--- Page {i + 1} ---\n{page}" for i, page in enumerate(pages)
+                           if page.strip()).strip()
+            if not text:
+                raise ValueError("No page text provided")
+            logger.info("🔍 Analyze client text for file=%s language=%s pages=%d chars=%d",
+                        filename, language, len(pages), len(text))
+            extracted = self._extract_llm_stage(text, on_partial, batched, priority, deadline)
             extracted.setdefault("metadata", {})
             extracted["metadata"].update({
-                "ocr_used": ocr_used,
+                "ocr_used": False,
+                "text_source": "client",
+                "page_count": len(pages),
+                "priority": priority,
                 "language_selected": language,
                 "file_name": filename,
-                "extracted_text_length": len(text)
+                "extracted_text_length": len(text),
+                "deadline": {"budget_seconds": deadline.budget,
+                             "remaining_seconds": round(deadline.remaining(), 2),
+                             "degraded": deadline.degraded}
             })
-
+            if page_hashes:
+                extracted["metadata"]["page_hashes"] = page_hashes
             logger.info("✅ Analysis complete for %s", filename)
             return extracted
 
+        return self._run_guarded(run, deadline, language, filename)
+
+    def _run_guarded(self, run: Callable[[], Dict[str, Any]], deadline: Deadline,
+                     language: str, filename: str) -> Dict[str, Any]:
+        """Run one analysis under ``deadline``, turning failures into error results"""
+        outcome = "completed"
+        try:
+            with bind_deadline(deadline):
+                return run()
+        except DeadlineExceededError as e:
+            outcome = "expired"
+            logger.warning("⏱️ analyze gave up for %s: %s", filename, e)
+            return self._failed_result(str(e), language, filename, deadline_exceeded=True)
+        except RequestCancelledError as e:
+            outcome = "cancelled"
+            logger.info("🛑 analyze cancelled for %s: %s", filename, e)
+            return self._failed_result(str(e), language, filename, cancelled=True)
         except Exception as e:
+            if deadline.is_set():
+                outcome = "cancelled" if deadline.cancelled else "expired"
             logger.exception("❌ analyze failed: %s", e)
-            result = self._empty_result(error=str(e))
-            result["metadata"].update({
-                "ocr_used": False,
-                "language_selected": language,
-                "file_name": filename
-            })
-            return result
\ No newline at end of file
+            return self._failed_result(str(e), language, filename)
+        finally:
+            self.deadline_stats.finish(deadline, outcome)
+
+    def _analyze(self, pdf_bytes: bytes, filename: str, language: str,
+                 on_partial: Callable[[str, str, Any], None], batched: bool,
+                 priority: str, strict: bool, deadline: Deadline) -> Dict[str, Any]:
+        if not pdf_bytes:
+            raise ValueError("Empty PDF bytes provided")
+
+        logger.info("🔍 Analyze PDF bytes for file=%s language=%s size=%d bytes",
+                    filename, language, len(pdf_bytes))
+
+        def read_text(on_page: Callable[[str, str], None]) -> Tuple[str, bool, Dict[str, Any]]:
+            return self.extract_text_with_details(pdf_bytes, priority=priority, strict=strict,
+                                                  deadline=deadline, on_page=on_page)
+
+        return self._extract(read_text, filename, language, on_partial, batched, priority, strict, deadline)
+
+    def _extract(self, read_text: Callable[[Optional[Callable[[str, str], None]]], Tuple[str, bool, Dict[str, Any]]],
+                 filename: str, language: str, on_partial: Callable[[str, str, Any], None], batched: bool,
+                 priority: str, strict: bool, deadline: Deadline,
+                 metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Text extraction, then the LLM stage, for PDFs and photos alike.
+
+        ``read_text(on_page)`` returns (text, ocr_used, details) and calls
+        ``on_page`` with (text so far, page text) as OCR'd pages arrive, so
+        that the LLM may already start on the first label pages of a scan.
+        ``metadata`` is added to the result's metadata.
+        """
+        pipeline = None
+        if Config.OCR_LLM_PIPELINE_ENABLED and not (batched and Config.LLM_BATCH_ENABLED):
+            pipeline = SpeculativeExtraction(
+                lambda text, **kwargs: self.extract_data_from_text(text, priority=priority, deadline=deadline,
+                                                                   **kwargs),
+                on_partial=on_partial
+            )
+        try:
+            text, ocr_used, ocr_details = read_text(pipeline.offer if pipeline else None)
+        except BaseException:
+            if pipeline:
+                pipeline.cancel()
+            raise
+        logger.info("✅ Text extraction complete (ocr_used=%s, %d characters)", ocr_used, len(text))
+
+        # LLM extraction; a complete layout table of a digital PDF already gives the nutrition
+        table: Optional[NutritionTable] = ocr_details.pop("nutrition_table", None)
+        nutrition = table.values if table is not None and table.complete else None
+        if pipeline and ocr_used:
+            extracted = pipeline.resolve(text)
+            logger.debug("✅ LLM extraction complete")
+        else:
+            extracted = self._extract_llm_stage(text, on_partial, batched, priority, deadline,
+                                                nutrition=nutrition)
+
+        # Attach metadata
+        extracted.setdefault("metadata", {})
+        extracted["metadata"].update({
+            "ocr_used": ocr_used,
+            "priority": priority,
+            "strict": strict,
+            "ocr_profile": current_profile().name,
+            "language_selected": language,
+            "file_name": filename,
+            "extracted_text_length": len(text),
+            "nutrition_source": "layout_table" if nutrition else "llm",
+            "deadline": {"budget_seconds": deadline.budget,
+                         "remaining_seconds": round(deadline.remaining(), 2),
+                         "degraded": deadline.degraded},
+            **(metadata or {})
+        })
+        if table is not None:
+            extracted["metadata"]["nutrition_table"] = table.summary()
+        if ocr_used:
+            extracted["metadata"]["ocr"] = ocr_details
+
+        logger.info("✅ Analysis complete for %s", filename)
+        return extracted
+
+    def _extract_llm_stage(self, text: str, on_partial: Callable[[str, str, Any], None],
+                           batched: bool, priority: str, deadline: Deadline,
+                           nutrition: Dict[str, str] = None) -> Dict[str, Any]:
+        """
+        LLM extraction of a finished text, through the batcher for batched
+        requests. ``nutrition`` (from a layout table) replaces the LLM's
+        nutrition; batched prompts still ask for it, since they are shared.
+        """
+        if batched and Config.LLM_BATCH_ENABLED:
+            deadline.check("llm")
+            with deadline.spend("llm"):
+                extracted = self.batcher.extract(text, deadline=deadline)
+            if nutrition is not None:
+                self._apply_nutrition(extracted, nutrition)
+        else:
+            extracted = self.extract_data_from_text(text, on_partial=on_partial, priority=priority,
+                                                    deadline=deadline, nutrition=nutrition)
+        logger.debug("✅ LLM extraction complete")
+        return extracted
+
+    def _failed_result(self, error: str, language: str, filename: str, **flags) -> Dict[str, Any]:
+        result = self._empty_result(error=error)
+        result["metadata"].update({
+            "ocr_used": False,
+            "language_selected": language,
+            "file_name": filename,
+            **flags
+        })
+        return result
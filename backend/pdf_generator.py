@@ -1,6 +1,5 @@
 # pdf_generator.py - PDF Report Generation
 import io
-import re
 import logging
 from typing import Dict, Any
 from reportlab.lib.pagesizes import A4
@@ -9,6 +8,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib import colors
 
+from nutrition import NUTRIENT_KEYS, normalize_value
+
 logger = logging.getLogger(__name__)
 
 
@@ -122,7 +123,7 @@ class PDFGenerator:
             BytesIO: PDF file bytes
         """
         lang = payload.get("language", "en")
-        logger.info(f"Generating PDF with language: {lang}")
+        logger.info("Generating PDF with language: %s", lang)
 
         tr = self.TRANSLATIONS.get(lang, self.TRANSLATIONS["en"])
         allergens = payload.get("allergens") or payload.get("data", {}).get("allergens", {})
@@ -194,12 +195,12 @@ class PDFGenerator:
         """Build nutrition table"""
         data = [[tr["col_nutrient"], tr["col_value"]]]
 
-        for key in ["energy", "fat", "carbohydrate", "sugar", "protein", "sodium"]:
+        for key in NUTRIENT_KEYS:
             value = nutritional.get(key, tr["not_available"])
 
             # Normalize value
             if isinstance(value, str):
-                value = self._normalize_value(value.strip(), tr)
+                value = normalize_value(value, tr["not_available"])
 
             label = self.NUTRIENT_LABELS.get(lang, self.NUTRIENT_LABELS["en"]).get(key, key.title())
             data.append([label, value])
@@ -213,30 +214,3 @@ class PDFGenerator:
         ]))
 
         return table
-
-    @staticmethod
-    def _normalize_value(value: str, tr: Dict) -> str:
-        """Normalize nutritional value"""
-        # Remove parenthetical notes
-        value = re.sub(
-            r'\s*\((as\s+)?salt\)|\((comme\s+)?sel\)|\((als\s+)?Salz\)|\(sóként\)',
-            '', value, flags=re.IGNORECASE
-        ).strip()
-
-        # Check for "not available" phrases
-        value_lower = value.lower()
-        not_available_phrases = [
-            "not available", "not specified", "n/a", "na", "",
-            "non disponible", "non spécifié",
-            "nicht verfügbar", "nicht angegeben",
-            "nem elérhető", "nem megadva",
-            "unknown", "inconnu", "unbekannt", "ismeretlen",
-            "none", "null", "-", "--", "—"
-        ]
-
-        if (value_lower in not_available_phrases or
-                value in ["N/A", "NA"] or
-                value_lower.startswith(("not ", "non ", "nem ", "nicht ", "no ", "n/a"))):
-            return tr["not_available"]
-
-        return value
\ No newline at end of file
@@ -0,0 +1,165 @@
+# pdf_images.py - Pull the scan out of image-only PDF pages instead of re-rendering them
+import io
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+from PyPDF2.generic import ContentStream
+
+logger = logging.getLogger("be_aware_backend")
+
+# Content stream operators a plain "draw one image" page may use; text state
+# operators are allowed (some producers emit empty BT/ET blocks), glyph-showing ones are not
+_IMAGE_PAGE_OPERATORS = {b"q", b"Q", b"cm", b"Do", b"gs", b"w", b"J", b"j", b"M", b"d", b"ri", b"i",
+                         b"BT", b"ET", b"Tf", b"TL", b"Tc", b"Tw", b"Tz", b"Ts", b"Tr", b"Td", b"TD",
+                         b"Tm", b"T*"}
+_RAW_MODES = {"/DeviceGray": "L", "/DeviceRGB": "RGB", "/DeviceCMYK": "CMYK"}
+_ICC_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+_MAX_CONTENT_BYTES = 4096
+_MIN_PAGE_COVERAGE = 0.85
+
+
+def _filters(xobj) -> list:
+    filters = xobj.get("/Filter")
+    if filters is None:
+        return []
+    filters = filters.get_object()
+    return list(filters) if isinstance(filters, list) else [filters]
+
+
+def _raw_mode(xobj) -> Optional[str]:
+    """PIL mode for an unencoded (Flate/LZW) image, None if unsupported"""
+    bits = xobj.get("/BitsPerComponent", 8)
+    if bits == 1:
+        return "1"
+    if bits != 8:
+        return None
+    color_space = xobj.get("/ColorSpace")
+    color_space = color_space.get_object() if color_space is not None else "/DeviceGray"
+    if isinstance(color_space, list):
+        if color_space[0] == "/ICCBased":
+            return _ICC_MODES.get(int(color_space[1].get_object().get("/N", 0)))
+        return None  # Indexed, Separation, ...: let poppler handle it
+    return _RAW_MODES.get(color_space)
+
+
+def _concat(m: list, n: list) -> list:
+    """PDF matrix product m x n (m applied first)"""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return [a * a2 + b * c2, a * b2 + b * d2, c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2]
+
+
+class EmbeddedPageImage:
+    """The single image an image-only page draws, decodable at or below its native DPI"""
+
+    def __init__(self, xobj, native_dpi: float, rotate: int):
+        self.xobj = xobj
+        self.native_dpi = native_dpi
+        self.rotate = rotate
+        self.size = (int(xobj["/Width"]), int(xobj["/Height"]))
+        self.filter = (_filters(xobj) or [None])[-1]
+
+    def render(self, dpi: int) -> Tuple[Image.Image, float]:
+        """
+        Decode the image, downscaled to ``dpi`` if that is below its native resolution.
+
+        JPEGs are decoded with DCT scaling (``Image.draft``), so a low-DPI pass
+        never decodes the full-resolution pixels.
+
+        Returns:
+            Tuple of (image, effective dpi)
+        """
+        width, height = self.size
+        scale = min(1.0, dpi / self.native_dpi)
+        target = (max(1, int(width * scale)), max(1, int(height * scale)))
+        data = self.xobj.get_data()
+
+        if self.filter in ("/DCTDecode", "/JPXDecode", "/CCITTFaxDecode"):
+            # PyPDF2 hands back the JPEG/JPEG 2000 bytes as-is and wraps CCITT data in a TIFF header
+            img = Image.open(io.BytesIO(data))
+            if self.filter == "/DCTDecode" and scale < 1.0:
+                img.draft("L", target)
+        else:
+            img = Image.frombytes(_raw_mode(self.xobj), self.size, data)
+        img.load()
+
+        if img.mode == "1":
+            img = img.convert("L")
+            if sum(img.resize((64, 64)).getdata()) < 128 * 64 * 64:
+                # Mostly black: /Decode or BlackIs1 polarity was inverted
+                img = ImageOps.invert(img)
+        elif img.mode not in ("L", "RGB"):
+            img = img.convert("RGB")
+
+        if img.size[0] > target[0] * 1.05:
+            img = img.resize(target, Image.BILINEAR)
+        effective_dpi = self.native_dpi * img.size[0] / width
+
+        if self.rotate:
+            img = img.rotate(-self.rotate, expand=True)
+        return img, effective_dpi
+
+
+def find_page_image(page) -> Optional[EmbeddedPageImage]:
+    """
+    Return the embedded scan of an image-only page, or None for composite pages.
+
+    A page qualifies when its content stream only places one unrotated image
+    XObject covering most of the page, and the image uses an encoding we can
+    decode directly (JPEG, JPEG 2000, CCITT fax, or raw gray/RGB/CMYK/bilevel).
+    """
+    try:
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else {}
+        xobjects = resources.get("/XObject")
+        xobjects = xobjects.get_object() if xobjects is not None else {}
+        if len(xobjects) != 1:
+            return None
+        name, xobj = next(iter(xobjects.items()))
+        xobj = xobj.get_object()
+        if xobj.get("/Subtype") != "/Image" or xobj.get("/ImageMask"):
+            return None
+
+        contents = page.get_contents()
+        if contents is None:
+            return None
+        stream = ContentStream(contents, page.pdf)
+        if len(stream.get_data()) > _MAX_CONTENT_BYTES:
+            return None
+
+        ctm, stack, matrix = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0], [], None
+        for operands, operator in stream.operations:
+            if operator not in _IMAGE_PAGE_OPERATORS:
+                return None
+            if operator == b"q":
+                stack.append(ctm)
+            elif operator == b"Q" and stack:
+                ctm = stack.pop()
+            elif operator == b"cm":
+                ctm = _concat([float(v) for v in operands], ctm)
+            elif operator == b"Do":
+                if operands[0] != name or matrix is not None:
+                    return None
+                matrix = ctm
+        if matrix is None:
+            return None
+
+        a, b, c, d, _, _ = matrix
+        if b or c or a <= 0 or d <= 0:
+            return None  # rotated or mirrored placement
+        box = page.mediabox
+        if a * d < _MIN_PAGE_COVERAGE * float(box.width) * float(box.height):
+            return None
+
+        encoded = (_filters(xobj) or [None])[-1] in ("/DCTDecode", "/JPXDecode", "/CCITTFaxDecode")
+        if not encoded and _raw_mode(xobj) is None:
+            return None
+
+        native_dpi = int(xobj["/Width"]) / (a / 72.0)
+        return EmbeddedPageImage(xobj, native_dpi, int(page.get("/Rotate", 0)) % 360)
+    except Exception as e:
+        # Odd structure: just render the page
+        logger.debug("Embedded image probe failed: %s", e)
+        return None
@@ -0,0 +1,111 @@
+# photo_images.py - Phone photos of labels as OCR page sources (no PDF round trip)
+import io
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from config import Config
+from ocr_pipeline import PageSource
+
+logger = logging.getLogger("be_aware_backend")
+
+IMAGE_EXTENSIONS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP",
+                    ".heic": "HEIF", ".heif": "HEIF"}
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIC_SUPPORTED = True
+except ImportError:  # optional: pip install pillow-heif
+    HEIC_SUPPORTED = False
+
+
+class UnsupportedImageError(ValueError):
+    """The upload is not an image we can decode"""
+
+
+def is_image_filename(filename: str) -> bool:
+    return any(filename.lower().endswith(ext) for ext in IMAGE_EXTENSIONS)
+
+
+def probe(data: bytes, filename: str = "") -> str:
+    """
+    Check that ``data`` is a decodable photo without decoding its pixels.
+
+    Returns:
+        The PIL format name
+
+    Raises:
+        UnsupportedImageError: Unknown or corrupt image, or HEIC without pillow-heif
+    """
+    if filename.lower().endswith((".heic", ".heif")) and not HEIC_SUPPORTED:
+        raise UnsupportedImageError("HEIC images need the pillow-heif package on the server.")
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            fmt = img.format
+    except Exception as e:
+        raise UnsupportedImageError(f"Not a readable image: {e}")
+    if fmt not in set(IMAGE_EXTENSIONS.values()):
+        raise UnsupportedImageError(f"Unsupported image format {fmt}.")
+    return fmt
+
+
+class PhotoImage:
+    """
+    A label photo, upright (EXIF orientation applied) and decodable at any DPI up to its native one.
+
+    Photos have no physical resolution, so the label's long edge is assumed
+    to be Config.IMAGE_LABEL_LONG_EDGE_INCHES: a 4032 px photo then counts
+    as ~500 DPI, and the OCR profile's DPI ladder, ROI re-reads and triage
+    thumbnails work the same as for scanned PDF pages. JPEGs wider than
+    Config.IMAGE_MAX_LONG_EDGE are DCT-downscaled while decoding.
+    """
+
+    def __init__(self, data: bytes):
+        img = Image.open(io.BytesIO(data))
+        if img.format == "JPEG" and max(img.size) > Config.IMAGE_MAX_LONG_EDGE:
+            scale = Config.IMAGE_MAX_LONG_EDGE / max(img.size)
+            img.draft("RGB", (int(img.size[0] * scale), int(img.size[1] * scale)))
+        img = ImageOps.exif_transpose(img)  # before anything else looks at the pixels
+        if max(img.size) > Config.IMAGE_MAX_LONG_EDGE:
+            img.thumbnail((Config.IMAGE_MAX_LONG_EDGE, Config.IMAGE_MAX_LONG_EDGE), Image.BILINEAR)
+        if img.mode in ("RGBA", "LA", "PA", "La", "RGBa") or "transparency" in img.info:
+            # Transparent pixels usually hold black: put the label on white paper first
+            gray = img.mode in ("LA", "La")
+            img = Image.alpha_composite(Image.new("RGBA", img.size, "white"), img.convert("RGBA"))
+            img = img.convert("L" if gray else "RGB")
+        self.image = img.convert("L") if img.mode not in ("L", "RGB") else img
+        self.image.load()
+        self.native_dpi = max(self.image.size) / Config.IMAGE_LABEL_LONG_EDGE_INCHES
+
+    def render(self, dpi: int) -> Tuple[Image.Image, float]:
+        """
+        Returns:
+            Tuple of (image at ``dpi`` or the native DPI if lower, effective dpi)
+        """
+        scale = dpi / self.native_dpi
+        if scale >= 0.95:
+            return self.image.copy(), self.native_dpi
+        width, height = self.image.size
+        target = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return self.image.resize(target, Image.BILINEAR), self.native_dpi * target[0] / width
+
+
+class PhotoSource(PageSource):
+    """One uploaded photo as a page of the OCR stage"""
+
+    def __init__(self, data: bytes, page_number: int):
+        super().__init__(None, page_number, embedded=PhotoImage(data))
+        self._fingerprint = hashlib.sha256(data).hexdigest()
+
+    def fingerprint(self) -> Optional[str]:
+        return self._fingerprint
+
+    @property
+    def kind(self) -> str:
+        return "photo"
+
+    def render(self, dpi: int):
+        return self.embedded.render(dpi)
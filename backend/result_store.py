@@ -0,0 +1,255 @@
+# result_store.py - Persistent, indexed store of analysis results (SQLite)
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from nutrition import NUTRIENT_KEYS, parse_value
+from pdf_analyzer import ALLERGEN_KEYS
+
+logger = logging.getLogger("be_aware_backend")
+
+# Bit i of the allergen mask is ALLERGEN_KEYS[i]; never reorder, only append
+ALLERGEN_BITS = {key: 1 << i for i, key in enumerate(ALLERGEN_KEYS)}
+ALL_MASKS = 1 << len(ALLERGEN_KEYS)
+
+# Nutrient -> numeric column (energy in kcal, everything else in grams)
+NUTRIENT_COLUMNS = {key: f"{key}_kcal" if key == "energy" else f"{key}_g" for key in NUTRIENT_KEYS}
+
+# A filter matching fewer rows than this drives the query through its index
+# (then sorts the matches by id); otherwise rows are read newest first and
+# the filters checked per row, which stops as soon as a page is full
+_INDEX_DRIVE_MAX_ROWS = 5000
+
+_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        language TEXT NOT NULL,
+        profile TEXT NOT NULL,
+        filename TEXT,
+        analyzed_at REAL NOT NULL,
+        allergens INTEGER NOT NULL,
+        {", ".join(f"{column} REAL" for column in NUTRIENT_COLUMNS.values())},
+        UNIQUE (sha256, language, profile)
+    )""",
+    # Full results live apart so scans of the filter columns stay compact
+    "CREATE TABLE IF NOT EXISTS result_data (id INTEGER PRIMARY KEY, data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_results_allergens ON results (allergens, id)",
+    *(f"CREATE INDEX IF NOT EXISTS idx_results_{column} ON results ({column})"
+      for column in NUTRIENT_COLUMNS.values()),
+]
+
+
+def allergen_mask(allergens: Dict[str, Any]) -> int:
+    """Bitmask of the allergens flagged true"""
+    return sum(bit for key, bit in ALLERGEN_BITS.items() if allergens.get(key) is True)
+
+
+def allergen_names(mask: int) -> List[str]:
+    return [key for key, bit in ALLERGEN_BITS.items() if mask & bit]
+
+
+def nutrient_amounts(result: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """
+    Column values for a result: from its "nutritional_amounts" when present
+    (parsed before salt notes were stripped), else parsed from the display strings
+    """
+    parsed = result.get("nutritional_amounts") or {}
+    values = result.get("nutritional_values") or {}
+    columns = {}
+    for key, column in NUTRIENT_COLUMNS.items():
+        amount = parsed.get(key)
+        if amount is None:
+            parsed_value = parse_value(key, values.get(key))
+            amount = parsed_value.to_dict() if parsed_value else {}
+        columns[column] = amount.get("kcal" if key == "energy" else "g")
+    return columns
+
+
+class ResultStore:
+    """
+    Successful analyses, one row per (PDF content hash, language, OCR profile).
+
+    Each row keeps the full result as JSON plus the columns queries filter
+    on: a 10-bit allergen mask and one numeric column per nutrient, all
+    indexed. The database runs in WAL mode so every worker process can read
+    while another one writes; each thread gets its own connection.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.RESULT_STORE_PATH
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.stats = {"stored": 0, "queries": 0, "query_ms_total": 0.0}
+        with self._write_lock:
+            conn = self._conn()
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, result: Dict[str, Any], sha256: str, language: str, profile: str,
+            filename: str = None) -> int:
+        """Store (or replace) one analysis result and return its id"""
+        row = {
+            "sha256": sha256,
+            "language": language,
+            "profile": profile,
+            "filename": filename,
+            "analyzed_at": time.time(),
+            "allergens": allergen_mask(result.get("allergens") or {}),
+            **nutrient_amounts(result),
+        }
+        columns = ", ".join(row)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in row
+                            if column not in ("sha256", "language", "profile"))
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT INTO results ({columns}) VALUES ({', '.join(':' + c for c in row)}) "
+                f"ON CONFLICT (sha256, language, profile) DO UPDATE SET {updates}", row
+            )
+            result_id = conn.execute(
+                "SELECT id FROM results WHERE sha256 = ? AND language = ? AND profile = ?",
+                (sha256, language, profile)
+            ).fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO result_data (id, data) VALUES (?, ?)",
+                         (result_id, json.dumps(result, ensure_ascii=False)))
+            conn.commit()
+            self.stats["stored"] += 1
+        return result_id
+
+    def get(self, result_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT * FROM results JOIN result_data USING (id) WHERE id = ?", (result_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {**self._summary(row), "data": json.loads(row["data"])}
+
+    def query(self, contains: Iterable[str] = (), free_of: Iterable[str] = (),
+              ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = None,
+              limit: int = 50, cursor: int = None) -> Dict[str, Any]:
+        """
+        Results containing every allergen in ``contains`` and none in
+        ``free_of``, with each nutrient in ``ranges`` inside [min, max]
+        (either bound may be None), newest first. Pass the returned
+        ``next_cursor`` back as ``cursor`` for the next page.
+
+        The allergen filter becomes ``allergens IN (<every mask that
+        matches>)`` (at most 1024 values). Each filter is first counted on its
+        covering index (bounded); the most selective one under
+        _INDEX_DRIVE_MAX_ROWS drives the query, otherwise rows are read
+        newest first. SQLite's own planner ignores the LIMIT and would sort
+        every row in a wide nutrient range.
+
+        Raises:
+            ValueError: On an unknown allergen or nutrient
+        """
+        include = self._mask(contains)
+        exclude = self._mask(free_of)
+        # (index, column, condition on the column, params)
+        filters: List[Tuple[str, str, str, List[Any]]] = []
+
+        if include or exclude:
+            masks = [m for m in range(ALL_MASKS) if m & include == include and not m & exclude]
+            if not masks:
+                return {"items": [], "next_cursor": None, "query_ms": 0.0}
+            filters.append(("idx_results_allergens", "allergens", f"IN ({','.join(map(str, masks))})", []))
+
+        for nutrient, (low, high) in (ranges or {}).items():
+            if nutrient not in NUTRIENT_COLUMNS:
+                raise ValueError(f"Unknown nutrient {nutrient!r}. Use one of: {', '.join(NUTRIENT_COLUMNS)}.")
+            column = NUTRIENT_COLUMNS[nutrient]
+            if low is not None and high is not None:
+                filters.append((f"idx_results_{column}", column, "BETWEEN ? AND ?", [low, high]))
+            elif low is not None:
+                filters.append((f"idx_results_{column}", column, ">= ?", [low]))
+            elif high is not None:
+                filters.append((f"idx_results_{column}", column, "<= ?", [high]))
+
+        started = time.perf_counter()
+        conn = self._conn()
+        driver = None
+        fewest = _INDEX_DRIVE_MAX_ROWS
+        for index, column, condition, params in filters:
+            matches = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM results INDEXED BY {index} "
+                f"WHERE {column} {condition} LIMIT {_INDEX_DRIVE_MAX_ROWS})", params
+            ).fetchone()[0]
+            if matches < fewest:
+                driver, fewest = index, matches
+
+        conditions: List[str] = []
+        params: List[Any] = []
+        for index, column, condition, filter_params in filters:
+            # "+column" keeps SQLite from using any index but the driver's
+            conditions.append(f"{column if index == driver else '+' + column} {condition}")
+            params.extend(filter_params)
+        if cursor is not None:
+            conditions.append("id < ?")
+            params.append(cursor)
+
+        sql = ("SELECT id, sha256, language, profile, filename, analyzed_at, allergens, "
+               f"{', '.join(NUTRIENT_COLUMNS.values())} FROM results")
+        if driver:
+            sql += f" INDEXED BY {driver}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = conn.execute(sql, params).fetchall()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["queries"] += 1
+        self.stats["query_ms_total"] += elapsed_ms
+
+        items = [self._summary(row) for row in rows[:limit]]
+        return {
+            "items": items,
+            "next_cursor": items[-1]["id"] if len(rows) > limit else None,
+            "query_ms": round(elapsed_ms, 2),
+        }
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def snapshot(self) -> dict:
+        queries = self.stats["queries"]
+        return {"path": self.path, "stored": self.stats["stored"], "queries": queries,
+                "mean_query_ms": round(self.stats["query_ms_total"] / queries, 2) if queries else None}
+
+    @staticmethod
+    def _mask(allergens: Iterable[str]) -> int:
+        mask = 0
+        for allergen in allergens:
+            if allergen not in ALLERGEN_BITS:
+                raise ValueError(f"Unknown allergen {allergen!r}. Use one of: {', '.join(ALLERGEN_BITS)}.")
+            mask |= ALLERGEN_BITS[allergen]
+        return mask
+
+    @staticmethod
+    def _summary(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "sha256": row["sha256"],
+            "filename": row["filename"],
+            "language": row["language"],
+            "profile": row["profile"],
+            "analyzed_at": row["analyzed_at"],
+            "allergens": allergen_names(row["allergens"]),
+            "nutrients": {column: row[column] for column in NUTRIENT_COLUMNS.values()},
+        }
@@ -0,0 +1,104 @@
+# roi_detection.py - Find nutrition tables and allergen/ingredient statements on a low-resolution page
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom
+
+
+def find_ruled_tables(image, dpi: int) -> List[Box]:
+    """
+    Locate ruled tables from their horizontal rules.
+
+    A rule is a row with a dark run of at least Config.OCR_ROI_RULE_MIN_LENGTH
+    inches (found with a sliding-window sum over each row). Rules that are
+    stacked closely with overlapping extents form a table once there are
+    Config.OCR_ROI_MIN_RULES of them.
+    """
+    dark = np.asarray(image.convert("L")) < 128
+    h, w = dark.shape
+    length = max(2, int(Config.OCR_ROI_RULE_MIN_LENGTH * dpi))
+    if w <= length:
+        return []
+
+    sums = np.cumsum(dark, axis=1, dtype=np.int32)
+    sums = np.pad(sums, ((0, 0), (1, 0)))
+    full = (sums[:, length:] - sums[:, :-length]) == length  # window [x, x+length) fully dark
+    rule_rows = np.flatnonzero(full.any(axis=1))
+    if len(rule_rows) == 0:
+        return []
+
+    # Collapse thick rules (consecutive rows) into one (top, bottom, left, right) each
+    rules = []
+    for run in np.split(rule_rows, np.flatnonzero(np.diff(rule_rows) > 1) + 1):
+        cols = np.flatnonzero(full[run].any(axis=0))
+        rules.append((int(run[0]), int(run[-1]), int(cols[0]), int(cols[-1]) + length))
+
+    max_gap = Config.OCR_ROI_MAX_RULE_GAP * dpi
+    tables: List[Box] = []
+    group = [rules[0]]
+    for rule in rules[1:] + [None]:
+        if rule is not None:
+            prev = group[-1]
+            overlap = min(prev[3], rule[3]) - max(prev[2], rule[2])
+            if rule[0] - prev[1] <= max_gap and overlap >= 0.5 * min(prev[3] - prev[2], rule[3] - rule[2]):
+                group.append(rule)
+                continue
+        if len(group) >= Config.OCR_ROI_MIN_RULES:
+            tables.append((min(r[2] for r in group), group[0][0], max(r[3] for r in group), group[-1][1]))
+        group = [rule]
+    return tables
+
+
+def find_keyword_regions(lines: List[Dict[str, Any]]) -> List[Box]:
+    """Boxes of the Tesseract blocks containing a Config.OCR_ROI_KEYWORDS anchor"""
+    anchored = {line["block"] for line in lines
+                if any(keyword in line["text"].lower() for keyword in Config.OCR_ROI_KEYWORDS)}
+    regions = []
+    for block in anchored:
+        boxes = [line["box"] for line in lines if line["block"] == block]
+        regions.append((min(b[0] for b in boxes), min(b[1] for b in boxes),
+                        max(b[2] for b in boxes), max(b[3] for b in boxes)))
+    return regions
+
+
+def merge_boxes(boxes: List[Tuple[str, Box]], pad: int, size: Tuple[int, int]) -> List[Tuple[str, Box]]:
+    """Pad, clip and merge overlapping (kind, box) regions; merged kinds are joined with '+'"""
+    width, height = size
+    pending = [(kind, (max(0, b[0] - pad), max(0, b[1] - pad), min(width, b[2] + pad), min(height, b[3] + pad)))
+               for kind, b in boxes]
+    merged: List[Tuple[str, Box]] = []
+    while pending:
+        kind, box = pending.pop()
+        for i, (other_kind, other) in enumerate(merged):
+            if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                merged.pop(i)
+                kinds = sorted(set(kind.split("+")) | set(other_kind.split("+")))
+                pending.append(("+".join(kinds), (min(box[0], other[0]), min(box[1], other[1]),
+                                                  max(box[2], other[2]), max(box[3], other[3]))))
+                break
+        else:
+            merged.append((kind, box))
+    return sorted(merged, key=lambda region: (region[1][1], region[1][0]))
+
+
+def detect_regions(image, lines: List[Dict[str, Any]], dpi: int) -> List[Tuple[str, Box]]:
+    """
+    Regions of interest on a first-pass page image.
+
+    Args:
+        image: Preprocessed first-pass page
+        lines: Tesseract lines read from ``image`` (see ocr_pipeline.read_lines)
+        dpi: Resolution of ``image``
+
+    Returns:
+        Sorted list of (kind, box) with kind "table", "keyword" or both joined by '+'
+    """
+    boxes = [("table", box) for box in find_ruled_tables(image, dpi)]
+    boxes += [("keyword", box) for box in find_keyword_regions(lines)]
+    return merge_boxes(boxes, int(Config.OCR_ROI_PADDING * dpi), image.size)
@@ -0,0 +1,145 @@
+# scheduler.py - Priority-aware weighted fair queueing for the OCR and LLM stages
+import os
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+PRIORITY_CLASSES = (INTERACTIVE, BATCH, BACKGROUND)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tag", "enqueued_at", "granted")
+
+    def __init__(self, priority: str, tag: float):
+        self.priority = priority
+        self.tag = tag
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class StageScheduler:
+    """
+    Hand out a fixed number of slots for one pipeline stage.
+
+    Waiters are served in weighted-fair-queueing order: each request gets a
+    virtual finish tag ``max(class_tag, virtual_time) + cost / weight`` and
+    the smallest tag wins a freed slot, so classes share capacity in
+    proportion to their weights. ``reserved`` slots can only be used by
+    interactive traffic; batch and background work soaks up the rest when
+    it is idle.
+    """
+
+    def __init__(self, name: str, capacity: int, reserved: int, weights: Dict[str, float]):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.reserved = min(max(0, reserved), self.capacity - 1)
+        self.weights = weights
+        self._cond = threading.Condition()
+        self._waiting: List[_Waiter] = []
+        self._in_use = {p: 0 for p in PRIORITY_CLASSES}
+        self._virtual_time = 0.0
+        self._class_tag = {p: 0.0 for p in PRIORITY_CLASSES}
+        self._served = {p: 0 for p in PRIORITY_CLASSES}
+        self._waits = {p: deque(maxlen=Config.SCHED_WAIT_WINDOW) for p in PRIORITY_CLASSES}
+
+    @contextmanager
+    def slot(self, priority: str = INTERACTIVE, cost: float = 1.0):
+        """
+        Block until a slot is granted to ``priority``, hold it for the with-block.
+
+        ``cost`` only advances the class's virtual finish tag (e.g. the
+        number of documents in a batched LLM call, so a batch uses up that
+        many turns of its class's fair share); the request still holds a
+        single slot, since it is a single call or page.
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        with self._cond:
+            tag = max(self._class_tag[priority], self._virtual_time) + cost / self.weights[priority]
+            self._class_tag[priority] = tag
+            waiter = _Waiter(priority, tag)
+            self._waiting.append(waiter)
+            self._dispatch()
+            while not waiter.granted:
+                self._cond.wait()
+            self._waits[priority].append(time.monotonic() - waiter.enqueued_at)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use[priority] -= 1
+                self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the eligible waiters with the smallest tags (lock held)"""
+        granted_any = False
+        while self._waiting:
+            in_use = sum(self._in_use.values())
+            if in_use >= self.capacity:
+                break
+            shared_free = in_use < self.capacity - self.reserved
+            eligible = [w for w in self._waiting if w.priority == INTERACTIVE or shared_free]
+            if not eligible:
+                break
+            waiter = min(eligible, key=lambda w: w.tag)
+            self._waiting.remove(waiter)
+            waiter.granted = True
+            self._virtual_time = max(self._virtual_time, waiter.tag)
+            self._in_use[waiter.priority] += 1
+            self._served[waiter.priority] += 1
+            granted_any = True
+        if granted_any:
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        """Per-class queue depth, slots in use and wait-time percentiles"""
+        with self._cond:
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                waits = sorted(self._waits[priority])
+                classes[priority] = {
+                    "queued": sum(1 for w in self._waiting if w.priority == priority),
+                    "in_service": self._in_use[priority],
+                    "served": self._served[priority],
+                    "wait_p50": _percentile(waits, 0.50),
+                    "wait_p95": _percentile(waits, 0.95),
+                    "wait_max": round(waits[-1], 3) if waits else None,
+                }
+            return {
+                "capacity": self.capacity,
+                "reserved_interactive": self.reserved,
+                "weights": self.weights,
+                "classes": classes,
+            }
+
+
+def _percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))], 3)
+
+
+class PipelineScheduler:
+    """OCR (CPU) and LLM (rate limit) stage schedulers shared by one PDFAnalyzer"""
+
+    def __init__(self):
+        weights = Config.SCHED_WEIGHTS
+        self.ocr = StageScheduler("ocr", Config.OCR_CONCURRENCY or os.cpu_count() or 1,
+                                  Config.SCHED_OCR_RESERVED_INTERACTIVE, weights)
+        self.llm = StageScheduler("llm", Config.LLM_STAGE_CONCURRENCY,
+                                  Config.SCHED_LLM_RESERVED_INTERACTIVE, weights)
+
+    def snapshot(self) -> dict:
+        return {"ocr": self.ocr.snapshot(), "llm": self.llm.snapshot()}
@@ -0,0 +1,144 @@
+# serve.py - Production entry point: prefork gunicorn with uvicorn workers
+"""
+Run the API with one process per CPU of the container's quota.
+
+Usage (from backend/):
+    python serve.py [--bind 0.0.0.0:10000] [--workers N]
+
+Each worker imports the app itself (no preload) and warms up its services,
+OCR engine and LLM connection pool before it accepts traffic
+(WARMUP_MODE=blocking). Workers are recycled after WORKER_MAX_REQUESTS
+requests (with jitter) or once their RSS passes WORKER_MAX_RSS_MB. SIGTERM
+drains: workers stop accepting, finish in-flight analyses for up to
+GRACEFUL_TIMEOUT seconds, then exit.
+
+Upload coalescing and Idempotency-Key reattachment (coalescing.SingleFlight)
+live in each worker's memory. Identical concurrent uploads, or a retry
+whose key reaches a different worker, are analyzed again from scratch
+there. Only the OCR page cache is shared, and only when OCR_CACHE_DIR is
+set. Run a single worker (``--workers 1``) or route by Idempotency-Key /
+client at the load balancer when deduplication across requests matters.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+
+def available_cpus() -> int:
+    """CPUs this container may use: the cgroup CPU quota if set, else the CPU affinity mask"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fh:  # cgroup v2: "<quota> <period>" or "max <period>"
+            limit, period = fh.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as fh:  # cgroup v1
+                limit = int(fh.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as fh:
+                period = int(fh.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, KB on Linux
+
+
+def _watch_rss(worker) -> None:
+    """Ask the worker to exit gracefully once it outgrows Config.WORKER_MAX_RSS_MB"""
+    while True:
+        time.sleep(Config.WORKER_RSS_CHECK_INTERVAL)
+        rss = rss_mb()
+        if rss > Config.WORKER_MAX_RSS_MB:
+            worker.log.info("♻️ Worker %s RSS %.0f MB > %d MB, recycling", worker.pid, rss, Config.WORKER_MAX_RSS_MB)
+            os.kill(worker.pid, signal.SIGTERM)  # uvicorn finishes in-flight requests, the arbiter forks a replacement
+            return
+
+
+def post_worker_init(worker) -> None:
+    if Config.WORKER_MAX_RSS_MB:
+        threading.Thread(target=_watch_rss, args=(worker,), name="rss-watchdog", daemon=True).start()
+
+
+def options(bind: str, workers: int) -> dict:
+    return {
+        "bind": bind,
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": False,  # every worker imports and warms its own services
+        "max_requests": Config.WORKER_MAX_REQUESTS,
+        "max_requests_jitter": Config.WORKER_MAX_REQUESTS_JITTER if Config.WORKER_MAX_REQUESTS else 0,
+        "timeout": Config.WORKER_TIMEOUT,
+        "graceful_timeout": Config.GRACEFUL_TIMEOUT,
+        "post_worker_init": post_worker_init,
+        "accesslog": "-",
+    }
+
+
+def run(bind: str, workers: int, load=None) -> None:
+    """
+    Serve with ``workers`` gunicorn workers on ``bind``; ``load`` builds the
+    ASGI app in each worker (default: ``app.app``)
+    """
+    # Workers are forked from this process and inherit these settings
+    if "WARMUP_MODE" not in os.environ:
+        Config.WARMUP_MODE = "blocking"
+    if not Config.OCR_CONCURRENCY:
+        # Split the CPUs between workers instead of giving each one a slot per CPU
+        Config.OCR_CONCURRENCY = max(1, available_cpus() // workers)
+
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options(bind, workers).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            if load is not None:
+                return load()
+            from app import app
+            return app
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logger.info("🚀 Starting %d worker(s) on %s (OCR slots per worker: %s)",
+                workers, bind, Config.OCR_CONCURRENCY)
+    if workers > 1:
+        logger.warning("⚠️ Upload coalescing and Idempotency-Key reattachment are per worker: "
+                       "duplicates landing on different workers are analyzed twice")
+    Server().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bind", default=f"0.0.0.0:{os.getenv('PORT', '10000')}")
+    parser.add_argument("--workers", type=int, default=Config.WEB_CONCURRENCY or available_cpus())
+    args = parser.parse_args()
+    run(args.bind, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# services.py - Lazily built application services and startup warm-up
+import time
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+
+class Services:
+    """
+    The heavy singletons behind the API: LLM client, PDF analyzer, PDF
+    generator, result store.
+
+    Each one is built on first use, and only then imports its dependencies
+    (OpenAI SDK, PyPDF2 / pytesseract / pdf2image / numpy, reportlab), so
+    importing ``app`` stays cheap. ``warm_up`` builds everything ahead of
+    traffic; the app's startup hook runs it per Config.WARMUP_MODE.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built: Dict[str, Any] = {}
+        self._ocr_status: Optional[dict] = None
+        self.warm = threading.Event()
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+
+    def _get(self, name: str, factory) -> Any:
+        service = self._built.get(name)
+        if service is None:
+            with self._lock:
+                service = self._built.get(name)
+                if service is None:
+                    started = time.perf_counter()
+                    service = factory()
+                    self._built[name] = service
+                    logger.info("🧩 %s ready in %.0f ms", name, (time.perf_counter() - started) * 1000)
+        return service
+
+    def peek(self, name: str) -> Any:
+        """The service if it has been built already, else None (never builds)"""
+        return self._built.get(name)
+
+    @property
+    def llm_client(self):
+        def build():
+            from llm import LLMClient
+            return LLMClient()
+        return self._get("llm_client", build)
+
+    @property
+    def pdf_analyzer(self):
+        def build():
+            from pdf_analyzer import PDFAnalyzer
+            return PDFAnalyzer(self.llm_client)
+        return self._get("pdf_analyzer", build)
+
+    @property
+    def pdf_generator(self):
+        def build():
+            from pdf_generator import PDFGenerator
+            return PDFGenerator()
+        return self._get("pdf_generator", build)
+
+    @property
+    def result_store(self):
+        """ResultStore, or None when Config.RESULT_STORE_ENABLED is off"""
+        if not Config.RESULT_STORE_ENABLED:
+            return None
+
+        def build():
+            from result_store import ResultStore
+            return ResultStore()
+        return self._get("result_store", build)
+
+    def ocr_status(self, refresh: bool = False) -> dict:
+        """OCRService.test_ocr(), cached after the first call unless ``refresh``"""
+        if self._ocr_status is None or refresh:
+            from TextExtraction import OCRService
+            self._ocr_status = OCRService.test_ocr()
+        return self._ocr_status
+
+    def warm_up(self) -> None:
+        """
+        Build every service, probe Tesseract and run one tiny OCR, and open the
+        LLM connection pool, so the first request pays for none of it
+        """
+        started = time.perf_counter()
+        try:
+            self.pdf_analyzer
+            self.pdf_generator
+            self.result_store
+            if self.ocr_status()["success"]:
+                from ocr_pipeline import warm_up as warm_up_ocr
+                warm_up_ocr()
+            self.llm_client.warm_up()
+        except Exception as e:
+            self.warmup_error = str(e)
+            logger.exception("⚠️ Warm-up failed (services will be built on first use): %s", e)
+        finally:
+            self.warmup_seconds = round(time.perf_counter() - started, 3)
+            self.warm.set()
+            logger.info("🔥 Warm-up finished in %.2fs", self.warmup_seconds)
+
+    def snapshot(self) -> dict:
+        return {"built": sorted(self._built), "warm": self.warm.is_set(),
+                "warmup_mode": Config.WARMUP_MODE, "warmup_seconds": self.warmup_seconds,
+                "warmup_error": self.warmup_error}
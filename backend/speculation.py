@@ -0,0 +1,141 @@
+# speculation.py - Start LLM extraction while later pages are still being OCR'd
+import time
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+from deadline import DeadlineExceededError, RequestCancelledError
+from llm_stream import PartialGate
+from page_triage import keyword_hits
+from structured_logging import carry
+
+logger = logging.getLogger("be_aware_backend")
+
+
+class SpeculativeExtraction:
+    """
+    Overlap OCR of the remaining pages with an LLM extraction of the pages read so far.
+
+    ``offer`` is called with the document text after every OCR'd page. The
+    first page mentioning ingredients or allergens
+    (Config.OCR_LLM_PIPELINE_TRIGGER_KEYWORDS) starts an extraction of the
+    text so far on a background thread. A later page containing any label
+    keyword (Config.OCR_ROI_KEYWORDS) makes that speculation stale: it is
+    cancelled and restarted on the longer text, up to
+    Config.OCR_LLM_PIPELINE_MAX_SPECULATIONS times. ``resolve`` then returns
+    the speculative result if it still covers everything relevant, and
+    re-issues the extraction on the final text otherwise.
+    """
+
+    def __init__(self, extract: Callable[..., Dict[str, Any]],
+                 on_partial: Callable[[str, str, Any], None] = None):
+        """
+        Args:
+            extract: ``extract(text, on_partial=..., cancel_event=...)`` running one
+                LLM extraction (PDFAnalyzer.extract_data_from_text with the
+                request's priority and deadline bound)
+            on_partial: Streamed field callback; only the current run forwards to it,
+                and the fields of a superseded run are withdrawn with (None, None, None)
+        """
+        self.extract = extract
+        self.on_partial = on_partial
+        self.started_at = time.monotonic()
+        self.speculations = 0
+        self.stale = False
+        self.basis: Optional[str] = None
+        self.basis_at: Optional[float] = None
+        self._future: Optional[Future] = None
+        self._cancel: Optional[threading.Event] = None
+        self._partials: Optional[PartialGate] = None
+        self._lock = threading.Lock()
+
+    def offer(self, text: str, page_text: str) -> None:
+        """
+        Report progress: ``text`` is the document so far, ``page_text`` the page just read
+        """
+        if self._future is None:
+            hits = keyword_hits(page_text, Config.OCR_LLM_PIPELINE_TRIGGER_KEYWORDS)
+            if hits:
+                logger.info("🏎️ Starting speculative LLM extraction (%s) while OCR continues", ", ".join(hits[:3]))
+                self._launch(text)
+        elif not self.stale and keyword_hits(page_text):
+            self.stale = True
+            self.cancel()
+            if self.speculations < Config.OCR_LLM_PIPELINE_MAX_SPECULATIONS:
+                logger.info("🔄 Later page adds label content - restarting speculative extraction")
+                self._launch(text)
+
+    def resolve(self, text: str) -> Dict[str, Any]:
+        """
+        Extraction result for the final document ``text``.
+
+        Reuses the speculation when it is still current, otherwise (or when it
+        failed) runs the extraction on ``text``.
+
+        Raises:
+            DeadlineExceededError, RequestCancelledError: From either run
+        """
+        reused = False
+        result = None
+        if self._future is not None and not self.stale:
+            try:
+                result = self._future.result()
+                reused = "error" not in result
+            except (DeadlineExceededError, RequestCancelledError):
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Speculative extraction failed, re-issuing: %s", e)
+        elif self._future is not None:
+            logger.info("🔁 Later pages added label content - re-issuing LLM extraction on the full text")
+
+        if not reused:
+            self.cancel()
+            result = self.extract(text, on_partial=self._forwarder())
+
+        result.setdefault("metadata", {})["pipeline"] = {
+            "speculations": self.speculations,
+            "reused": reused,
+            "speculated_chars": len(self.basis) if self.basis is not None else 0,
+            "final_chars": len(text),
+            "started_after_seconds": (round(self.basis_at - self.started_at, 2)
+                                      if self.basis_at is not None else None),
+        }
+        return result
+
+    def cancel(self) -> None:
+        """Abandon the running speculation, if any"""
+        with self._lock:
+            if self._cancel is not None:
+                self._cancel.set()
+
+    def _launch(self, text: str) -> None:
+        self.cancel()
+        cancel = threading.Event()
+        future = Future()
+        forward = self._forwarder()
+        with self._lock:
+            self._cancel, self._future = cancel, future
+            self.speculations += 1
+            self.stale = False
+            self.basis, self.basis_at = text, time.monotonic()
+
+        def run() -> None:
+            try:
+                future.set_result(self.extract(text, on_partial=forward, cancel_event=cancel))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=carry(run), name="llm-speculation", daemon=True).start()
+
+    def _forwarder(self) -> Optional[PartialGate]:
+        """Field callback for a new run; the previous run's fields are withdrawn and it goes quiet"""
+        if self.on_partial is None:
+            return None
+        partials = PartialGate(self.on_partial, None, None, None)
+        with self._lock:
+            previous, self._partials = self._partials, partials
+        if previous is not None:
+            previous.reset(close=True)
+        return partials
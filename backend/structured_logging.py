@@ -0,0 +1,218 @@
+# structured_logging.py - Queue-based JSON logging with request correlation IDs and debug sampling
+import sys
+import json
+import uuid
+import zlib
+import queue
+import atexit
+import random
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Optional
+
+from config import Config
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+app_logger = logging.getLogger("be_aware_backend")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_listener: Optional[QueueListener] = None
+
+# LogRecord attributes; anything else on a record came in through ``extra=`` and is logged as a field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def current_request_id() -> Optional[str]:
+    """Correlation ID of the request being handled by the calling task / thread, if any"""
+    return _request_id.get()
+
+
+@contextmanager
+def bind(request_id: Optional[str]):
+    """Tag every record logged by the calling thread (or task) in the block with ``request_id``"""
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+def carry(fn: Callable) -> Callable:
+    """
+    Wrap ``fn`` to run under the caller's request ID: worker threads
+    (executors, speculation, hedged calls) don't inherit it otherwise
+    """
+    request_id = current_request_id()
+
+    def run(*args, **kwargs):
+        with bind(request_id):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamps records with the request ID and samples DEBUG records per
+    request: a request is either logged in full or not at all, chosen by a
+    hash of its ID so every worker agrees. Records outside a request are
+    sampled one by one.
+    """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = _request_id.get()
+        record.request_id = request_id
+        if record.levelno >= logging.INFO or self.sample_rate >= 1:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        if request_id is None:
+            return random.random() < self.sample_rate
+        return zlib.crc32(request_id.encode()) % 10000 < self.sample_rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, plus any ``extra=`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread unformatted, so ``%`` arguments are
+    only interpolated (and exceptions only rendered) off the request path.
+    Records are not copied: log immutable values, not objects that the
+    caller changes right after logging. When the queue is full, records are
+    dropped and counted instead of blocking the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _formatter(fmt: str) -> logging.Formatter:
+    if fmt == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s")
+
+
+def configure_logging(level: str = None, fmt: str = None, sample_rate: float = None,
+                      use_queue: bool = None, stream=None) -> logging.Handler:
+    """
+    Replace the root logger's handlers per Config.LOG_* (arguments override).
+    ``level`` applies to the "be_aware_backend" logger; other loggers stay
+    at INFO or above.
+
+    Level and sampling checks run on the calling thread; with ``use_queue``
+    that is all it does besides appending the record to a bounded queue,
+    and a listener thread formats and writes it. Calling it again (e.g. in
+    a forked worker) stops the previous listener first.
+
+    Returns:
+        The handler attached to the root logger
+    """
+    global _listener
+    level = (level or Config.LOG_LEVEL).upper()
+    fmt = fmt or Config.LOG_FORMAT
+    sample_rate = Config.LOG_DEBUG_SAMPLE_RATE if sample_rate is None else sample_rate
+    use_queue = Config.LOG_ASYNC if use_queue is None else use_queue
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(_formatter(fmt))
+    if use_queue:
+        handler = _DeferredQueueHandler(queue.Queue(Config.LOG_QUEUE_SIZE))
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+    else:
+        handler = output
+    handler.addFilter(RequestContextFilter(sample_rate))
+
+    root = logging.getLogger()
+    for previous in list(root.handlers):
+        root.removeHandler(previous)
+    root.addHandler(handler)
+    # DEBUG is for our own per-page / per-call events, not every library's internals
+    app_logger.setLevel(level)
+    root.setLevel(max(logging.getLevelName(level), logging.INFO))
+    return handler
+
+
+def flush_logging() -> None:
+    """Write out everything queued so far (stops and restarts the listener)"""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+def dropped_records() -> int:
+    """Records discarded because the log queue was full"""
+    handler = next((h for h in logging.getLogger().handlers if isinstance(h, _DeferredQueueHandler)), None)
+    return handler.dropped if handler else 0
+
+
+@atexit.register
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware binding a correlation ID to each HTTP request: the
+    client's X-Request-ID when it sends one, else a new random ID. The ID
+    is echoed in the response's X-Request-ID header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = REQUEST_ID_HEADER.lower().encode()
+        sent = next((value.decode("latin-1") for name, value in scope["headers"] if name == header), "")
+        request_id = sent[:64] if sent else uuid.uuid4().hex[:16]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(header, request_id.encode("latin-1"))]
+            await send(message)
+
+        with bind(request_id):
+            await self.app(scope, receive, send_with_id)
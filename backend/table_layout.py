@@ -0,0 +1,372 @@
+# table_layout.py - Rebuild nutrition tables of digital PDFs from text-layer glyph positions
+import re
+import logging
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from config import Config
+from nutrition import NUTRIENT_KEYS, parse_value
+
+logger = logging.getLogger("be_aware_backend")
+
+# Row labels, matched on the accent-folded, lower-cased label cell. Sub-rows that
+# are not one of the six nutrients ("of which saturates", fibre) are kept in the
+# table but never mapped; sugar is checked before anything else because its
+# label often starts with "of which" / "davon" / "dont".
+_SKIP_LABEL = re.compile(r"saturat|gesatt|satur|telitett|mono|poly|fibre|fiber|ballast|rost\b|starch|starke|amidon")
+_NUTRIENT_LABELS = [
+    ("sugar", re.compile(r"(?:of which |davon |dont |amelyb[oő]l |- )?(?:sugars?|zucker|sucres?|cukor|cukrok)\b")),
+    ("energy", re.compile(r"(?:energy|energie|energia|energiaertek|brennwert|valeur energetique|kcal|kj)\b")),
+    ("fat", re.compile(r"(?:fat|fett|matieres grasses|lipides|zsir)\b")),
+    ("carbohydrate", re.compile(r"(?:carbohydrates?|kohlenhydrate|glucides|szenhidrat)\b")),
+    ("protein", re.compile(r"(?:proteins?|eiweiss|eiweis|proteines|feherje)\b")),
+    ("sodium", re.compile(r"(?:sodium|natrium)\b")),
+    ("salt", re.compile(r"(?:salt|salz|sel)\b|so$")),
+]
+_PER_100_HEADER = re.compile(r"100\s*(?:g|ml)\b")
+_SERVING_HEADER = re.compile(r"serving|portion|adag")
+_TABLE_HEADING = re.compile(r"nutrition|nahrwert|naehrwert|valeurs? nutritionnelles?|tapertek")
+_AMOUNT = r"(?:[<>~]\s*)?\d+(?:[.,]\d+)?\s*(?:kj|kcal|mg|µg|mcg|g|ml|%)?\*?"
+_AMOUNT_CELL = re.compile(rf"{_AMOUNT}(?:\s*/\s*{_AMOUNT})*", re.IGNORECASE)
+_UNIT = re.compile(r"\d\s*(?:kj|kcal|mg|µg|mcg|g|ml)(?![a-z])", re.IGNORECASE)
+_ANCHOR_TOLERANCE = 2.0  # points
+_NARROW = frozenset(" .,:;/()|'!iIl")
+_CONTINUATION = re.compile(r"(?:kj|kcal|mg|µg|mcg|g|ml|%)(?![a-z])|/", re.IGNORECASE)
+_LEADING_LABEL = re.compile(r"[^\d<>]*")
+# Sanity bounds per 100 g: anything outside means the columns were mis-read
+_MAX_GRAMS = 100.0
+_MAX_KCAL = 950.0
+
+
+def _fold(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text.lower().replace("ß", "ss"))
+                   if not unicodedata.combining(c)).strip()
+
+
+def _mult(m: List[float], n: List[float]) -> List[float]:
+    return [m[0] * n[0] + m[1] * n[2], m[0] * n[1] + m[1] * n[3],
+            m[2] * n[0] + m[3] * n[2], m[2] * n[1] + m[3] * n[3],
+            m[4] * n[0] + m[5] * n[2] + n[4], m[4] * n[1] + m[5] * n[3] + n[5]]
+
+
+class Fragment:
+    """One text run of the page's text layer, at its baseline origin (PDF points)"""
+
+    __slots__ = ("index", "x", "y", "size", "text")
+
+    def __init__(self, index: int, x: float, y: float, size: float, text: str):
+        self.index = index
+        self.x = x
+        self.y = y
+        self.size = size
+        self.text = text
+
+    @property
+    def right(self) -> float:
+        # Rough advance width: narrow spaces and punctuation, everything else half an em
+        text = self.text.rstrip()
+        narrow = sum(1 for c in text if c in _NARROW)
+        return self.x + ((len(text) - narrow) * 0.5 + narrow * 0.28) * self.size
+
+
+def fragment_collector(fragments: List[Fragment]) -> Callable:
+    """``visitor_text`` callback for PyPDF2's ``page.extract_text`` that records every text run"""
+    def visit(text: str, cm, tm, font_dict, font_size) -> None:
+        if text.strip():
+            matrix = _mult(tm, cm)
+            scale = (matrix[2] ** 2 + matrix[3] ** 2) ** 0.5 or 1.0
+            fragments.append(Fragment(len(fragments), matrix[4], matrix[5], font_size * scale, text))
+    return visit
+
+
+def group_rows(fragments: List[Fragment]) -> List[List[Fragment]]:
+    """Fragments grouped into visual lines (top to bottom), each sorted left to right"""
+    rows: List[List[Fragment]] = []
+    for fragment in sorted(fragments, key=lambda f: (-f.y, f.x)):
+        if rows and abs(rows[-1][0].y - fragment.y) <= max(1.5, 0.4 * fragment.size):
+            rows[-1].append(fragment)
+        else:
+            rows.append([fragment])
+    return [sorted(row, key=lambda f: f.x) for row in rows]
+
+
+def column_anchors(rows: List[List[Fragment]]) -> List[float]:
+    """
+    x positions where text runs start on at least three different lines:
+    the left edges of table columns (and of the body text)
+    """
+    lines_at: Dict[int, Set[int]] = {}
+    for r, row in enumerate(rows):
+        for fragment in row:
+            lines_at.setdefault(round(fragment.x / _ANCHOR_TOLERANCE), set()).add(r)
+    return sorted(bucket * _ANCHOR_TOLERANCE for bucket, lines in lines_at.items() if len(lines) >= 3)
+
+
+def _cells(row: List[Fragment], anchors: List[float]) -> List[List[Fragment]]:
+    """
+    Merge the runs of a line into cells: a run starts a new cell at a column
+    anchor or after a gap wider than one character, except units and "/"
+    which always continue the amount before them (word-per-run PDFs)
+    """
+    cells: List[List[Fragment]] = []
+    for fragment in row:
+        at_anchor = any(abs(fragment.x - anchor) <= _ANCHOR_TOLERANCE for anchor in anchors)
+        continues = bool(cells) and (_CONTINUATION.match(fragment.text.strip())
+                                     or cells[-1][-1].text.rstrip().endswith("/"))
+        if continues or cells and not at_anchor and fragment.x - cells[-1][-1].right < fragment.size:
+            cells[-1].append(fragment)
+        else:
+            cells.append([fragment])
+    return cells
+
+
+def _cell_text(cell: List[Fragment]) -> str:
+    return " ".join(f.text.strip() for f in cell)
+
+
+def _label_of(text: str) -> Optional[str]:
+    folded = _fold(text)
+    if _SKIP_LABEL.search(folded):
+        return None
+    for key, pattern in _NUTRIENT_LABELS:
+        if pattern.match(folded):
+            return key
+    return None
+
+
+class NutritionTable:
+    """
+    A nutrition table rebuilt from one page's text layer.
+
+    ``rows`` holds (label, [value cell texts]) in page order, ``columns``
+    the header texts over the value columns when there is a header row, and
+    ``values`` the per-100 g (or first) column for the recognised nutrients,
+    keyed like ``nutritional_values``.
+    """
+
+    def __init__(self, page_number: int, rows: List[tuple], columns: List[str],
+                 values: Dict[str, str], basis: Optional[str], fragment_ids: Set[int]):
+        self.page_number = page_number
+        self.rows = rows
+        self.columns = columns
+        self.values = values
+        self.basis = basis
+        self.fragment_ids = fragment_ids
+
+    @property
+    def complete(self) -> bool:
+        """
+        Every nutrient has a value with an explicit, plausible unit and
+        magnitude, so the LLM does not need to read the table at all
+        """
+        if set(self.values) != set(NUTRIENT_KEYS) or self.basis == "serving":
+            return False
+        if not all(_UNIT.search(value) for value in self.values.values()):
+            return False  # a bare number could be a percentage of the reference intake, or anything
+        amounts = {key: parse_value(key, value) for key, value in self.values.items()}
+        if any(amount is None for amount in amounts.values()):
+            return False
+        if amounts["energy"].unit not in ("kcal", "kJ") or not 0 <= amounts["energy"].kcal <= _MAX_KCAL:
+            return False
+        grams = {key: amount.grams for key, amount in amounts.items() if key != "energy"}
+        if any(g is None or not 0 <= g <= _MAX_GRAMS for g in grams.values()):
+            return False
+        return grams["sugar"] <= grams["carbohydrate"] + 0.05
+
+    def as_text(self) -> str:
+        """Compact "label | value | value" rendering for the LLM prompt"""
+        lines = ["Nutrition table:"]
+        if self.columns:
+            lines.append(" | ".join(["Nutrient"] + self.columns))
+        lines.extend(" | ".join([label] + cells) for label, cells in self.rows)
+        return "\n".join(lines)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"page": self.page_number, "complete": self.complete, "basis": self.basis,
+                "columns": self.columns, "nutrients": sorted(self.values)}
+
+
+def _amount_cells(cells: List[List[Fragment]]) -> int:
+    """How many of ``cells``, from the first, are amounts ("9.5 g", "1580 kJ / 375 kcal", "<0,5 g")"""
+    count = 0
+    for cell in cells:
+        if not _AMOUNT_CELL.fullmatch(_cell_text(cell)):
+            break
+        count += 1
+    return count
+
+
+def _candidate_row(r: int, row: List[Fragment], anchors: List[float]) -> Optional[dict]:
+    """
+    The line as a table row when its first label cell names a nutrient (or a
+    known sub-row) and amounts follow it; anything after the amounts is not
+    part of the row
+    """
+    cells = _cells(row, anchors)
+    for c, cell in enumerate(cells):
+        text = _cell_text(cell)
+        label = _LEADING_LABEL.match(text).group(0).strip()
+        if not label:
+            continue  # a value cell
+        key = _label_of(label)
+        if key is None and not _SKIP_LABEL.search(_fold(label)):
+            return None
+        inline = text[len(label):].strip()  # "Fat 9.5 g" printed as one run
+        if inline and not _AMOUNT_CELL.fullmatch(inline):
+            return None  # "sugar 12%, hazelnuts 5%, ..." - running text, not a row
+        values = cells[c + 1:c + 1 + _amount_cells(cells[c + 1:])]
+        if not inline and not values:
+            return None
+        return {"r": r, "key": key, "label": label, "label_x": cell[0].x, "inline": bool(inline),
+                "value_texts": ([inline] if inline else []) + [_cell_text(v) for v in values],
+                "value_x": ([cell[-1].x] if inline else []) + [v[0].x for v in values],
+                "edges": [(v[0].x, v[-1].right) for v in values],
+                "size": cell[0].size, "used": sum([cell] + values, [])}
+    return None
+
+
+def _blocks(candidates: List[dict]) -> List[List[dict]]:
+    """Candidate rows split into runs of nearby lines (at most one other line between two rows)"""
+    blocks: List[List[dict]] = []
+    for row in candidates:
+        if blocks and row["r"] - blocks[-1][-1]["r"] <= 2:
+            blocks[-1].append(row)
+        else:
+            blocks.append([row])
+    return blocks
+
+
+def _aligned(row: dict, block: List[dict]) -> bool:
+    """
+    Every value cell of the row starts or ends where a value cell of another
+    row of the block does (left- or right-aligned columns); rows with the
+    amount inside the label run need a label aligned with another row's
+    """
+    others = [other for other in block if other is not row]
+    if not row["edges"]:
+        return any(abs(other["label_x"] - row["label_x"]) <= _ANCHOR_TOLERANCE for other in others)
+    right_tolerance = max(_ANCHOR_TOLERANCE, 0.6 * row["size"])  # right edges are estimated
+    return all(any(abs(left - o_left) <= _ANCHOR_TOLERANCE or abs(right - o_right) <= right_tolerance
+                   for other in others for o_left, o_right in other["edges"])
+               for left, right in row["edges"])
+
+
+def _header(rows: List[List[Fragment]], anchors: List[float], first_row: int) -> Optional[List[List[Fragment]]]:
+    """Cells of the closest line (up to three) above the block naming the table or its columns"""
+    for r in range(first_row - 1, max(-1, first_row - 4), -1):
+        cells = _cells(rows[r], anchors)
+        folded = [_fold(_cell_text(cell)) for cell in cells]
+        if any(_PER_100_HEADER.search(t) or _SERVING_HEADER.search(t) or _TABLE_HEADING.search(t) for t in folded):
+            return cells
+    return None
+
+
+def find_nutrition_table(fragments: List[Fragment], page_number: int = 1) -> Optional[NutritionTable]:
+    """
+    Find the nutrition table among a page's text runs: one block of nearby
+    lines under a header ("Nutrition information", "per 100 g", ...) whose
+    label cell names a nutrient and whose value cells are amounts in
+    aligned columns. The per-100 g column is the one under a "100 g"
+    header; otherwise the first value column is used. None if no block has
+    Config.LAYOUT_TABLE_MIN_ROWS nutrient rows.
+    """
+    rows = group_rows(fragments)
+    anchors = column_anchors(rows)
+    candidates = [row for row in (_candidate_row(r, line, anchors) for r, line in enumerate(rows)) if row]
+
+    best = None
+    for block in _blocks(candidates):
+        header = _header(rows, anchors, block[0]["r"])
+        if header is None:
+            continue
+        block = [row for row in block if _aligned(row, block)]
+        keyed = sum(1 for row in block if row["key"])
+        if keyed >= Config.LAYOUT_TABLE_MIN_ROWS and (best is None or keyed > best[0]):
+            best = (keyed, block, header)
+    if best is None:
+        return None
+    _, table_rows, header = best
+
+    # Amount-only lines right under a row ("375 kcal" under "1580 kJ")
+    labelled = {row["r"] for row in table_rows}
+    continuation: Dict[int, tuple] = {}
+    for r in range(table_rows[0]["r"] + 1, table_rows[-1]["r"] + 1):
+        if r in labelled or r - 1 not in labelled:
+            continue
+        cells = _cells(rows[r], anchors)
+        if cells and _amount_cells(cells) == len(cells):
+            continuation[r - 1] = ([_cell_text(cell) for cell in cells], [cell[0].x for cell in cells], sum(cells, []))
+
+    texts = [_cell_text(cell) for cell in header]
+    folded = [_fold(text) for text in texts]
+    value_start = min(row["value_x"][0] for row in table_rows) - 2 * table_rows[0]["size"]
+    columns = [text for cell, text in zip(header, texts) if cell[0].x >= value_start]
+    per_100 = [i for i, text in enumerate(folded) if _PER_100_HEADER.search(text)]
+    per_100_x = None
+    basis = None
+    if per_100:
+        per_100_x = header[per_100[0]][0].x
+        basis = "100ml" if "ml" in folded[per_100[0]] else "100g"
+    elif any(_SERVING_HEADER.search(text) for text in folded):
+        basis = "serving"
+    # Only the header's own cells leave the text: column titles and a short table title
+    fragment_ids = {f.index for cell, text, fold in zip(header, texts, folded)
+                    if cell[0].x >= value_start or _TABLE_HEADING.search(fold) and len(text) <= 60
+                    for f in cell}
+
+    values: Dict[str, str] = {}
+    rendered = []
+    for row in table_rows:
+        value_texts, value_x, used = row["value_texts"], row["value_x"], row["used"]
+        if row["r"] in continuation:
+            extra_texts, extra_x, extra_used = continuation[row["r"]]
+            value_texts, value_x = _merge_columns(value_texts, value_x, extra_texts, extra_x)
+            used = used + extra_used
+        fragment_ids.update(f.index for f in used)
+        rendered.append((row["label"], value_texts))
+        key = row["key"]
+        if key is None:
+            continue
+        if per_100_x is not None:
+            column = min(range(len(value_x)), key=lambda i: abs(value_x[i] - per_100_x))
+        else:
+            column = 0
+        value = value_texts[column]
+        if key == "salt":
+            if "sodium" in values:
+                continue
+            key, value = "sodium", f"{value} (as salt)"
+        values.setdefault(key, value)
+
+    table = NutritionTable(page_number, rendered, columns, values, basis, fragment_ids)
+    logger.info("📐 Page %d: nutrition table with %d rows (%s)", page_number, len(rendered),
+                "complete" if table.complete else "incomplete")
+    return table
+
+
+def _merge_columns(texts: List[str], xs: List[float], extra_texts: List[str], extra_xs: List[float]):
+    """Append each continuation cell to the value cell in the same column"""
+    merged = list(texts)
+    for text, x in zip(extra_texts, extra_xs):
+        column = min(range(len(xs)), key=lambda i: abs(xs[i] - x))
+        merged[column] = f"{merged[column]} / {text}"
+    return merged, xs
+
+
+def text_without(fragments: List[Fragment], fragment_ids: Set[int]) -> str:
+    """The page's text in content-stream order, leaving out the given fragments"""
+    parts: List[str] = []
+    previous = None
+    for fragment in fragments:
+        if fragment.index in fragment_ids:
+            continue
+        text = fragment.text
+        if previous is not None:
+            if abs(previous.y - fragment.y) > 0.4 * fragment.size:
+                if not parts[-1].endswith("\n"):
+                    parts.append("\n")
+            elif not parts[-1][-1:].isspace() and not text[:1].isspace():
+                parts.append(" ")
+        parts.append(text)
+        previous = fragment
+    return "".join(parts).strip()
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from llm import LLMClient  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeStream:
+    """Yields ``chunks`` as completion deltas; ``None`` stalls until the response is closed"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.response = FakeResponse()
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if chunk is None:
+                self.response.closed.wait(5.0)
+                raise ConnectionError("response closed")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+
+
+class FakeUpstream:
+    """OpenAI client stand-in: each call to a model streams that model's next script"""
+
+    def __init__(self, scripts):
+        self.scripts = {model: list(calls) for model, calls in scripts.items()}
+        self.streams = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, stream=False, **kwargs):
+        assert stream, "the fake upstream only streams"
+        self.streams[model] = FakeStream(self.scripts[model].pop(0))
+        return self.streams[model]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    ``fake_llm(scripts, streaming=True)``: an LLMClient with hedging on (after
+    50 ms) talking to a FakeUpstream; ``scripts`` maps model -> one chunk
+    list per call
+    """
+    def build(scripts, streaming: bool = True) -> LLMClient:
+        monkeypatch.setattr(Config, "LLM_STREAMING", streaming)
+        monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", True)
+        monkeypatch.setattr(Config, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+        llm = LLMClient()
+        llm.client = FakeUpstream(scripts)
+        llm.configured = True
+        return llm
+
+    return build
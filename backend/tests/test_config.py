@@ -0,0 +1,15 @@
+import pytest
+
+from config import _sched_weights
+
+
+def test_partial_sched_weights_keep_the_other_defaults():
+    assert _sched_weights("interactive=10") == {"interactive": 10.0, "batch": 2.0, "background": 1.0}
+    assert _sched_weights("") == {"interactive": 8.0, "batch": 2.0, "background": 1.0}
+    assert _sched_weights(" batch = 3 , background=0.5 ")["background"] == 0.5
+
+
+@pytest.mark.parametrize("spec", ["interactiv=10", "batch", "batch=fast", "background=0"])
+def test_bad_sched_weights_fail_at_startup(spec):
+    with pytest.raises(ValueError, match="SCHED_WEIGHTS"):
+        _sched_weights(spec)
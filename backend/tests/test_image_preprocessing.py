@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_preprocessing import preprocess, to_grayscale
+
+
+def page(mode: str) -> Image.Image:
+    """Dark text stripe on a light page, in ``mode``"""
+    image = Image.new("RGB", (120, 80), (235, 235, 235))
+    image.paste((20, 20, 20), (10, 30, 110, 50))
+    return image.convert(mode)
+
+
+@pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA", "P", "CMYK", "1"])
+def test_grayscale_is_luminance_for_every_mode(mode):
+    gray, _ = preprocess(page(mode), ["grayscale"])
+    arr = np.asarray(gray)
+    assert arr.ndim == 2
+    assert arr[5, 5] > 200
+    assert arr[40, 60] < 60
+
+
+def test_two_channel_array():
+    arr = np.dstack([np.full((4, 4), 200, np.uint8), np.full((4, 4), 255, np.uint8)])
+    assert (to_grayscale(arr) == 200).all()
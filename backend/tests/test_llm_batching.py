@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceededError, RequestCancelledError
+from llm_batching import LLMBatcher
+
+
+class _Analyzer:
+    """Single-document extraction that blocks until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.extracted = []
+
+    def extract_data_from_text(self, text, priority=None, deadline=None):
+        self.extracted.append(text)
+        self.release.wait(5.0)
+        return {"text": text}
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = _Analyzer()
+    yield analyzer
+    analyzer.release.set()
+
+
+def test_extract_gives_up_at_the_deadline(analyzer):
+    batcher = LLMBatcher(analyzer, batch_size=1, max_wait=0, workers=1)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        batcher.extract("slow", deadline=Deadline(0.3))
+    assert time.monotonic() - started < 1.5
+
+
+def test_cancelled_request_is_dropped_before_its_batch(analyzer):
+    batcher = LLMBatcher(analyzer, batch_size=1, max_wait=0, workers=1)
+    first = batcher.submit("first")  # occupies the only worker
+    deadline = Deadline(10)
+    threading.Timer(0.2, deadline.cancel).start()
+    with pytest.raises(RequestCancelledError):
+        batcher.extract("abandoned", deadline=deadline)
+
+    analyzer.release.set()
+    assert first.result(timeout=2) == {"text": "first"}
+    time.sleep(0.1)
+    assert analyzer.extracted == ["first"]
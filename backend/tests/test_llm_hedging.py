@@ -0,0 +1,15 @@
+import time
+
+
+def test_losing_hedge_is_closed(fake_llm):
+    # Streaming is off, but hedge racers still stream so the loser can be closed
+    llm = fake_llm({"slow": [[None]], "fast": [['{"model": "fast"}']]}, streaming=False)
+    started = time.monotonic()
+    raw, answered_by = llm.call_hedged("prompt", model="slow", alternate="fast", stream_json=True)
+
+    assert answered_by == "fast"
+    assert raw == '{"model": "fast"}'
+    assert llm.client.streams["slow"].response.closed.wait(1.0)
+    assert time.monotonic() - started < 2.0
+    assert llm.hedger.hedges_fired == 1
+    assert llm.hedger.hedges_won == 1
@@ -0,0 +1,67 @@
+import pytest
+
+from nutrition import parse_value
+
+
+@pytest.mark.parametrize("value, grams, as_salt", [
+    ("0.4 g", 0.4, False),
+    ("1,2 g (as salt)", 0.48, True),
+    ("1.2 g (salt)", 0.48, True),
+    ("Salt 1.0 g", 0.4, True),
+    ("0.35 g salt", 0.14, True),
+    ("1 g (sóként)", 0.4, True),
+    ("Sodium 0.4 g / Salt 1.0 g", 0.4, False),
+    ("Salt 1.0 g / Sodium 0.4 g", 0.4, False),
+    ("0.4 g (salt equivalent 1 g)", 0.4, False),
+    ("Salt: 1.2 g (0.48 g sodium)", 0.48, False),
+    ("400 mg sodium", 0.4, False),
+])
+def test_sodium_salt_is_tied_to_its_amount(value, grams, as_salt):
+    amount = parse_value("sodium", value)
+    assert amount.as_salt is as_salt
+    assert amount.grams == pytest.approx(grams)
+
+
+def test_salt_figure_kept():
+    amount = parse_value("sodium", "Sodium 0.4 g / Salt 1.0 g")
+    assert amount.salt_grams == pytest.approx(1.0)
+
+
+def test_other_nutrients_unchanged():
+    assert parse_value("energy", "1500 kJ / 359 kcal").kcal == 359
+    assert parse_value("fat", "<0,5 g").grams == 0.5
+    assert parse_value("sugar", "4 g per serving (30 g)").basis == "serving"
+    assert parse_value("sodium", "Not available") is None
+
+
+@pytest.mark.parametrize("nutrient, value", [
+    ("fat", "12%"),
+    ("fat", "12 %"),
+    ("sugar", "8,5%"),
+    ("energy", "18%"),
+])
+def test_percentages_are_not_amounts(nutrient, value):
+    assert parse_value(nutrient, value) is None
+
+
+def test_percentage_next_to_amount_is_ignored():
+    assert parse_value("fat", "12 g (17%)").grams == 12
+    assert parse_value("fat", "17% 12 g").grams == 12
+
+
+@pytest.mark.parametrize("value, kj, kcal", [
+    ("1 500 kJ / 359 kcal", 1500, 359),
+    ("1.500 kJ", 1500, 358.5),
+    ("2.280 kJ / 546 kcal", 2280, 546),
+    ("1 500,5 kJ", 1500.5, 358.6),
+])
+def test_thousands_separators(value, kj, kcal):
+    amount = parse_value("energy", value)
+    assert amount.kj == pytest.approx(kj)
+    assert amount.kcal == pytest.approx(kcal)
+
+
+def test_decimals_are_not_thousands():
+    assert parse_value("fat", "1.5 g").grams == 1.5
+    assert parse_value("sodium", "0.125 g").grams == 0.125
+    assert parse_value("sugar", "12,345 g").grams == pytest.approx(12.345)
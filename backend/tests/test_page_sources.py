@@ -0,0 +1,52 @@
+import io
+
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import ocr_pipeline
+from ocr_pipeline import page_sources
+
+
+def text_pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for n in range(1, pages + 1):
+        pdf.drawString(60, 800, f"Page {n}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def record_renders(monkeypatch):
+    calls = []
+
+    def convert(pdf_bytes, dpi, fmt=None, first_page=None, last_page=None):
+        count = len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+        first, last = first_page or 1, last_page or count
+        calls.append((first, last))
+        return [Image.new("L", (10, 10), 255) for _ in range(first, last + 1)]
+
+    monkeypatch.setattr(ocr_pipeline, "convert_from_bytes", convert)
+    return calls
+
+
+def test_uncached_document_renders_in_one_run(monkeypatch):
+    calls = record_renders(monkeypatch)
+    data = text_pdf(3)
+    sources = page_sources(data, PdfReader(io.BytesIO(data)), 150, cached=lambda source: False)
+    assert calls == [(1, 3)]
+    assert len(sources) == 3
+
+
+def test_cached_pages_are_not_rendered(monkeypatch):
+    calls = record_renders(monkeypatch)
+    data = text_pdf(3)
+    sources = page_sources(data, PdfReader(io.BytesIO(data)), 150,
+                           cached=lambda source: source.page_number != 2)
+    assert calls == []
+    assert [source.fingerprint() is not None for source in sources] == [True, True, True]
+
+    sources[1].render(150)
+    assert calls == [(2, 2)]
@@ -0,0 +1,59 @@
+import pytest
+
+from config import Config
+from llm_stream import RESET, PartialGate
+from speculation import SpeculativeExtraction
+
+
+def test_retry_retracts_partials_of_malformed_attempt(fake_llm):
+    llm = fake_llm({"m": [['{"allergens": {"milk": true}, ', ']'], ['{"allergens": {"egg": true}}']]})
+    events = []
+    llm.call("prompt", model="m", max_retries=2, stream_json=True,
+             on_partial=lambda path, value: events.append((path, value)))
+    assert events == [(("allergens", "milk"), True), (RESET, None), (("allergens", "egg"), True)]
+
+
+def test_losing_hedge_partials_are_retracted(fake_llm):
+    llm = fake_llm({
+        "slow": [['{"allergens": {"milk": true, ', None]],
+        "fast": [['{"allergens": {"egg": true}}']],
+    })
+    events = []
+    raw, answered_by = llm.call_hedged("prompt", model="slow", alternate="fast", stream_json=True,
+                                       on_partial=lambda path, value: events.append((path, value)))
+    assert answered_by == "fast"
+    assert events == [(("allergens", "milk"), True), (RESET, None)]
+
+
+def test_gate_only_resets_after_forwarding():
+    events = []
+    gate = PartialGate(lambda *args: events.append(args), None)
+    gate.reset()
+    gate("a")
+    gate(None)
+    gate.reset()
+    assert events == [("a",), (None,)]
+    gate("b")
+    gate.reset(close=True)
+    gate("c")
+    assert events == [("a",), (None,), ("b",), (None,)]
+
+
+@pytest.mark.parametrize("reissue", [True, False])
+def test_speculation_rerun_withdraws_superseded_fields(monkeypatch, reissue):
+    monkeypatch.setattr(Config, "OCR_LLM_PIPELINE_TRIGGER_KEYWORDS", ["ingredients"])
+    events = []
+
+    def extract(text, on_partial=None, cancel_event=None):
+        on_partial("allergens", "milk", True)
+        return {"allergens": {"milk": True}}
+
+    speculation = SpeculativeExtraction(extract, on_partial=lambda *args: events.append(args))
+    speculation.offer("ingredients: milk", "ingredients: milk")
+    if reissue:
+        speculation.stale = True
+    speculation.resolve("ingredients: milk")
+    expected = [("allergens", "milk", True)]
+    if reissue:
+        expected += [(None, None, None), ("allergens", "milk", True)]
+    assert events == expected
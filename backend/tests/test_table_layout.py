@@ -0,0 +1,79 @@
+import io
+
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from pdf_analyzer import PDFAnalyzer
+from table_layout import find_nutrition_table, fragment_collector
+
+INGREDIENTS = [
+    "Ingredients: wheat flour (gluten), butter (milk),",
+    "sugar 12%, hazelnuts 5%, emulsifier (soy lecithin),",
+    "egg, skimmed milk powder, raising agent,",
+    "salt 2%. May contain traces of peanut.",
+]
+TABLE = [
+    ("Energy", "1980 kJ / 473 kcal", "396 kJ / 95 kcal"),
+    ("Fat", "22 g", "4.4 g"),
+    ("of which saturates", "13 g", "2.6 g"),
+    ("Carbohydrate", "61 g", "12 g"),
+    ("of which sugars", "24 g", "4.8 g"),
+    ("Protein", "6.5 g", "1.3 g"),
+    ("Salt", "0.6 g", "0.12 g"),
+]
+
+
+def biscuit_pdf(table=True) -> bytes:
+    """Ingredient lines starting with "sugar" / "salt" at the left margin, above a nutrition table"""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(60, 800, "Butter Biscuits")
+    for i, line in enumerate(INGREDIENTS):
+        pdf.drawString(60, 780 - 14 * i, line)
+    if table:
+        pdf.drawString(60, 700, "Nutrition information")
+        pdf.drawString(220, 700, "per 100 g")
+        pdf.drawString(340, 700, "per serving (20 g)")
+        for i, (label, per_100, serving) in enumerate(TABLE):
+            pdf.drawString(60, 686 - 14 * i, label)
+            pdf.drawString(220, 686 - 14 * i, per_100)
+            pdf.drawString(340, 686 - 14 * i, serving)
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def page_fragments(pdf_bytes: bytes):
+    page = PdfReader(io.BytesIO(pdf_bytes)).pages[0]
+    fragments = []
+    text = page.extract_text(visitor_text=fragment_collector(fragments))
+    return text, fragments
+
+
+def test_ingredient_lines_are_not_table_rows():
+    _, fragments = page_fragments(biscuit_pdf())
+    table = find_nutrition_table(fragments)
+    assert table is not None
+    assert table.values == {
+        "energy": "1980 kJ / 473 kcal", "fat": "22 g", "carbohydrate": "61 g",
+        "sugar": "24 g", "protein": "6.5 g", "sodium": "0.6 g (as salt)",
+    }
+    assert table.basis == "100g"
+    assert table.complete
+    assert [label for label, _ in table.rows] == [label for label, _, _ in TABLE]
+
+
+def test_allergen_text_survives_table_removal():
+    text, fragments = page_fragments(biscuit_pdf())
+    details = {}
+    page_text = PDFAnalyzer._layout_page_text(text, fragments, 1, details)
+    for allergen in ("butter (milk)", "hazelnuts", "soy lecithin", "egg", "skimmed milk powder", "traces of peanut"):
+        assert allergen in page_text
+    assert "1980 kJ" not in page_text  # the complete table itself is left out
+
+
+def test_ingredient_lines_alone_are_no_table():
+    _, fragments = page_fragments(biscuit_pdf(table=False))
+    assert find_nutrition_table(fragments) is None
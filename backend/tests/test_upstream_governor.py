@@ -0,0 +1,29 @@
+import time
+
+import pytest
+
+from upstream_governor import CircuitBreaker, CircuitOpenError
+
+
+def test_late_failure_while_open_only_extends_cooldown():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=5.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 1
+    opened_at, open_until = breaker.opened_at, breaker.open_until
+
+    # A request admitted before the breaker opened fails afterwards, asking for a longer wait
+    breaker.record_failure(retry_after=60.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 1
+    assert breaker.opened_at == opened_at
+    assert breaker.open_until >= time.monotonic() + 59.0 > open_until
+
+    # A shorter Retry-After never shortens the cooldown
+    extended = breaker.open_until
+    breaker.record_failure(retry_after=1.0)
+    assert breaker.open_until == extended
+    assert breaker.times_opened == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
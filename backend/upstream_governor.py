@@ -0,0 +1,290 @@
+# upstream_governor.py - Shared health, concurrency and retry policy for the LLM upstream
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+import openai
+
+from config import Config
+
+logger = logging.getLogger("be_aware_backend")
+
+# Status codes worth retrying; everything else from the API is a caller/config error
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# Outcomes that mean "the upstream is struggling" (shrink concurrency, count towards the breaker)
+OVERLOAD_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailableError(RuntimeError):
+    """Raised instead of calling the upstream when it is known to be unhealthy"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """The circuit breaker is open; requests fail fast until the cooldown ends"""
+
+
+def parse_retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After / retry-after-ms header on an API error, if present"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: BaseException) -> Tuple[bool, bool]:
+    """
+    Classify an LLM call failure.
+
+    Returns:
+        Tuple of (retryable, overload). ``overload`` means the failure says
+        something about upstream health (rate limit, timeout, 5xx, network).
+    """
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True, True
+    if isinstance(exc, openai.APIStatusError):
+        status = exc.status_code
+        return status in RETRYABLE_STATUS, status in OVERLOAD_STATUS
+    # Auth, bad request, unknown model, local bugs: retrying won't help
+    return False, False
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit: grow by ~1 per window of successes, halve on
+    overload (at most once per cooldown so one burst of 429s counts once).
+    """
+
+    def __init__(self, initial: int = None, minimum: int = None, maximum: int = None):
+        self.minimum = minimum or Config.LLM_CONCURRENCY_MIN
+        self.maximum = maximum or Config.LLM_CONCURRENCY_MAX
+        self.limit = float(initial or Config.LLM_CONCURRENCY_INITIAL)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+
+    def acquire(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for a slot"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, success: Optional[bool]) -> None:
+        """
+        Free a slot and adapt the limit.
+
+        Args:
+            success: True to grow, False (overload) to shrink, None to leave unchanged
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if success is True:
+                self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            elif success is False:
+                now = time.monotonic()
+                if now - self._last_decrease >= Config.LLM_CONCURRENCY_DECREASE_COOLDOWN:
+                    self.limit = max(self.minimum, self.limit * Config.LLM_CONCURRENCY_BACKOFF)
+                    self._last_decrease = now
+                    logger.warning("📉 LLM concurrency limit reduced to %.1f", self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker driven by overload failures.
+
+    Opens after Config.LLM_BREAKER_FAILURE_THRESHOLD consecutive overload
+    failures, stays open for the cooldown (or the upstream's Retry-After if
+    longer), then lets Config.LLM_BREAKER_HALF_OPEN_PROBES requests through.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = None, cooldown: float = None):
+        self.failure_threshold = failure_threshold or Config.LLM_BREAKER_FAILURE_THRESHOLD
+        self.cooldown = cooldown or Config.LLM_BREAKER_COOLDOWN
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_until = 0.0
+        self.times_opened = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError if a request may not be sent right now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self.open_until:
+                    raise CircuitOpenError(
+                        "LLM upstream unavailable (circuit breaker open)",
+                        retry_after=round(self.open_until - now, 1)
+                    )
+                self.state = self.HALF_OPEN
+                self._probes = 0
+                logger.info("🟡 LLM circuit half-open - probing upstream")
+            if self.state == self.HALF_OPEN:
+                if self._probes >= Config.LLM_BREAKER_HALF_OPEN_PROBES:
+                    raise CircuitOpenError("LLM upstream unavailable (circuit breaker probing)",
+                                           retry_after=1.0)
+                self._probes += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("🟢 LLM circuit closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self, retry_after: float = None) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.OPEN:
+                # Late failures from requests admitted before opening only extend the cooldown
+                self.open_until = max(self.open_until, time.monotonic() + (retry_after or 0.0))
+                return
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                now = time.monotonic()
+                self.state = self.OPEN
+                self.opened_at = now
+                self.open_until = now + max(self.cooldown, retry_after or 0.0)
+                self.times_opened += 1
+                logger.error("🔴 LLM circuit opened for %.0fs after %d failures",
+                             self.open_until - now, self.consecutive_failures)
+
+    def release_probe(self) -> None:
+        """Return a half-open probe slot that ended without a verdict (e.g. cancelled)"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+
+class UpstreamGovernor:
+    """Process-wide gatekeeper combining the concurrency limiter and the circuit breaker"""
+
+    def __init__(self):
+        self.limiter = AdaptiveConcurrencyLimiter()
+        self.breaker = CircuitBreaker()
+        self.stats = {"calls": 0, "succeeded": 0, "retryable_errors": 0,
+                      "fatal_errors": 0, "rejected": 0, "rate_limited": 0}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        """
+        Admit one upstream request.
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            UpstreamUnavailableError: If no concurrency slot frees up in time
+        """
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+        if not self.limiter.acquire(Config.LLM_QUEUE_TIMEOUT):
+            self.breaker.release_probe()
+            self._count("rejected")
+            raise UpstreamUnavailableError("LLM upstream saturated (concurrency limit reached)",
+                                           retry_after=Config.LLM_QUEUE_TIMEOUT)
+        self._count("calls")
+        outcome = _Outcome()
+        try:
+            yield outcome
+        finally:
+            self.limiter.release(outcome.success)
+            if outcome.success is None:
+                self.breaker.release_probe()
+
+    def record_success(self, outcome: "_Outcome") -> None:
+        outcome.success = True
+        self._count("succeeded")
+        self.breaker.record_success()
+
+    def record_failure(self, outcome: "_Outcome", exc: BaseException) -> Tuple[bool, Optional[float]]:
+        """
+        Record a failed upstream request.
+
+        Returns:
+            Tuple of (retryable, retry_after seconds from the upstream or None)
+        """
+        retryable, overload = classify_error(exc)
+        retry_after = parse_retry_after(exc)
+        self._count("retryable_errors" if retryable else "fatal_errors")
+        if getattr(exc, "status_code", None) == 429:
+            self._count("rate_limited")
+
+        if overload:
+            outcome.success = False
+            self.breaker.record_failure(retry_after)
+        else:
+            # The upstream answered; it's healthy even if the request was bad
+            outcome.success = None
+            self.breaker.record_success()
+        return retryable, retry_after
+
+    def snapshot(self) -> dict:
+        """Breaker state, concurrency limit and counters for monitoring"""
+        now = time.monotonic()
+        breaker = self.breaker
+        return {
+            "circuit": {
+                "state": breaker.state,
+                "consecutive_failures": breaker.consecutive_failures,
+                "times_opened": breaker.times_opened,
+                "retry_after": round(breaker.open_until - now, 1) if breaker.state == breaker.OPEN else 0,
+            },
+            "concurrency": {
+                "limit": round(self.limiter.limit, 2),
+                "in_flight": self.limiter.in_flight,
+                "min": self.limiter.minimum,
+                "max": self.limiter.maximum,
+            },
+            **self.stats,
+        }
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+
+class _Outcome:
+    """Result of one admitted request, read back when its slot is released"""
+
+    def __init__(self):
+        self.success: Optional[bool] = None